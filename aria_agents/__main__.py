@@ -42,6 +42,7 @@ def start_server(args):
 
 def connect_to_server(args):
     from aria_agents.chatbot import connect_server
+    from aria_agents.artifact_manager import close_artifact_clients
 
     if args.login_required:
         os.environ["BIOIMAGEIO_LOGIN_REQUIRED"] = "true"
@@ -51,7 +52,10 @@ def connect_to_server(args):
 
     loop = asyncio.get_event_loop()
     loop.create_task(connect_server(server_url))
-    loop.run_forever()
+    try:
+        loop.run_forever()
+    finally:
+        loop.run_until_complete(close_artifact_clients())
 
 
 def main():
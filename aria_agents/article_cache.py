@@ -0,0 +1,180 @@
+import os
+import gzip
+import json
+import time
+import sqlite3
+import threading
+from llama_index.core import Document
+
+
+class ArticleCache:
+    """A SQLite store of the PubMed Central articles fetched by any session.
+
+    Articles are keyed by PMCID and keep their raw XML and the text and
+    metadata parsed from it, both gzip-compressed. Articles older than
+    `ttl` seconds are fetched again, and when the stored articles exceed
+    `max_bytes` the least recently used ones are deleted.
+    """
+
+    def __init__(self, path, max_bytes=2 * 1024 * 1024 * 1024, ttl=30 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS articles"
+            " (pmcid TEXT PRIMARY KEY, xml BLOB NOT NULL, document BLOB NOT NULL,"
+            " size INTEGER NOT NULL, fetched_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS articles_last_used ON articles (last_used)"
+        )
+        self._db.commit()
+        self.size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM articles"
+        ).fetchone()[0]
+
+    @classmethod
+    def from_env(cls):
+        projects_folder = os.environ.get("PROJECT_FOLDERS", "./projects")
+        return cls(
+            os.environ.get(
+                "ARIA_AGENTS_ARTICLE_CACHE_PATH",
+                os.path.join(projects_folder, "article_cache.sqlite"),
+            ),
+            max_bytes=int(
+                os.environ.get(
+                    "ARIA_AGENTS_ARTICLE_CACHE_BYTES", str(2 * 1024 * 1024 * 1024)
+                )
+            ),
+            ttl=float(
+                os.environ.get("ARIA_AGENTS_ARTICLE_CACHE_TTL", str(30 * 24 * 3600))
+            ),
+        )
+
+    def get_many(self, pmcids):
+        """Return the cached documents of the articles, by PMCID."""
+        found = {}
+        expired = []
+        now = time.time()
+        with self._lock:
+            # Stay below SQLite's limit on the number of query parameters
+            for i in range(0, len(pmcids), 500):
+                batch = list(set(pmcids[i : i + 500]))
+                rows = self._db.execute(
+                    "SELECT pmcid, document, fetched_at FROM articles WHERE pmcid IN"
+                    f" ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for pmcid, document, fetched_at in rows:
+                    if now - fetched_at > self.ttl:
+                        expired.append(pmcid)
+                    else:
+                        found[pmcid] = document
+            for pmcid in expired:
+                self._remove(pmcid)
+            self._db.executemany(
+                "UPDATE articles SET last_used = ? WHERE pmcid = ?",
+                [(now, pmcid) for pmcid in found],
+            )
+            self._db.commit()
+
+        self.hits += len(found)
+        self.misses += len(set(pmcids)) - len(found)
+        self.expirations += len(expired)
+        documents = {}
+        for pmcid in pmcids:
+            if pmcid in found:
+                content = json.loads(gzip.decompress(found[pmcid]))
+                documents[pmcid] = Document(
+                    text=content["text"], extra_info=content["metadata"]
+                )
+        return documents
+
+    def get_xml(self, pmcid):
+        """Return the raw XML of a cached article, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT xml FROM articles WHERE pmcid = ?", (pmcid,)
+            ).fetchone()
+        return gzip.decompress(row[0]) if row is not None else None
+
+    def put_many(self, articles):
+        """Store `(pmcid, raw_xml, document)` triples."""
+        now = time.time()
+        rows = {}
+        for pmcid, raw_xml, document in articles:
+            compressed_xml = gzip.compress(raw_xml)
+            compressed_document = gzip.compress(
+                json.dumps(
+                    {"text": document.text, "metadata": document.metadata}
+                ).encode("utf-8")
+            )
+            size = len(compressed_xml) + len(compressed_document)
+            rows[pmcid] = (pmcid, compressed_xml, compressed_document, size, now, now)
+        rows = list(rows.values())
+        with self._lock:
+            for row in rows:
+                self._remove(row[0])
+            self._db.executemany(
+                "INSERT INTO articles"
+                " (pmcid, xml, document, size, fetched_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.size += sum(row[3] for row in rows)
+            self._evict()
+            self._db.commit()
+
+    def _remove(self, pmcid):
+        row = self._db.execute(
+            "SELECT size FROM articles WHERE pmcid = ?", (pmcid,)
+        ).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM articles WHERE pmcid = ?", (pmcid,))
+            self.size -= row[0]
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT pmcid, size FROM articles ORDER BY last_used LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for pmcid, size in rows:
+                if self.size <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM articles WHERE pmcid = ?", (pmcid,))
+                self.size -= size
+                self.evictions += 1
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "bytes": self.size,
+        }
+
+
+_article_cache = None
+
+
+def get_article_cache():
+    global _article_cache
+    if _article_cache is None:
+        _article_cache = ArticleCache.from_env()
+    return _article_cache
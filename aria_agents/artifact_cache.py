@@ -0,0 +1,156 @@
+import os
+from collections import OrderedDict
+
+
+def is_copied_on_stage(path):
+    """Whether Hypha copies `path` into a new version staged with `copy_files`.
+
+    Only the files at the top level of the previous version are copied.
+    """
+    return "/" not in path
+
+
+class ContentHashIndex:
+    """The content hashes of artifact files at the latest version seen per artifact.
+
+    Maps each file path to its hash and each hash to the paths holding it, so
+    a put of unchanged content can be skipped. Entries only answer for the
+    version they were recorded at, and only the files staging copied carry
+    over to a new version, see `is_copied_on_stage`.
+    """
+
+    def __init__(self):
+        self._artifacts = {}
+        self.skipped_puts = 0
+        self.bytes_saved = 0
+        self.rpcs_saved = 0
+
+    def find(self, artifact_id, version, digest, name=None):
+        """Return `name` if it holds `digest`, or any path holding it if no name is given."""
+        entry = self._artifacts.get(artifact_id)
+        if entry is None or entry["version"] != version:
+            return None
+        if name is not None:
+            return name if entry["hashes"].get(name) == digest else None
+        return next(
+            (path for path, path_digest in entry["hashes"].items() if path_digest == digest),
+            None,
+        )
+
+    def advance(self, artifact_id, old_version, new_version, changed_paths, hashes):
+        entry = self._artifacts.get(artifact_id)
+        if entry is None or entry["version"] != old_version:
+            entry = {"hashes": {}}
+        entry["hashes"] = {
+            path: digest
+            for path, digest in entry["hashes"].items()
+            if path not in changed_paths and is_copied_on_stage(path)
+        }
+        entry["hashes"].update(hashes)
+        entry["version"] = new_version
+        self._artifacts[artifact_id] = entry
+
+    def invalidate(self, artifact_id):
+        self._artifacts.pop(artifact_id, None)
+
+    def record_skip(self, size, rpcs):
+        self.skipped_puts += 1
+        self.bytes_saved += size
+        self.rpcs_saved += rpcs
+
+    def stats(self):
+        return {
+            "skipped_puts": self.skipped_puts,
+            "bytes_saved": self.bytes_saved,
+            "rpcs_saved": self.rpcs_saved,
+        }
+
+
+class ArtifactContentCache:
+    """An LRU cache of artifact file contents bounded by their total size in bytes.
+
+    Entries are keyed by (artifact_id, file_path, version), so a cached file is
+    never served for a version it wasn't read or written at. When a handle
+    commits a new version, `advance` carries the files it didn't touch over
+    to the new version, if staging copied them, see `is_copied_on_stage`.
+    `hashes` indexes the content hashes of the files written through the
+    cache, which aren't evicted with their content.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self.hashes = ContentHashIndex()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_bytes=int(
+                os.environ.get(
+                    "ARIA_AGENTS_ARTIFACT_CACHE_BYTES", str(64 * 1024 * 1024)
+                )
+            )
+        )
+
+    def get(self, artifact_id, file_path, version):
+        key = (artifact_id, file_path, version)
+        content = self._entries.get(key)
+        if content is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return content
+
+    def put(self, artifact_id, file_path, version, content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        key = (artifact_id, file_path, version)
+        self._remove(key)
+        if len(content) > self.max_bytes:
+            return
+        self._entries[key] = content
+        self.size += len(content)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def advance(self, artifact_id, old_version, new_version, changed_paths):
+        """Re-key the unchanged files of `old_version` to `new_version`."""
+        old_keys = [
+            key
+            for key in self._entries
+            if key[0] == artifact_id and key[2] == old_version
+        ]
+        for key in old_keys:
+            content = self._entries.pop(key)
+            self.size -= len(content)
+            if key[1] not in changed_paths and is_copied_on_stage(key[1]):
+                self.put(artifact_id, key[1], new_version, content)
+
+    def invalidate(self, artifact_id):
+        self.hashes.invalidate(artifact_id)
+        for key in [key for key in self._entries if key[0] == artifact_id]:
+            self._remove(key)
+
+    def _remove(self, key):
+        content = self._entries.pop(key, None)
+        if content is not None:
+            self.size -= len(content)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            **self.hashes.stats(),
+        }
+
+
+content_cache = ArtifactContentCache.from_env()
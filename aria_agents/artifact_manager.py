@@ -1,35 +1,347 @@
-import httpx
+import os
+import asyncio
 import datetime
+import hashlib
+import importlib.util
+import tempfile
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import partial
+import aiofiles
+import httpx
 from hypha_rpc.rpc import RemoteException
-from aria_agents.server import get_server
+from aria_agents.server import connection_pool
+from aria_agents.artifact_cache import content_cache
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_MEMORY = int(
+    os.environ.get("ARIA_AGENTS_SPOOL_MAX_MEMORY", str(16 * 1024 * 1024))
+)
+# How many files get_many/put_many transfer at the same time
+BULK_CONCURRENCY = int(os.environ.get("ARIA_AGENTS_ARTIFACT_CONCURRENCY", "8"))
+
+# Files attached by the user are stored under this directory of the chat artifact
+ATTACHMENTS_DIR = "attachments"
+
+# The artifact handle of the chat session running in the current context
+current_artifacts = ContextVar("current_artifacts", default=None)
+# The artifact transaction open in the current context, joined by nested writes
+active_transaction = ContextVar("active_transaction", default=None)
+
+
+def get_session_artifacts(artifact_manager=None):
+    """Return the artifact handle bound to the running chat session.
+
+    Falls back to `artifact_manager` when no session handle is bound, e.g. when
+    the tools are called outside of a chat or with a local/mock manager.
+    """
+    session_artifacts = current_artifacts.get()
+    return session_artifacts if session_artifacts is not None else artifact_manager
+
+
+class TransferClient:
+    """The keep-alive HTTP client used for presigned-URL file transfers.
+
+    One `httpx.AsyncClient` is shared by all artifact handles of the process so
+    consecutive uploads and downloads reuse TCP/TLS connections. The client is
+    recreated if it was closed or belongs to another event loop.
+    """
+
+    def __init__(
+        self,
+        max_connections=100,
+        max_keepalive_connections=20,
+        keepalive_expiry=30.0,
+        http2=False,
+        timeout=500,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        if http2 and importlib.util.find_spec("h2") is None:
+            print("HTTP/2 requires the `h2` package, falling back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.timeout = timeout
+        self._client = None
+        self._loop = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_connections=int(
+                os.environ.get("ARIA_AGENTS_HTTP_MAX_CONNECTIONS", "100")
+            ),
+            max_keepalive_connections=int(
+                os.environ.get("ARIA_AGENTS_HTTP_MAX_KEEPALIVE", "20")
+            ),
+            keepalive_expiry=float(
+                os.environ.get("ARIA_AGENTS_HTTP_KEEPALIVE_EXPIRY", "30")
+            ),
+            http2=os.environ.get("ARIA_AGENTS_HTTP2") == "true",
+        )
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                limits=self.limits, http2=self.http2, timeout=self.timeout
+            )
+            self._loop = loop
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+transfer_client = TransferClient.from_env()
+
+
+async def close_artifact_clients():
+    """Close the process-wide transfer client and hypha connections."""
+    await transfer_client.aclose()
+    await connection_pool.close()
+
+
+async def iter_file(path, chunk_size=STREAM_CHUNK_SIZE):
+    async with aiofiles.open(path, "rb") as f:
+        while chunk := await f.read(chunk_size):
+            yield chunk
+
+
+async def spool_stream(stream, max_memory=SPOOL_MAX_MEMORY):
+    """Write an async byte stream to a temporary file kept in memory while small."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        async for chunk in stream:
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled
+
+
+async def iter_spooled(spooled, chunk_size=STREAM_CHUNK_SIZE):
+    with spooled:
+        while chunk := spooled.read(chunk_size):
+            yield chunk
+
+
+def hash_content(value):
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return hashlib.sha256(value).hexdigest()
+
+
+async def hash_file(path):
+    sha256 = hashlib.sha256()
+    async for chunk in iter_file(path):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def get_version(artifact_info):
+    """Return the number of committed versions in an artifact's info, if known."""
+    try:
+        versions = artifact_info["versions"]
+    except (KeyError, TypeError):
+        return None
+    return len(versions) if isinstance(versions, (list, tuple)) else None
+
+
+class ManifestSnapshot:
+    """An artifact manifest read at a version, with its attachments indexed by name."""
+
+    def __init__(self, manifest, version):
+        self.version = version
+        self.attachments = list(manifest.get("attachments") or [])
+        # Later attachments replace earlier ones with the same name
+        self.attachments_by_name = {
+            attachment["name"]: attachment for attachment in self.attachments
+        }
+
+
+class ArtifactTransaction:
+    """The writes staged on an artifact, committed together as one new version."""
+
+    def __init__(self, artifacts):
+        self.artifacts = artifacts
+        self.staged = False
+        self.stage_lock = asyncio.Lock()
+        self.put_names = []
+        self.removed_names = []
+        # Paths uploads were started for, removed again if the block fails
+        self.staged_names = []
+        # Contents of the files put in this transaction, None if streamed
+        self.contents = {}
+        # Content hashes of the files put in this transaction, where known
+        self.hashes = {}
+        # Puts skipped because the content was already stored
+        self.skipped = 0
+
+    @property
+    def has_changes(self):
+        return bool(self.put_names or self.removed_names)
+
+
+class KnownArtifacts:
+    """The collections and chat artifacts this process knows to exist.
+
+    `setup` runs on every chat turn, so an artifact seen once is not checked
+    or created again. A miss is resolved with one cheap `read` before falling
+    back to `create`. The counters record how often each path is taken.
+    """
+
+    def __init__(self):
+        self._artifact_ids = set()
+        self.hits = 0
+        self.checks = 0
+        self.creations = 0
+
+    def __contains__(self, artifact_id):
+        return artifact_id in self._artifact_ids
+
+    def add(self, artifact_id):
+        self._artifact_ids.add(artifact_id)
+
+    def discard(self, artifact_id):
+        self._artifact_ids.discard(artifact_id)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "checks": self.checks,
+            "creations": self.creations,
+            "known": len(self._artifact_ids),
+        }
+
+
+known_artifacts = KnownArtifacts()
+
+
+class ArtifactResult:
+    """The outcome of one file of a `get_many` or `put_many` call."""
+
+    def __init__(self, name, value=None, error=None):
+        self.name = name
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
 
 
 class AriaArtifacts:
-    def __init__(self, server=None, event_bus=None):
+    def __init__(
+        self,
+        server=None,
+        event_bus=None,
+        pool=None,
+        http_client=None,
+        cache=None,
+        known=None,
+    ):
         self.server = server
         self._event_bus = event_bus
+        self._pool = pool or connection_pool
+        self._http = http_client or transfer_client
+        self._cache = cache or content_cache
+        self._known = known or known_artifacts
+        self._version = None
+        self._manifest = None
         self._svc = None
+        self._connection = None
         self._artifact_id = None
         self.user_id = None
         self.session_id = None
         self._collection_alias = None
         self._collection_id = None
         self._workspace = None
+        self._transaction_lock = asyncio.Lock()
 
     async def setup(
         self, token, user_id, session_id, service_id="public/artifact-manager"
     ):
         server_url = self.server.config.public_base_url
-        self.server = await get_server(server_url, provided_token=token)
-        self._svc = await self.server.get_service(service_id)
+        connection = await self._pool.lease(server_url, token)
+        await self.close()
+        # The connection is leased until `close`, so the pool keeps it open
+        self._connection = connection
+        self.server = connection.server
+        self._svc = await connection.get_service(service_id)
+        await self._open_session(user_id, session_id)
+
+    async def close(self):
+        """Release the handle's pooled connection."""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await self._pool.release(connection)
+
+    async def _open_session(self, user_id, session_id):
         self.user_id = user_id
         self.session_id = session_id
         self._workspace = f"ws-user-{user_id}"
         self._collection_alias = "aria-agents-chats"
         self._collection_id = f"{self._workspace}/{self._collection_alias}"
         self._artifact_id = f"{self._collection_id}:{session_id}"
-        await self._try_create_collection()
-        await self._try_create()
+        await self._ensure_exists(
+            self._collection_id,
+            lambda: self._svc.read(artifact_id=self._collection_id, silent=True),
+            self._try_create_collection,
+        )
+        # Reading the chat artifact also loads its manifest snapshot
+        await self._ensure_exists(
+            self._artifact_id, self._read_manifest, self._try_create
+        )
+
+    async def _ensure_exists(self, artifact_id, check, create):
+        if artifact_id in self._known:
+            self._known.hits += 1
+            return
+        self._known.checks += 1
+        try:
+            await check()
+        except (RemoteException, RuntimeError):
+            self._known.creations += 1
+            if not await create():
+                return
+        self._known.add(artifact_id)
+
+    async def for_session(
+        self, token, user_id, session_id, service_id="public/artifact-manager"
+    ):
+        """Create a new handle scoped to a single chat session.
+
+        The returned handle owns its own connection and artifact id, so
+        concurrent sessions never overwrite each other's state. Bind it with
+        `current_artifacts` so the extension tools resolve it, and `close` it
+        when the session's turn is over.
+        """
+        session_artifacts = self._new_handle()
+        await session_artifacts.setup(token, user_id, session_id, service_id)
+        return session_artifacts
+
+    def _new_handle(self):
+        return AriaArtifacts(
+            self.server,
+            self._event_bus,
+            self._pool,
+            self._http,
+            self._cache,
+            self._known,
+        )
 
     async def _try_create_collection(self):
         galleryManifest = {
@@ -49,6 +361,8 @@ class AriaArtifacts:
             print(
                 f"Collection couldn't be created. It likely already exists. Error: {e}"
             )
+            return False
+        return True
 
     async def _try_create(self):
         try:
@@ -71,91 +385,409 @@ class AriaArtifacts:
 
         except RemoteException as e:
             print(f"Artifact couldn't be created. It likely already exists. Error: {e}")
+            return False
+        return True
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Stage the artifact once and commit all puts and removes as one version.
+
+        Writes made inside the block, including nested transactions, join the
+        open transaction. The `store_put` events are emitted after the commit.
+        Hypha can't discard a staged version, and later edits of the artifact
+        join it, so if the block or the commit fails the files it put are
+        removed from the stage again.
+        """
+        assert self._svc, "Please call `setup()` before using artifact manager"
+        transaction = active_transaction.get()
+        if transaction is not None and transaction.artifacts is self:
+            yield transaction
+            return
+
+        async with self._transaction_lock:
+            transaction = ArtifactTransaction(self)
+            token = active_transaction.set(transaction)
+            try:
+                yield transaction
+                if transaction.has_changes:
+                    artifact_info = await self._svc.commit(
+                        self._artifact_id, version="new"
+                    )
+                    self._update_cache(transaction, artifact_info)
+                elif transaction.skipped:
+                    # Neither staged nor committed
+                    self._cache.hashes.rpcs_saved += 2
+            except BaseException:
+                if transaction.staged:
+                    await self._unstage(transaction)
+                raise
+            finally:
+                active_transaction.reset(token)
+
+        for name in transaction.put_names:
+            self._event_bus.emit("store_put", name)
+
+    async def _unstage(self, transaction, names=None):
+        names = list(transaction.staged_names if names is None else names)
+        for name in names:
+            try:
+                await self._svc.remove_file(
+                    artifact_id=self._artifact_id, file_path=name
+                )
+            except Exception as e:
+                print(f"Failed to remove the staged file {name}: {e}")
+            transaction.staged_names.remove(name)
+
+    def _update_cache(self, transaction, artifact_info):
+        # Write-through: files put in the transaction are cached at the new
+        # version, and the files staging copied carry over from the previous one
+        self._version = get_version(artifact_info)
+        if self._version is None:
+            self._cache.invalidate(self._artifact_id)
+            return
+        changed_paths = set(transaction.put_names) | set(transaction.removed_names)
+        self._cache.advance(
+            self._artifact_id, self._version - 1, self._version, changed_paths
+        )
+        self._cache.hashes.advance(
+            self._artifact_id,
+            self._version - 1,
+            self._version,
+            changed_paths,
+            transaction.hashes,
+        )
+        for name, content in transaction.contents.items():
+            if content is not None:
+                self._cache.put(self._artifact_id, name, self._version, content)
+
+    async def _current_version(self):
+        if self._version is None:
+            await self._read_manifest()
+        return self._version
+
+    async def _stage(self, transaction):
+        # Artifact has to be staged before we can put or remove files, and a
+        # new stage only holds the files of the previous version if copied
+        async with transaction.stage_lock:
+            if not transaction.staged:
+                await self._svc.edit(
+                    artifact_id=self._artifact_id, version="stage", copy_files=True
+                )
+                transaction.staged = True
+
+    async def _find_duplicate(self, transaction, digest, name, alias):
+        """Return the path already holding `digest`, see `put`."""
+        version = await self._current_version()
+        if version is None:
+            return None
+        changed_paths = set(transaction.put_names) | set(transaction.removed_names)
+        hashes = self._cache.hashes
+        if name not in changed_paths and hashes.find(
+            self._artifact_id, version, digest, name
+        ):
+            return name
+        if alias:
+            path = hashes.find(self._artifact_id, version, digest)
+            if path is not None and path not in changed_paths:
+                return path
+        return None
+
+    def _skip_put(self, transaction, size, overwrite):
+        transaction.skipped += 1
+        # The put_file RPC and the upload, and the removal when overwriting
+        self._cache.hashes.record_skip(size, 3 if overwrite else 2)
 
     async def remove(self, name):
         assert self._svc, "Please call `setup()` before using artifact manager"
 
-        try:
-            await self._svc.edit(artifact_id=self._artifact_id, version="stage")
-            await self._svc.remove_file(
-                artifact_id=self._artifact_id,
-                file_path=name,
-            )
-            await self._svc.commit(self._artifact_id, version="new")
-            print(f"File {name} deleted successfully.")
-        except RemoteException as e:
-            print(
-                f"File deletion failed, likely it didn't exist. Full error: {e}\n<ENDOFERROR>"
+        async with self.transaction() as transaction:
+            try:
+                await self._stage(transaction)
+                await self._svc.remove_file(
+                    artifact_id=self._artifact_id,
+                    file_path=name,
+                )
+                transaction.removed_names.append(name)
+                transaction.contents.pop(name, None)
+                transaction.hashes.pop(name, None)
+                print(f"File {name} deleted successfully.")
+            except RemoteException as e:
+                print(
+                    f"File deletion failed, likely it didn't exist. Full error: {e}\n<ENDOFERROR>"
+                )
+
+    async def put(self, value, name, overwrite=False, alias=False):
+        """Upload a file and return the path it is stored at.
+
+        Content that `name` already holds is not uploaded again. With `alias`,
+        content stored under any other path isn't either and that path is
+        returned instead, for files whose name doesn't matter.
+        """
+        assert self._svc, "Please call `setup()` before using artifact manager"
+        digest = hash_content(value)
+
+        async with self.transaction() as transaction:
+            existing = await self._find_duplicate(transaction, digest, name, alias)
+            if existing is not None:
+                size = len(value.encode("utf-8") if isinstance(value, str) else value)
+                self._skip_put(transaction, size, overwrite)
+                return existing
+            if overwrite:
+                await self.remove(name)
+            await self._upload(transaction, name, value)
+            transaction.contents[name] = value
+            transaction.hashes[name] = digest
+
+        return name
+
+    async def put_stream(
+        self, source, name, overwrite=False, size=None, alias=False
+    ):
+        """Upload a file path or an async iterator of bytes in chunks.
+
+        Presigned S3 uploads need a Content-Length, so iterators of unknown
+        `size` are first spooled to a temporary file instead of memory. File
+        paths are deduplicated like in `put`, iterators are always uploaded.
+        """
+        assert self._svc, "Please call `setup()` before using artifact manager"
+
+        digest = None
+        if isinstance(source, (str, os.PathLike)):
+            size = os.path.getsize(source)
+            digest = await hash_file(source)
+            content = iter_file(source)
+        elif size is None:
+            spooled = await spool_stream(source)
+            size = spooled.seek(0, os.SEEK_END)
+            spooled.seek(0)
+            content = iter_spooled(spooled)
+        else:
+            content = source
+
+        async with self.transaction() as transaction:
+            if digest is not None:
+                existing = await self._find_duplicate(
+                    transaction, digest, name, alias
+                )
+                if existing is not None:
+                    self._skip_put(transaction, size, overwrite)
+                    return existing
+            if overwrite:
+                await self.remove(name)
+            await self._upload(
+                transaction, name, content, headers={"Content-Length": str(size)}
             )
+            transaction.contents[name] = None
+            if digest is not None:
+                transaction.hashes[name] = digest
+
+        return name
 
-    async def put(self, value, name, overwrite=False):
+    async def put_many(
+        self, items, overwrite=False, alias=False, concurrency=BULK_CONCURRENCY
+    ):
+        """Upload many files concurrently and commit them as one version.
+
+        `items` maps file names to their content. Bytes and strings are put as
+        is, file paths given as `os.PathLike` and async iterators are streamed.
+        Returns an `ArtifactResult` per name; failed uploads are removed from
+        the stage, as Hypha won't commit staged files that were never uploaded,
+        and the others are committed. Each result holds the path the file is
+        stored at, see `put` for `alias`.
+        """
         assert self._svc, "Please call `setup()` before using artifact manager"
 
-        if overwrite:
-            await self.remove(name)
+        async def put_item(name, value):
+            if isinstance(value, (bytes, str)):
+                return await self.put(value, name, overwrite, alias)
+            return await self.put_stream(value, name, overwrite, alias=alias)
+
+        # Resolve the version for deduplication once instead of once per file
+        await self._current_version()
+        async with self.transaction() as transaction:
+            results = await self._run_many(
+                [(name, partial(put_item, name, value)) for name, value in items.items()],
+                concurrency,
+            )
+            await self._unstage(
+                transaction,
+                [
+                    name
+                    for name, result in results.items()
+                    if not result.ok
+                    and name in transaction.staged_names
+                    and name not in transaction.put_names
+                ],
+            )
+        return results
 
-        # Artifact has to be staged before we can put files
+    async def _run_many(self, calls, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(name, call):
+            async with semaphore:
+                try:
+                    return ArtifactResult(name, value=await call())
+                except Exception as e:
+                    print(f"Artifact transfer of {name} failed: {e}")
+                    return ArtifactResult(name, error=e)
+
+        results = await asyncio.gather(*[run(name, call) for name, call in calls])
+        return {result.name: result for result in results}
+
+    async def _upload(self, transaction, name, content, headers=None):
         try:
-            await self._svc.edit(artifact_id=self._artifact_id, version="stage")
+            await self._stage(transaction)
+            if name not in transaction.staged_names:
+                transaction.staged_names.append(name)
             put_url = await self._svc.put_file(
                 artifact_id=self._artifact_id, file_path=name
             )
-            async with httpx.AsyncClient() as client:
-                response = await client.put(put_url, data=value, timeout=500)
+            response = await self._http.get().put(
+                put_url, content=content, headers=headers
+            )
             print(f"File {name} upload response: {response}")
             response.raise_for_status()
         except RemoteException as e:
             print(f"File upload failed: {e}\n<ENDOFERROR>")
             raise RuntimeError(f"File upload failed: {e}") from e
 
-        await self._svc.commit(self._artifact_id, version="new")
+        if name not in transaction.put_names:
+            transaction.put_names.append(name)
 
-        self._event_bus.emit("store_put", name)
-        return name
-
-    async def get_url(self, name: str):
+    async def get_url(self, name: str, version=None):
+        """The download URL of a file, at the latest version or `version`."""
         assert self._svc, "Please call `setup()` before using artifact manager"
+        kwargs = {} if version is None else {"version": version}
         get_url = await self._svc.get_file(
-            artifact_id=self._artifact_id, file_path=name
+            artifact_id=self._artifact_id, file_path=name, **kwargs
         )
         return get_url
 
     async def get(self, name: str):
         assert self._svc, "Please call `setup()` before using artifact manager"
-        get_url = await self.get_url(name)
+        version = await self._current_version()
+        if version is not None:
+            content = self._cache.get(self._artifact_id, name, version)
+            if content is not None:
+                return content.decode("utf-8")
 
+        get_url = await self.get_url(name)
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(get_url, timeout=500)
+            response = await self._http.get().get(get_url)
             response.raise_for_status()
         except RemoteException as e:
             print(f"File download failed: {e}")
             raise RuntimeError(f"File download failed: {e}") from e
 
+        if version is not None:
+            self._cache.put(self._artifact_id, name, version, response.content)
         return response.text
 
-    async def get_attachments(self):
+    async def get_many(self, names, spooled=False, concurrency=BULK_CONCURRENCY):
+        """Download many files concurrently.
+
+        Files are returned as text, or as spooled temporary files when
+        `spooled` is set. Returns an `ArtifactResult` per name.
+        """
+        assert self._svc, "Please call `setup()` before using artifact manager"
+        # Resolve the version once instead of once per file
+        await self._current_version()
+        get = self.get_spooled if spooled else self.get
+        return await self._run_many(
+            [(name, partial(get, name)) for name in names], concurrency
+        )
+
+    async def get_stream(self, name: str, chunk_size=STREAM_CHUNK_SIZE, version=None):
+        """Download a file as an async iterator of byte chunks."""
         assert self._svc, "Please call `setup()` before using artifact manager"
+        get_url = await self.get_url(name, version)
+
+        async with self._http.get().stream("GET", get_url) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def get_spooled(self, name: str, max_memory=SPOOL_MAX_MEMORY, version=None):
+        """Download a file into a temporary file that spills to disk when large."""
+        return await spool_stream(self.get_stream(name, version=version), max_memory)
+
+    async def _read_manifest(self):
         try:
-            artifact_info = await self._svc.read(artifact_id=self._artifact_id)
-            return artifact_info.manifest.get("attachments", [])
+            artifact_info = await self._svc.read(
+                artifact_id=self._artifact_id, silent=True
+            )
         except RemoteException as e:
-            print(f"Failed to get attachments: {e}")
-            raise RuntimeError(f"Failed to get attachments: {e}") from e
+            print(f"Failed to read the artifact manifest: {e}")
+            raise RuntimeError(f"Failed to read the artifact manifest: {e}") from e
+        self._version = get_version(artifact_info)
+        self._manifest = ManifestSnapshot(artifact_info["manifest"], self._version)
+        return self._manifest
+
+    async def _get_manifest(self, refresh=False):
+        if (
+            refresh
+            or self._manifest is None
+            or self._manifest.version != self._version
+        ):
+            await self._read_manifest()
+        return self._manifest
+
+    async def get_attachments(self):
+        assert self._svc, "Please call `setup()` before using artifact manager"
+        manifest = await self._get_manifest()
+        return manifest.attachments
 
     async def get_attachment(self, name: str):
+        attachments = await self.get_attachments_many([name])
+        return attachments[name]
+
+    async def get_attachments_many(self, names):
+        """Look up the latest attachment for each name with one manifest read.
+
+        The snapshot is re-read once if a name is missing, since attachments
+        are added to the manifest by the frontend without a new version.
+        """
         assert self._svc, "Please call `setup()` before using artifact manager"
-        attachments = await self.get_attachments()
-        reversed_attachments = attachments[
-            ::-1
-        ]  # Reverse order to get the latest attachment first
-        for attachment in reversed_attachments:
-            if attachment["name"] == name:
-                return attachment
-        return None
+        manifest = await self._get_manifest()
+        if any(name not in manifest.attachments_by_name for name in names):
+            manifest = await self._get_manifest(refresh=True)
+        return {name: manifest.attachments_by_name.get(name) for name in names}
+
+    async def get_attachment_file(self, attachment):
+        """Load an attachment's content only when a tool needs it.
+
+        Attachments are stored as files in the chat artifact and downloaded
+        into a spooled temporary file. Hypha doesn't copy nested files into
+        new versions, so they are read at the `version` they were committed
+        at, when known. Attachments saved by older clients still carry their
+        text inline in the manifest, which is returned as is.
+        """
+        if attachment.get("content") is not None:
+            return attachment["content"]
+        path = attachment.get("path") or f"{ATTACHMENTS_DIR}/{attachment['name']}"
+        return await self.get_spooled(path, version=attachment.get("version"))
+
+    async def get_attachment_files(self, attachments, concurrency=BULK_CONCURRENCY):
+        """Load many attachments concurrently, see `get_attachment_file`.
+
+        Returns an `ArtifactResult` per attachment name.
+        """
+        return await self._run_many(
+            [
+                (attachment["name"], partial(self.get_attachment_file, attachment))
+                for attachment in attachments
+            ],
+            concurrency,
+        )
 
     async def clear(self):
         assert self._svc, "Please call `setup()` before using artifact manager"
+        # A re-created artifact restarts its versions, drop what was cached
+        self._known.discard(self._artifact_id)
+        self._cache.invalidate(self._artifact_id)
+        self._version = None
+        self._manifest = None
         return await self._svc.delete(
             artifact_id=self._artifact_id, delete_files=True, recursive=True
         )
@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import math
+import tempfile
+from collections import Counter
+from typing import List
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Segment:
+    """The postings and lengths of a batch of chunks, not changed once built."""
+
+    def __init__(self, postings=None, doc_lengths=None):
+        self.postings = postings or {}
+        self.doc_lengths = doc_lengths or {}
+        self.total_length = sum(self.doc_lengths.values())
+
+    @classmethod
+    def from_texts(cls, items):
+        """Build a segment of `(node_id, text)` pairs."""
+        postings = {}
+        doc_lengths = {}
+        for node_id, text in items:
+            if node_id in doc_lengths:
+                continue
+            terms = Counter(tokenize(text))
+            for term, frequency in terms.items():
+                postings.setdefault(term, {})[node_id] = frequency
+            doc_lengths[node_id] = sum(terms.values())
+        return cls(postings, doc_lengths)
+
+    @classmethod
+    def merge(cls, segments):
+        postings = {}
+        doc_lengths = {}
+        for segment in segments:
+            for term, term_postings in segment.postings.items():
+                postings.setdefault(term, {}).update(term_postings)
+            doc_lengths.update(segment.doc_lengths)
+        return cls(postings, doc_lengths)
+
+    def to_dict(self):
+        return {"postings": self.postings, "doc_lengths": self.doc_lengths}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["postings"], data["doc_lengths"])
+
+
+class BM25Index:
+    """An inverted index scoring text chunks with Okapi BM25.
+
+    Protocol queries are often literal sentences with exact quantities, e.g.
+    "centrifuged at 1000g for 5 minutes", which lexical matching ranks well
+    without an embedding request.
+
+    Chunks are added in segments that are never changed, and the tuple of
+    segments is replaced as a whole, so a search can run on the event loop
+    while a corpus build adds chunks on a worker thread.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.segments = ()
+
+    def __contains__(self, node_id):
+        return any(node_id in segment.doc_lengths for segment in self.segments)
+
+    def __len__(self):
+        return sum(len(segment.doc_lengths) for segment in self.segments)
+
+    def add_many(self, items):
+        """Add `(node_id, text)` pairs as a new segment, which is returned."""
+        segment = BM25Segment.from_texts(
+            (node_id, text) for node_id, text in items if node_id not in self
+        )
+        if segment.doc_lengths:
+            self.segments = self.segments + (segment,)
+        return segment
+
+    def add(self, node_id, text):
+        self.add_many([(node_id, text)])
+
+    def search(self, query, top_k, node_ids=None):
+        """Return the `top_k` (node_id, score) pairs, optionally among `node_ids`.
+
+        The postings of common terms span the whole store, so a search among
+        fewer `node_ids` than postings looks up the terms of those nodes
+        instead of walking the postings.
+        """
+        segments = self.segments
+        n_docs = sum(len(segment.doc_lengths) for segment in segments)
+        if n_docs == 0:
+            return []
+        allowed = set(node_ids) if node_ids is not None else None
+        average_length = sum(segment.total_length for segment in segments) / n_docs
+        idfs = {}
+        n_candidates = 0
+        for term in set(tokenize(query)):
+            n_postings = sum(
+                len(segment.postings.get(term, ())) for segment in segments
+            )
+            if n_postings:
+                idfs[term] = math.log(1 + (n_docs - n_postings + 0.5) / (n_postings + 0.5))
+                n_candidates += n_postings
+
+        scores = {}
+
+        def score(segment, node_id, frequency, idf):
+            norm = self.k1 * (
+                1 - self.b + self.b * segment.doc_lengths[node_id] / average_length
+            )
+            scores[node_id] = scores.get(node_id, 0.0) + idf * (
+                frequency * (self.k1 + 1) / (frequency + norm)
+            )
+
+        if allowed is not None and len(allowed) * len(segments) < n_candidates:
+            for segment in segments:
+                term_postings = [
+                    (segment.postings[term], idf)
+                    for term, idf in idfs.items()
+                    if term in segment.postings
+                ]
+                for node_id in allowed:
+                    if node_id not in segment.doc_lengths:
+                        continue
+                    for postings, idf in term_postings:
+                        frequency = postings.get(node_id)
+                        if frequency:
+                            score(segment, node_id, frequency, idf)
+        else:
+            for term, idf in idfs.items():
+                for segment in segments:
+                    for node_id, frequency in segment.postings.get(term, {}).items():
+                        if allowed is None or node_id in allowed:
+                            score(segment, node_id, frequency, idf)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def save(self, path):
+        with tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(path), delete=False, encoding="utf-8"
+        ) as f:
+            json.dump(
+                {"k1": self.k1, "b": self.b, **BM25Segment.merge(self.segments).to_dict()},
+                f,
+            )
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.segments = (BM25Segment.from_dict(data),)
+        return index
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        index = cls()
+        index.add_many(
+            (node.node_id, node.get_content(metadata_mode=MetadataMode.NONE))
+            for node in nodes
+        )
+        return index
+
+
+class BM25Retriever(BaseRetriever):
+    """Retrieves the nodes of a docstore ranked by a `BM25Index`."""
+
+    def __init__(self, bm25_index, docstore, similarity_top_k=5, node_ids=None):
+        super().__init__()
+        self._bm25_index = bm25_index
+        self._docstore = docstore
+        self._similarity_top_k = similarity_top_k
+        self._node_ids = node_ids
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        results = self._bm25_index.search(
+            query_bundle.query_str, self._similarity_top_k, self._node_ids
+        )
+        return [
+            NodeWithScore(node=self._docstore.get_node(node_id), score=score)
+            for node_id, score in results
+        ]
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuses the rankings of a vector and a BM25 retriever.
+
+    Scores of the two retrievers aren't comparable, so nodes are ranked by
+    reciprocal rank fusion, the sum of 1 / (rank_constant + rank).
+    """
+
+    def __init__(
+        self, vector_retriever, bm25_retriever, similarity_top_k=5, rank_constant=60
+    ):
+        super().__init__()
+        self._vector_retriever = vector_retriever
+        self._bm25_retriever = bm25_retriever
+        self._similarity_top_k = similarity_top_k
+        self._rank_constant = rank_constant
+
+    def _fuse(self, *rankings):
+        nodes = {}
+        scores = {}
+        for ranking in rankings:
+            for rank, node_with_score in enumerate(ranking):
+                node_id = node_with_score.node.node_id
+                nodes[node_id] = node_with_score.node
+                scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (
+                    self._rank_constant + rank + 1
+                )
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [
+            NodeWithScore(node=nodes[node_id], score=score)
+            for node_id, score in ranked[: self._similarity_top_k]
+        ]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._fuse(
+            self._vector_retriever.retrieve(query_bundle),
+            self._bm25_retriever.retrieve(query_bundle),
+        )
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._fuse(
+            await self._vector_retriever.aretrieve(query_bundle),
+            self._bm25_retriever.retrieve(query_bundle),
+        )
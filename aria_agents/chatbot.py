@@ -26,7 +26,12 @@ from aria_agents.chatbot_extensions import (
     extension_to_tools,
     get_builtin_extensions,
 )
-from aria_agents.artifact_manager import AriaArtifacts
+from aria_agents.artifact_manager import (
+    AriaArtifacts,
+    current_artifacts,
+    get_session_artifacts,
+)
+from aria_agents.local_artifacts import LocalArtifacts
 from aria_agents.quota import QuotaManager
 from aria_agents.utils import (
     ChatbotExtension,
@@ -288,7 +293,10 @@ async def register_chat_service(server, service_id="aria-agents"):
     """Hypha startup function."""
     # debug = os.environ.get("BIOIMAGEIO_DEBUG") == "true"
     event_bus = EventBus(name="AriaAgents")
-    artifact_manager = AriaArtifacts(server, event_bus)
+    if os.environ.get("ARIA_AGENTS_ARTIFACTS_BACKEND") == "local":
+        artifact_manager = LocalArtifacts.from_env(event_bus)
+    else:
+        artifact_manager = AriaArtifacts(server, event_bus)
     builtin_extensions = get_builtin_extensions(artifact_manager)
     login_required = os.environ.get("BIOIMAGEIO_LOGIN_REQUIRED") == "true"
     chat_logs_path = os.environ.get("BIOIMAGEIO_CHAT_LOGS_PATH", "./chat_logs")
@@ -394,10 +402,16 @@ async def register_chat_service(server, service_id="aria-agents"):
         # find assistant by name
         assistant = next(a["agent"] for a in assistants if a["name"] == assistant_name)
         session_id = session_id or secrets.token_hex(8)
-        await artifact_manager.setup(user_token, user_id, session_id)
+        session_artifacts = await artifact_manager.for_session(
+            user_token, user_id, session_id
+        )
+        artifacts_token = current_artifacts.set(session_artifacts)
 
         # Listen to the `stream` event
         async def stream_callback(message):
+            # The event bus is shared, only stream the messages of this session
+            if message.session is None or message.session.id != session_id:
+                return
             if message.type in ["function_call", "text"]:
                 try:
                     await status_callback(message.model_dump())
@@ -411,13 +425,28 @@ async def register_chat_service(server, service_id="aria-agents"):
 
         # Listen to the `store_put` event
         async def store_put_callback(file_name):
+            # The event bus is shared, only handle files put by this session
+            if get_session_artifacts() is not session_artifacts:
+                return
             if file_name.endswith(".html"):
-                summary_website = await artifact_manager.get(file_name)
-                url = await artifact_manager.get_url(file_name)
+                summary_website = await session_artifacts.get(file_name)
+                url = await session_artifacts.get_url(file_name)
                 await artifact_callback(summary_website, url)
 
         event_bus.on("store_put", store_put_callback)
 
+        # Listen to the `corpus_progress` event of corpus builds
+        async def corpus_progress_callback(message):
+            if get_session_artifacts() is not session_artifacts:
+                return
+            # The build carries on if the session has stopped listening
+            try:
+                await status_callback(message.model_dump())
+            except Exception as exc:
+                print(f"The status callback returned an error: {exc}")
+
+        event_bus.on("corpus_progress", corpus_progress_callback)
+
         try:
             response = await assistant.handle(
                 Message(
@@ -427,14 +456,14 @@ async def register_chat_service(server, service_id="aria-agents"):
                     session_id=session_id,
                 )
             )
-        except Exception as e:
+        finally:
             event_bus.off("stream", stream_callback)
             event_bus.off("store_put", store_put_callback)
-            raise e
+            event_bus.off("corpus_progress", corpus_progress_callback)
+            current_artifacts.reset(artifacts_token)
+            await session_artifacts.close()
 
         quota_manager.use_quota(user.get("email"), 1.0)
-        event_bus.off("stream", stream_callback)
-        event_bus.off("store_put", store_put_callback)
         # get the content of the last response
         response = response[-1].data  # type: RichResponse
         assert isinstance(response, RichResponse)
@@ -3,7 +3,8 @@ import os
 import asyncio
 import uuid
 from io import StringIO
-from typing import List, Callable, Dict
+from pathlib import Path
+from typing import IO, List, Callable, Dict, Union
 from pydantic import BaseModel, Field
 import pandas as pd
 from pandas.errors import EmptyDataError
@@ -11,15 +12,22 @@ from pandasai.llm import OpenAI as PaiOpenAI
 from pandasai import Agent as PaiAgent
 from schema_agents import schema_tool, Role
 from schema_agents.utils.common import current_session, EventBus
-from aria_agents.utils import get_project_folder, get_session_id, load_config, save_to_artifact_manager, ask_agent
-from aria_agents.artifact_manager import AriaArtifacts
+from aria_agents.utils import get_project_folder, get_session_id, load_config, ask_agent
+from aria_agents.artifact_manager import AriaArtifacts, get_session_artifacts
 
 AGENT_MAX_RETRIES = 5
 
-async def read_df(file_path: str, content: str = None) -> pd.DataFrame:
+async def read_df(file_path: str, content: Union[str, IO, None] = None) -> pd.DataFrame:
     def _read_file(path, content = None):
         ext = os.path.splitext(path)[1].lower()
-        file_content = StringIO(content) if content else path
+        if isinstance(content, str):
+            file_content = StringIO(content) if content else path
+        elif content is not None:
+            # A file object, e.g. a spooled download, is read without copying it into a string
+            content.seek(0)
+            file_content = content
+        else:
+            file_content = path
         try:
             match ext:
                 case ".csv":
@@ -46,29 +54,44 @@ class PlotPaths(BaseModel):
 
 
 async def upload_plots(plot_paths: PlotPaths, artifact_manager: AriaArtifacts) -> Dict[str, str]:
+    artifact_manager = get_session_artifacts(artifact_manager)
     if artifact_manager is None:
         return plot_paths.plot_paths
     
-    plot_urls = {}
-    for plot_path in plot_paths.plot_paths:
-        with open(plot_path, "rb") as image_file:
-            plot_content = image_file.read()
-        
-        plot_name = f"plot_{str(uuid.uuid4())}.png"
-        plot_urls[plot_path] = await save_to_artifact_manager(plot_name, plot_content, artifact_manager)
-        
-    return plot_urls
+    plot_names = {
+        plot_path: f"plot_{str(uuid.uuid4())}.png"
+        for plot_path in plot_paths.plot_paths
+    }
+    # Plots identical to an uploaded one link to it instead of a new copy
+    results = await artifact_manager.put_many(
+        {plot_name: Path(plot_path) for plot_path, plot_name in plot_names.items()},
+        alias=True,
+    )
+    stored_names = [results[plot_name].result() for plot_name in plot_names.values()]
+
+    plot_urls = await asyncio.gather(
+        *[artifact_manager.get_url(plot_name) for plot_name in stored_names]
+    )
+    return dict(zip(plot_names, plot_urls))
 
 async def get_data_files_dfs(data_file_names: List[str], artifact_manager: AriaArtifacts = None) -> List[pd.DataFrame]:
+    artifact_manager = get_session_artifacts(artifact_manager)
     if artifact_manager is None:
         return await asyncio.gather(*[read_df(file_path) for file_path in data_file_names])
     
-    data_files = []
+    attachments = await artifact_manager.get_attachments_many(data_file_names)
     for file_name in data_file_names:
-        data_file = await artifact_manager.get_attachment(file_name)
-        data_files.append((file_name, data_file.content))
-        
-    return await asyncio.gather(*[read_df(file_path, file_content) for (file_path, file_content) in data_files])
+        if attachments[file_name] is None:
+            raise ValueError(f"No attachment named {file_name} was found in this chat.")
+
+    files = await artifact_manager.get_attachment_files(list(attachments.values()))
+    try:
+        data_files = [(file_name, files[file_name].result()) for file_name in data_file_names]
+        return await asyncio.gather(*[read_df(file_path, file_content) for (file_path, file_content) in data_files])
+    finally:
+        for result in files.values():
+            if result.ok and hasattr(result.value, "close"):
+                result.value.close()
 
 async def get_pai_agent(session_id: str, data_file_names: List[str], artifact_manager: AriaArtifacts = None) -> tuple[PaiAgent, Role]:
     data_files_dfs = await get_data_files_dfs(data_file_names, artifact_manager)
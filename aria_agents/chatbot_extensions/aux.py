@@ -1,17 +1,21 @@
 import os
+import asyncio
 from typing import Callable, List
 import urllib
-import xml.etree.ElementTree as xml
 
-import httpx
-from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core import Settings
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
-from llama_index.readers.papers import PubmedReader
 from pydantic import BaseModel, Field
 from schema_agents import schema_tool
 from aria_agents.artifact_manager import AriaArtifacts
-from aria_agents.utils import load_config, save_file, get_query_index_dir, ask_agent
+from aria_agents.article_cache import get_article_cache
+from aria_agents.corpus_builds import ProgressReporter, corpus_builds
+from aria_agents.embedding_cache import CachedEmbedding, get_embedding_cache
+from aria_agents.pubmed import PubmedFetcher, get_eutils_client, hit_count_cache
+from aria_agents.paper_store import get_paper_store, load_corpus, save_corpus
+from aria_agents.query_engine_cache import query_engine_cache
+from aria_agents.utils import save_file, get_query_index_dir, ask_agent
 
 
 class SummaryWebsite(BaseModel):
@@ -85,6 +89,18 @@ class PMCQuery(BaseModel):
     )
 
 
+# How many queries check_pmc_queries_hits counts at the same time
+HIT_COUNT_CONCURRENCY = int(os.environ.get("ARIA_AGENTS_HIT_COUNT_CONCURRENCY", "3"))
+
+
+async def get_pmc_query_hits(query):
+    n_hits = hit_count_cache.get(query)
+    if n_hits is None:
+        n_hits = await PubmedFetcher(get_eutils_client()).count(query)
+        hit_count_cache.put(query, n_hits)
+    return n_hits
+
+
 @schema_tool
 async def check_pmc_query_hits(
     pmc_query: PMCQuery = Field(
@@ -92,37 +108,55 @@ async def check_pmc_query_hits(
     )
 ) -> str:
     """Tests the `PMCQuery` to see how many hits it returns in the PubMed Central database."""
-    config = load_config()
-    parameters = {
-        "tool": "tool",
-        "email": "email",
-        "db": "pmc",
-        "term": pmc_query.query,
-        "retmax": config["aux"]["paper_limit"],
-    }
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi",
-                params=parameters,
-                timeout=500,
-            )
-            resp.raise_for_status()
+        n_hits = await get_pmc_query_hits(pmc_query.query)
     except Exception as e:
         return f"Failed to execute query: {e}"
 
-    # Parse the XML response
-    root = xml.fromstring(resp.content)
+    return f"The query `{pmc_query.query}` returned {n_hits} hits."
 
-    # Extract the number of hits from the <Count> element
-    n_hits = len([elem for elem in root.iter() if elem.tag == "Id"])
 
-    return f"The query `{pmc_query.query}` returned {n_hits} hits."
+@schema_tool
+async def check_pmc_queries_hits(
+    pmc_queries: List[PMCQuery] = Field(
+        ..., description="The queries to search the NCBI PubMed Central Database."
+    )
+) -> str:
+    """Tests many `PMCQuery`s at once to see how many hits each returns in the PubMed Central database."""
+    semaphore = asyncio.Semaphore(HIT_COUNT_CONCURRENCY)
+
+    async def check(pmc_query):
+        async with semaphore:
+            try:
+                n_hits = await get_pmc_query_hits(pmc_query.query)
+            except Exception as e:
+                return f"The query `{pmc_query.query}` failed: {e}"
+            return f"The query `{pmc_query.query}` returned {n_hits} hits."
+
+    results = await asyncio.gather(*[check(pmc_query) for pmc_query in pmc_queries])
+    return "\n".join(results)
 
 
-async def save_query_index(query_index_dir, documents):
-    query_index = VectorStoreIndex.from_documents(documents)
-    query_index.storage_context.persist(query_index_dir)
+async def save_query_index(query_index_dir, documents, replace=False, progress=None):
+    """Add the papers to the session's corpus, or replace it with them.
+
+    Returns the PMCIDs of the papers added to the corpus and of those that
+    were already in it.
+    """
+    # Papers are indexed once in the shared store, the session keeps their PMCIDs
+    # Chunks already embedded for any session are read from the shared cache
+    embed_model = CachedEmbedding(Settings.embed_model, get_embedding_cache())
+    added, present = await corpus_builds.run(
+        get_paper_store().add_documents, documents, embed_model, progress
+    )
+    corpus = [] if replace else load_corpus(query_index_dir) or []
+    in_corpus = set(corpus)
+    new_papers = [pmcid for pmcid in added + present if pmcid not in in_corpus]
+    existing_papers = [pmcid for pmcid in added + present if pmcid in in_corpus]
+    if new_papers or replace:
+        save_corpus(query_index_dir, corpus + new_papers)
+        query_engine_cache.invalidate(query_index_dir)
+    return new_papers, existing_papers
 
 
 def create_corpus_function(
@@ -134,29 +168,48 @@ def create_corpus_function(
         pmc_query: PMCQuery = Field(
             ...,
             description="The query to search the NCBI PubMed Central Database.",
-        )
+        ),
+        replace: bool = Field(
+            False,
+            description="Replace the existing corpus with the papers found, instead of adding them to it.",
+        ),
     ) -> str:
-        """Searches PubMed Central using `PMCQuery` and creates a citation query engine."""
+        """Searches PubMed Central using `PMCQuery` and adds the papers found to the corpus of the citation query engine."""
         terms = urllib.parse.urlencode({"term": pmc_query.query, "db": "pmc"})
         print(f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?{terms}")
-        # Move more of this to save_query_index for async?
-        loader = PubmedReader()
-        # print(check_pmc_query_hits(pmc_query))
-        documents = loader.load_data(
-            search_query=pmc_query.query,
-            max_results=config["aux"]["paper_limit"],
-        )
-        if len(documents) == 0:
-            return "No papers were found in the PubMed Central database for the given query. Please try different terms for the query."
         Settings.llm = OpenAI(model=config["llm_model"])
         Settings.embed_model = OpenAIEmbedding(model=config["aux"]["embedding_model"])
-        print("Document loading complete")
-
         query_index_dir = get_query_index_dir(artifact_manager)
-
-        await save_query_index(query_index_dir, documents)
-
-        return f"Pubmed corpus with {len(documents)} papers has been created."
+        event_bus = artifact_manager.get_event_bus() if artifact_manager else None
+        progress = ProgressReporter(event_bus, query_index_dir)
+
+        async def build_corpus():
+            try:
+                fetcher = PubmedFetcher(get_eutils_client(), cache=get_article_cache())
+                documents = await fetcher.load_data(
+                    search_query=pmc_query.query,
+                    max_results=config["aux"]["paper_limit"],
+                    progress=progress,
+                )
+                if len(documents) == 0:
+                    message = "No papers were found in the PubMed Central database for the given query. Please try different terms for the query."
+                else:
+                    added, existing = await save_query_index(
+                        query_index_dir, documents, replace, progress
+                    )
+                    message = (
+                        f"Pubmed corpus has been updated: {len(added)} papers were added and"
+                        f" {len(existing)} papers were already in the corpus."
+                    )
+            except Exception as e:
+                progress.finish(f"The corpus build failed: {e}")
+                raise
+            progress.finish(message)
+            return message
+
+        # The build carries on if the tool call is cancelled, queries of the
+        # corpus wait for it
+        return await asyncio.shield(corpus_builds.start(query_index_dir, build_corpus()))
 
     return create_pubmed_corpus
 
@@ -178,22 +231,22 @@ def get_website_prompt(object_type):
     )
 
 
-async def write_website(
+async def generate_website(
     input_model: BaseModel,
     artifact_manager: AriaArtifacts,
     website_type: str,
     llm_model: str = "gpt2",
 ) -> str:
-    """Writes a summary website for the suggested study or experimental protocol
+    """Generates a summary website for the suggested study or experimental protocol
 
     Args:
         input_model: The model containing the data to summarize
-        artifact_manager: The artifact manager to use for storage
+        artifact_manager: The artifact manager whose event bus the agent uses
         website_type: The type of website to generate (e.g., "suggested_study")
         llm_model: The language model to use for generation
 
     Returns:
-        URL of the generated website
+        The HTML code of the website, to be saved as `{website_type}.html`
 
     Raises:
         ValueError: If the generated content is invalid
@@ -234,6 +287,19 @@ async def write_website(
                 + "\n<p><strong>Note: Content was truncated due to size limitations.</strong></p>\n</body></html>"
             )
 
+    return html_content
+
+
+async def write_website(
+    input_model: BaseModel,
+    artifact_manager: AriaArtifacts,
+    website_type: str,
+    llm_model: str = "gpt2",
+) -> str:
+    """Writes a summary website, see `generate_website`, and returns its URL."""
+    html_content = await generate_website(
+        input_model, artifact_manager, website_type, llm_model
+    )
     summary_website_url = await save_file(
         f"{website_type}.html", html_content, artifact_manager
     )
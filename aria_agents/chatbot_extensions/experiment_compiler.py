@@ -8,14 +8,15 @@ from schema_agents.role import create_session_context
 from schema_agents.utils.common import current_session
 from aria_agents.chatbot_extensions.aux import (
     SuggestedStudy,
-    write_website,
+    generate_website,
 )
 from aria_agents.artifact_manager import AriaArtifacts
+from aria_agents.corpus_builds import corpus_builds
 from aria_agents.utils import (
     load_config,
     get_query_index_dir,
-    get_query_function,
-    save_file,
+    get_batch_query_function,
+    save_files,
     get_file,
     get_session_id,
 )
@@ -133,7 +134,7 @@ class CorpusQueriesResponses(BaseModel):
 async def write_protocol(
     protocol: Union[ExperimentalProtocol, SuggestedStudy],
     feedback: ProtocolFeedback,
-    query_function: Callable,
+    batch_query_function: Callable,
     role: Role,
 ) -> ExperimentalProtocol:
     session_id = get_session_id(current_session)
@@ -156,10 +157,7 @@ async def write_protocol(
                 query_messages, output_schema=CorpusQueries
             )
             queries_responses = CorpusQueriesResponses(
-                responses={
-                    query: await query_function(query)
-                    for query in queries.queries
-                }
+                responses=await batch_query_function(queries.queries)
             )
             protocol_messages = list(messages) + [
                 "You searched a corpus of existing protocols for relevant steps in existing protocols and found the following responses",
@@ -193,7 +191,8 @@ def create_experiment_compiler_function(
         suggested_study_content = await get_file("suggested_study.json", artifact_manager)
         suggested_study = SuggestedStudy(**suggested_study_content)
         query_index_dir = get_query_index_dir(artifact_manager)
-        query_function = get_query_function(query_index_dir, config)
+        await corpus_builds.wait(query_index_dir)
+        batch_query_function = get_batch_query_function(query_index_dir, config)
         event_bus = artifact_manager.get_event_bus()
 
         protocol_writer = Role(
@@ -220,7 +219,7 @@ def create_experiment_compiler_function(
         protocol = await write_protocol(
             protocol=suggested_study,
             feedback=None,
-            query_function=query_function,
+            batch_query_function=batch_query_function,
             role=protocol_writer,
         )
 
@@ -233,7 +232,7 @@ def create_experiment_compiler_function(
             protocol = await write_protocol(
                 protocol=protocol,
                 feedback=protocol_feedback,
-                query_function=query_function,
+                batch_query_function=batch_query_function,
                 role=protocol_writer,
             )
 
@@ -244,18 +243,24 @@ def create_experiment_compiler_function(
             )
             revisions += 1
             
-        protocol_url = await save_file("experimental_protocol.json", protocol.model_dump_json(), artifact_manager)
-
-        summary_website_url = await write_website(
+        summary_website = await generate_website(
             protocol,
             artifact_manager,
             "experimental_protocol",
             llm_model,
         )
+        # Both files are committed as one version of the chat artifact
+        file_urls = await save_files(
+            {
+                "experimental_protocol.json": protocol.model_dump_json(),
+                "experimental_protocol.html": summary_website,
+            },
+            artifact_manager,
+        )
 
         return {
-            "summary_website_url": summary_website_url,
-            "protocol_url": protocol_url,
+            "summary_website_url": file_urls["experimental_protocol.html"],
+            "protocol_url": file_urls["experimental_protocol.json"],
         }
 
     return run_experiment_compiler
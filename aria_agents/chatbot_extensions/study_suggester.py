@@ -6,15 +6,18 @@ from schema_agents import schema_tool
 from aria_agents.chatbot_extensions.aux import (
     SuggestedStudy,
     check_pmc_query_hits,
+    check_pmc_queries_hits,
     create_corpus_function,
+    generate_website,
     write_website,
     ask_agent,
 )
 from aria_agents.artifact_manager import AriaArtifacts
+from aria_agents.corpus_builds import corpus_builds
 from aria_agents.utils import (
     get_query_index_dir,
     get_query_function,
-    save_file,
+    save_files,
     get_file,
     call_agent,
 )
@@ -75,7 +78,7 @@ def create_pubmed_query_function(
             instructions="You are the PubMed querier. You take the user's input and use it to create a query to search PubMed Central for relevant papers.",
             messages=[
                 """Take the following user request and generate at least 5 different queries in the schema of 'PMCQuery' to search PubMed Central for relevant papers. 
-                Ensure that all queries include the filter for open access papers. Test each query using the `check_pmc_query_hits` tool to determine which query returns the most hits. 
+                Ensure that all queries include the filter for open access papers. Test all of the queries at once using the `check_pmc_queries_hits` tool (or a single query with `check_pmc_query_hits`) to determine which query returns the most hits. 
                 If no queries return hits, adjust the queries to be more general (for example, by removing the `[Title/Abstract]` field specifications from search terms), and try again.
                 Once you have identified the query with the highest number of hits, use it to create a corpus of papers with the `create_pubmed_corpus`.""",
                 user_request,
@@ -85,6 +88,7 @@ def create_pubmed_query_function(
             constraints=constraints,
             tools=[
                 check_pmc_query_hits,
+                check_pmc_queries_hits,
                 create_corpus_function(artifact_manager, config),
             ],
         )
@@ -114,6 +118,7 @@ def create_study_suggester_function(
         """BEFORE USING THIS FUNCTION YOU NEED TO CREATE A QUERY_FUNCTION FROM THE `query_pubmed` TOOL. Create a study suggestion based on the user's request. This includes a literature review, a suggested study, and a summary website."""
         event_bus = artifact_manager.get_event_bus() if artifact_manager else None
         query_index_dir = get_query_index_dir(artifact_manager)
+        await corpus_builds.wait(query_index_dir)
         query_function = get_query_function(query_index_dir, config)
 
         suggested_study = await call_agent(
@@ -131,20 +136,24 @@ def create_study_suggester_function(
             constraints=constraints,
         )
 
-        summary_website_url = await write_website(
+        summary_website = await generate_website(
             suggested_study,
             artifact_manager,
             "suggested_study",
             llm_model,
         )
-
-        suggested_study_url = await save_file(
-            "suggested_study.json", suggested_study.model_dump_json(), artifact_manager
+        # Both files are committed as one version of the chat artifact
+        file_urls = await save_files(
+            {
+                "suggested_study.html": summary_website,
+                "suggested_study.json": suggested_study.model_dump_json(),
+            },
+            artifact_manager,
         )
 
         return {
-            "summary_website_url": summary_website_url,
-            "suggested_study_url": suggested_study_url,
+            "summary_website_url": file_urls["suggested_study.html"],
+            "suggested_study_url": file_urls["suggested_study.json"],
         }
 
     return run_study_suggester
@@ -178,18 +187,20 @@ def create_create_diagram_function(
             suggested_study=suggested_study, study_diagram=study_diagram
         )
 
-        summary_website_url = await write_website(
+        summary_website = await generate_website(
             study_with_diagram, artifact_manager, "suggested_study", llm_model
         )
-        study_with_diagram_url = await save_file(
-            "study_with_diagram.json",
-            study_with_diagram.model_dump_json(),
+        file_urls = await save_files(
+            {
+                "suggested_study.html": summary_website,
+                "study_with_diagram.json": study_with_diagram.model_dump_json(),
+            },
             artifact_manager,
         )
 
         return {
-            "summary_website_url": summary_website_url,
-            "study_with_diagram_url": study_with_diagram_url,
+            "summary_website_url": file_urls["suggested_study.html"],
+            "study_with_diagram_url": file_urls["study_with_diagram.json"],
         }
 
     return create_diagram
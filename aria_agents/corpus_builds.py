@@ -0,0 +1,124 @@
+import os
+import asyncio
+import secrets
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from schema_agents.schema import StreamEvent
+from schema_agents.utils.common import current_session
+
+
+class ProgressReporter:
+    """Emits the progress of a corpus build as `corpus_progress` events.
+
+    The events are `StreamEvent`s of the session that started the build, so
+    they are shown like the streamed tool calls: a "start" event when the
+    reporter is created, an "in_progress" event per stage update and a
+    "finished" event from `finish`. It may be called from worker threads: the
+    events are emitted on the event loop, in the context of that session, so
+    listeners can tell which session a build belongs to.
+    """
+
+    def __init__(self, event_bus, query_index_dir, name="corpus_build"):
+        self._event_bus = event_bus
+        self._query_index_dir = query_index_dir
+        self._name = name
+        self._query_id = f"{name}-{secrets.token_hex(4)}"
+        self._loop = asyncio.get_running_loop()
+        self._context = contextvars.copy_context()
+        self._session = current_session.get()
+        self._emit("start", arguments="")
+
+    def _emit(self, status, arguments=None, content=None):
+        if self._event_bus is None:
+            return
+        event = StreamEvent(
+            type="function_call",
+            query_id=self._query_id,
+            session=self._session,
+            status=status,
+            name=self._name,
+            arguments=arguments,
+            content=content,
+        )
+        self._loop.call_soon_threadsafe(
+            self._event_bus.emit, "corpus_progress", event, context=self._context
+        )
+
+    def __call__(self, stage, completed, total):
+        message = f"{stage.capitalize()} {completed}/{total}"
+        print(f"Corpus build {self._query_index_dir}: {message}")
+        # The arguments of "in_progress" events are appended to each other
+        self._emit("in_progress", arguments=f"{message}<br>")
+
+    def finish(self, content):
+        """Report the end of the build, with its outcome."""
+        self._emit("finished", content=content)
+
+
+class CorpusBuilds:
+    """Runs corpus builds in the background, one at a time per query index.
+
+    The blocking parts of a build, embedding and persisting papers, run on a
+    pool of worker threads so they don't stall the event loop shared by all
+    sessions. Tools that read a query index await its pending build with
+    `wait`.
+    """
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="aria-corpus-build"
+        )
+        self._builds = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_workers=int(os.environ.get("ARIA_AGENTS_CORPUS_BUILD_WORKERS", "2"))
+        )
+
+    async def run(self, function, *args, **kwargs):
+        """Run a blocking function on the worker pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(function, *args, **kwargs)
+        )
+
+    def start(self, query_index_dir, build):
+        """Start the `build` coroutine after the pending build of the index.
+
+        Returns the task of the build, its completion handle.
+        """
+        query_index_dir = os.path.abspath(query_index_dir)
+        previous = self._builds.get(query_index_dir)
+
+        async def run_after_previous():
+            if previous is not None:
+                await asyncio.gather(previous, return_exceptions=True)
+            return await build
+
+        task = asyncio.create_task(run_after_previous())
+        self._builds[query_index_dir] = task
+
+        def forget(done_task):
+            if self._builds.get(query_index_dir) is done_task:
+                del self._builds[query_index_dir]
+
+        task.add_done_callback(forget)
+        return task
+
+    async def wait(self, query_index_dir):
+        """Wait for the pending build of the index, if any.
+
+        A failed build is reported by the tool that started it, the index is
+        then left as it was before the build.
+        """
+        task = self._builds.get(os.path.abspath(query_index_dir))
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    def pending(self):
+        return len(self._builds)
+
+
+corpus_builds = CorpusBuilds.from_env()
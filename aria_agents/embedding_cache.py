@@ -0,0 +1,226 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Any, List
+from pydantic import PrivateAttr
+from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+
+def get_embedding_namespace(embed_model, chunk_size=None, chunk_overlap=None):
+    """Identify the model and chunking that produced a set of embeddings."""
+    chunk_size = Settings.chunk_size if chunk_size is None else chunk_size
+    chunk_overlap = Settings.chunk_overlap if chunk_overlap is None else chunk_overlap
+    return f"{embed_model.model_name}:{chunk_size}:{chunk_overlap}"
+
+
+class EmbeddingCache:
+    """A SQLite store of text embeddings shared by all sessions of the process.
+
+    Vectors are stored as float32 blobs keyed by the hash of their namespace,
+    see `get_embedding_namespace`, and text. When the stored vectors exceed
+    `max_bytes`, the least recently used ones are deleted.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings"
+            " (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._db.commit()
+        self.size = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    @classmethod
+    def from_env(cls):
+        projects_folder = os.environ.get("PROJECT_FOLDERS", "./projects")
+        return cls(
+            os.environ.get(
+                "ARIA_AGENTS_EMBEDDING_CACHE_PATH",
+                os.path.join(projects_folder, "embedding_cache.sqlite"),
+            ),
+            max_bytes=int(
+                os.environ.get(
+                    "ARIA_AGENTS_EMBEDDING_CACHE_BYTES", str(1024 * 1024 * 1024)
+                )
+            ),
+        )
+
+    @staticmethod
+    def _key(namespace, text):
+        return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, namespace, texts):
+        """Return the cached vector of each text, or None where it isn't cached."""
+        keys = [self._key(namespace, text) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay below SQLite's limit on the number of query parameters
+            for i in range(0, len(keys), 500):
+                batch = list(set(keys[i : i + 500]))
+                rows = self._db.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN"
+                    f" ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update(rows)
+            self._db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(time.time(), key) for key in found],
+            )
+            self._db.commit()
+
+        vectors = [
+            array("f", found[key]).tolist() if key in found else None for key in keys
+        ]
+        n_hits = sum(vector is not None for vector in vectors)
+        self.hits += n_hits
+        self.misses += len(vectors) - n_hits
+        return vectors
+
+    def put_many(self, namespace, texts, vectors):
+        now = time.time()
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            key = self._key(namespace, text)
+            rows[key] = (key, array("f", vector).tobytes(), now)
+        rows = list(rows.values())
+        with self._lock:
+            for key, _, _ in rows:
+                self._remove(key)
+            self._db.executemany(
+                "INSERT INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self.size += sum(len(vector) for _, vector, _ in rows)
+            self._evict()
+            self._db.commit()
+
+    def _remove(self, key):
+        row = self._db.execute(
+            "SELECT LENGTH(vector) FROM embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self.size -= row[0]
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for key, nbytes in rows:
+                if self.size <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self.size -= nbytes
+                self.evictions += 1
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.size,
+        }
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Wraps an embedding model so that only uncached texts are sent to it.
+
+    Query embeddings are passed through, as queries are rarely repeated.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: Any = PrivateAttr()
+    _namespace: str = PrivateAttr()
+
+    def __init__(self, embed_model, cache, namespace=None, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+        self._namespace = namespace or get_embedding_namespace(embed_model)
+
+    @classmethod
+    def class_name(cls):
+        return "CachedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed_model.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self._embed_model.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._cache.get_many(self._namespace, texts)
+        # Texts repeated in the batch are embedded once
+        missing = list(
+            dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None)
+        )
+        if missing:
+            new_vectors = self._embed_model.get_text_embedding_batch(missing)
+            self._cache.put_many(self._namespace, missing, new_vectors)
+            return self._merge(texts, vectors, missing, new_vectors)
+        return vectors
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._cache.get_many(self._namespace, texts)
+        # Texts repeated in the batch are embedded once
+        missing = list(
+            dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None)
+        )
+        if missing:
+            new_vectors = await self._embed_model.aget_text_embedding_batch(missing)
+            self._cache.put_many(self._namespace, missing, new_vectors)
+            return self._merge(texts, vectors, missing, new_vectors)
+        return vectors
+
+    @staticmethod
+    def _merge(texts, vectors, missing, new_vectors):
+        computed = dict(zip(missing, new_vectors))
+        return [
+            vector if vector is not None else computed[text]
+            for text, vector in zip(texts, vectors)
+        ]
+
+
+_embedding_cache = None
+
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache.from_env()
+    return _embedding_cache
@@ -0,0 +1,225 @@
+import os
+import json
+import shutil
+import tempfile
+from urllib.parse import quote, unquote, urlsplit
+import httpx
+from hypha_rpc.rpc import RemoteException
+from aria_agents.artifact_manager import AriaArtifacts, iter_file
+
+LOCAL_BASE_URL = "http://local-artifacts"
+
+
+class LocalArtifactService:
+    """The subset of the hypha artifact manager API used by `AriaArtifacts`,
+    implemented on a local directory.
+
+    Each artifact is a directory holding its `info.json` (manifest and
+    versions) and one sub-directory per committed version. Like Hypha, staging
+    starts an empty version, into which `copy_files` hard-links the top-level
+    files of the latest one. Uploads replace files rather than writing into
+    them, and committing renames the staged directory to a new version.
+    File URLs point at `base_url` and are served by `LocalFileTransport`.
+    """
+
+    def __init__(self, root, base_url=LOCAL_BASE_URL):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(self.root, exist_ok=True)
+
+    def _artifact_dir(self, artifact_id):
+        workspace, _, alias = artifact_id.partition("/")
+        return self._resolve(self.root, os.path.join(workspace, *alias.split(":")))
+
+    def _resolve(self, base, file_path):
+        path = os.path.abspath(os.path.join(base, file_path))
+        if os.path.commonpath([path, base]) != base:
+            raise RemoteException(f"Invalid file path: {file_path}")
+        return path
+
+    def _read_info(self, artifact_id):
+        info_path = os.path.join(self._artifact_dir(artifact_id), "info.json")
+        if not os.path.exists(info_path):
+            raise RemoteException(f"Artifact does not exist: {artifact_id}")
+        with open(info_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_info(self, artifact_id, info):
+        artifact_dir = self._artifact_dir(artifact_id)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=artifact_dir, delete=False, encoding="utf-8"
+        ) as f:
+            json.dump(info, f)
+        os.replace(f.name, os.path.join(artifact_dir, "info.json"))
+
+    def _version_dir(self, artifact_id, version):
+        return os.path.join(self._artifact_dir(artifact_id), f"v{version}")
+
+    def _stage_dir(self, artifact_id):
+        return os.path.join(self._artifact_dir(artifact_id), "stage")
+
+    def _url(self, path):
+        return f"{self.base_url}/{quote(os.path.relpath(path, self.root))}"
+
+    async def create(
+        self, type, alias, manifest, workspace=None, parent_id=None
+    ):
+        workspace = workspace or parent_id.split("/")[0]
+        artifact_id = f"{workspace}/{alias}"
+        if os.path.exists(os.path.join(self._artifact_dir(artifact_id), "info.json")):
+            raise RemoteException(f"Artifact already exists: {artifact_id}")
+        os.makedirs(self._artifact_dir(artifact_id), exist_ok=True)
+        os.makedirs(self._version_dir(artifact_id, 0), exist_ok=True)
+        info = {"id": artifact_id, "type": type, "manifest": manifest, "versions": []}
+        self._write_info(artifact_id, info)
+        return info
+
+    async def read(self, artifact_id, silent=False):
+        return self._read_info(artifact_id)
+
+    async def edit(self, artifact_id, manifest=None, version=None, copy_files=None):
+        info = self._read_info(artifact_id)
+        if manifest is not None:
+            info["manifest"] = manifest
+            self._write_info(artifact_id, info)
+        stage_dir = self._stage_dir(artifact_id)
+        if version == "stage" and not os.path.exists(stage_dir):
+            os.makedirs(stage_dir)
+            if copy_files:
+                version_dir = self._version_dir(artifact_id, len(info["versions"]))
+                for entry in os.scandir(version_dir):
+                    if entry.is_file():
+                        os.link(entry.path, os.path.join(stage_dir, entry.name))
+        return info
+
+    async def put_file(self, artifact_id, file_path):
+        stage_dir = self._stage_dir(artifact_id)
+        if not os.path.exists(stage_dir):
+            raise RemoteException(f"Artifact is not staged: {artifact_id}")
+        return self._url(self._resolve(stage_dir, file_path))
+
+    async def remove_file(self, artifact_id, file_path):
+        stage_dir = self._stage_dir(artifact_id)
+        if not os.path.exists(stage_dir):
+            raise RemoteException(f"Artifact is not staged: {artifact_id}")
+        path = self._resolve(stage_dir, file_path)
+        if not os.path.isfile(path):
+            raise RemoteException(f"File does not exist: {file_path}")
+        os.remove(path)
+
+    async def commit(self, artifact_id, version=None):
+        info = self._read_info(artifact_id)
+        stage_dir = self._stage_dir(artifact_id)
+        if not os.path.exists(stage_dir):
+            raise RemoteException(f"Artifact is not staged: {artifact_id}")
+        info["versions"].append({"version": f"v{len(info['versions'])}"})
+        os.rename(stage_dir, self._version_dir(artifact_id, len(info["versions"])))
+        self._write_info(artifact_id, info)
+        return info
+
+    async def get_file(self, artifact_id, file_path, version=None):
+        info = self._read_info(artifact_id)
+        names = [entry["version"] for entry in info["versions"]]
+        if version is not None and version not in names:
+            raise RemoteException(f"Artifact version '{version}' does not exist.")
+        # The directory of a committed version is one past its index
+        index = len(names) if version is None else names.index(version) + 1
+        version_dir = self._version_dir(artifact_id, index)
+        path = self._resolve(version_dir, file_path)
+        if not os.path.isfile(path):
+            raise RemoteException(f"File does not exist: {file_path}")
+        return self._url(path)
+
+    async def delete(self, artifact_id, delete_files=False, recursive=False):
+        self._read_info(artifact_id)
+        shutil.rmtree(self._artifact_dir(artifact_id))
+
+
+class LocalFileTransport(httpx.AsyncBaseTransport):
+    """Serves the PUTs and GETs of `LocalArtifactService` URLs from disk."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    async def handle_async_request(self, request):
+        path = os.path.abspath(
+            os.path.join(self.root, unquote(urlsplit(str(request.url)).path[1:]))
+        )
+        if os.path.commonpath([path, self.root]) != self.root:
+            return httpx.Response(403)
+
+        if request.method == "PUT":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Replace the file, it may be hard-linked to committed versions
+            with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(path), delete=False
+            ) as f:
+                async for chunk in request.stream:
+                    f.write(chunk)
+            os.replace(f.name, path)
+            return httpx.Response(200)
+
+        if request.method == "GET":
+            if not os.path.isfile(path):
+                return httpx.Response(404)
+            return httpx.Response(
+                200,
+                headers={"Content-Length": str(os.path.getsize(path))},
+                content=iter_file(path),
+            )
+
+        return httpx.Response(405)
+
+
+class LocalTransferClient:
+    """A `TransferClient` stand-in whose requests never leave the machine."""
+
+    def __init__(self, root):
+        self._transport = LocalFileTransport(root)
+        self._client = None
+
+    def get(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(transport=self._transport)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+class LocalArtifacts(AriaArtifacts):
+    """`AriaArtifacts` backed by a local directory instead of Hypha and S3.
+
+    Puts, gets, removes, attachments, versions and `store_put` events behave
+    like the remote backend, so the full chat pipeline can be run and
+    benchmarked on one machine.
+    """
+
+    def __init__(
+        self, root, event_bus=None, http_client=None, cache=None, known=None
+    ):
+        self.root = os.path.abspath(root)
+        super().__init__(
+            event_bus=event_bus,
+            http_client=http_client or LocalTransferClient(self.root),
+            cache=cache,
+            known=known,
+        )
+
+    @classmethod
+    def from_env(cls, event_bus=None):
+        return cls(
+            os.environ.get("ARIA_AGENTS_LOCAL_ARTIFACTS_DIR", "./artifacts"),
+            event_bus,
+        )
+
+    async def setup(self, token, user_id, session_id, service_id=None):
+        self._svc = LocalArtifactService(self.root)
+        await self._open_session(user_id, session_id)
+
+    def _new_handle(self):
+        return LocalArtifacts(
+            self.root, self._event_bus, self._http, self._cache, self._known
+        )
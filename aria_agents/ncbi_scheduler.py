@@ -0,0 +1,142 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+import httpx
+from schema_agents.utils.common import current_session
+from aria_agents.artifact_manager import get_session_artifacts
+
+
+def get_request_session():
+    """The chat session a request is made for, None outside of a session."""
+    session_artifacts = get_session_artifacts()
+    if session_artifacts is not None:
+        return session_artifacts.session_id
+    session = current_session.get()
+    return session.id if session else None
+
+
+class NCBIScheduler:
+    """Schedules the E-utilities requests of the whole process.
+
+    NCBI allows 3 requests per second from an IP, or 10 with an API key.
+    Requests are released by a token bucket refilled at `rate` per second,
+    holding at most `burst` tokens. Waiting requests are queued per session,
+    and the queues are served round-robin, so one session fetching a large
+    corpus doesn't hold up the hit counts of the others.
+    """
+
+    def __init__(self, rate=3.0, burst=1, api_key=None):
+        self.rate = rate
+        self.burst = burst
+        self.api_key = api_key
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._queues = OrderedDict()
+        self._dispatcher = None
+        self.requests = 0
+        self.throttled = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @classmethod
+    def from_env(cls):
+        api_key = os.environ.get("NCBI_API_KEY") or None
+        return cls(rate=10.0 if api_key else 3.0, api_key=api_key)
+
+    def queue_depth(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def acquire(self, session=None):
+        """Wait for the turn of a request of `session`."""
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(session, deque()).append((future, time.monotonic()))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+        if (
+            self._dispatcher is None
+            or self._dispatcher.done()
+            or self._dispatcher.get_loop() is not future.get_loop()
+        ):
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def _dispatch(self):
+        while self._queues:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            session, queue = next(iter(self._queues.items()))
+            future, enqueued = queue.popleft()
+            if queue:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            if future.done() or future.get_loop().is_closed():
+                # The request was cancelled while it waited
+                continue
+            self._tokens -= 1
+            wait = time.monotonic() - enqueued
+            self.requests += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            future.set_result(None)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "mean_wait": self.total_wait / self.requests if self.requests else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Sends requests when the scheduler allows it, retrying throttled ones.
+
+    A 429 response is retried up to `max_retries` times, after its
+    Retry-After delay or else an exponential backoff from `backoff` seconds.
+    """
+
+    def __init__(self, scheduler, transport=None, max_retries=4, backoff=1.0):
+        self._scheduler = scheduler
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    async def handle_async_request(self, request):
+        if self._scheduler.api_key:
+            request.url = request.url.copy_merge_params(
+                {"api_key": self._scheduler.api_key}
+            )
+        session = get_request_session()
+        for attempt in range(self.max_retries + 1):
+            await self._scheduler.acquire(session)
+            response = await self._transport.handle_async_request(request)
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            await response.aclose()
+            self._scheduler.throttled += 1
+            try:
+                delay = float(response.headers["Retry-After"])
+            except (KeyError, ValueError):
+                delay = self.backoff * 2**attempt
+            print(f"NCBI throttled {request.url.path}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+ncbi_scheduler = NCBIScheduler.from_env()
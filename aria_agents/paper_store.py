@@ -0,0 +1,335 @@
+import os
+import re
+import json
+import tempfile
+import threading
+from llama_index.core import Settings, StorageContext, VectorStoreIndex
+from llama_index.core.data_structs import IndexDict
+from llama_index.core.indices.vector_store.retrievers import VectorIndexRetriever
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.query_engine import CitationQueryEngine
+from llama_index.core.schema import MetadataMode
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+from aria_agents.bm25 import BM25Index, BM25Retriever, BM25Segment, HybridRetriever
+from aria_agents.vector_store import VECTOR_STORE_FNAME, MemmapVectorStore
+
+PMCID_PATTERN = re.compile(r"PMC\d+")
+SEGMENT_PATTERN = re.compile(r"\d+\.json")
+
+# The session's view of the paper store, written to its query index directory
+CORPUS_FILE = "corpus.json"
+
+
+def get_pmcid(document):
+    """Return the PMCID of a paper loaded from PubMed Central, from its URL."""
+    match = PMCID_PATTERN.search(document.metadata.get("URL", ""))
+    return match.group(0) if match else document.doc_id
+
+
+def write_json(path, content):
+    # Write to a temporary file first so readers never see a partial file
+    with tempfile.NamedTemporaryFile(
+        "w", dir=os.path.dirname(path), delete=False, encoding="utf-8"
+    ) as f:
+        json.dump(content, f)
+    os.replace(f.name, path)
+
+
+def save_corpus(query_index_dir, pmcids):
+    os.makedirs(query_index_dir, exist_ok=True)
+    write_json(os.path.join(query_index_dir, CORPUS_FILE), {"pmcids": list(pmcids)})
+
+
+def load_corpus(query_index_dir):
+    """Return the PMCIDs of a session's corpus, or None for a private index."""
+    corpus_path = os.path.join(query_index_dir, CORPUS_FILE)
+    if not os.path.exists(corpus_path):
+        return None
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        return json.load(f)["pmcids"]
+
+
+class PaperStore:
+    """One query index holding every paper loaded by any session, keyed by PMCID.
+
+    Each paper is chunked and embedded once, however many sessions use it. A
+    session's corpus is the list of its PMCIDs, whose chunks its queries are
+    restricted to. The index is loaded once and kept in memory. Embeddings are
+    kept in a `MemmapVectorStore`, so loading the index doesn't parse them.
+
+    Each build persists only what it added: its vectors are appended to the
+    vector store, and its chunks, their BM25 postings and its papers are
+    written as a new segment file. Loading the store reads all segments.
+
+    Papers are added by corpus builds on worker threads, while queries read
+    the store on the event loop, so readers never take a lock. Builds embed
+    their papers unlocked, and only hold the lock to add them to the store.
+    Papers are published last, so readers never see papers whose chunks
+    aren't indexed yet.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.index_dir = os.path.join(self.root, "index")
+        self.segments_dir = os.path.join(self.root, "segments")
+        # The files of stores persisted whole, before segments
+        self.papers_path = os.path.join(self.root, "papers.json")
+        self.bm25_path = os.path.join(self.root, "bm25.json")
+        self._index = None
+        self._bm25 = None
+        self._papers = None
+        self._next_segment = 0
+        # Serialises the builds adding papers, queries never wait for it
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        projects_folder = os.environ.get("PROJECT_FOLDERS", "./projects")
+        return cls(
+            os.environ.get(
+                "ARIA_AGENTS_PAPER_STORE_DIR",
+                os.path.join(projects_folder, "paper_store"),
+            )
+        )
+
+    def _load(self):
+        if self._papers is not None:
+            return
+        with self._load_lock:
+            if self._papers is not None:
+                return
+            if os.path.exists(self.papers_path):
+                self._convert_whole_store()
+
+            papers = {}
+            nodes = []
+            bm25_segments = []
+            segment_names = (
+                sorted(os.listdir(self.segments_dir))
+                if os.path.exists(self.segments_dir)
+                else []
+            )
+            for name in segment_names:
+                if not SEGMENT_PATTERN.fullmatch(name):
+                    continue
+                with open(
+                    os.path.join(self.segments_dir, name), "r", encoding="utf-8"
+                ) as f:
+                    segment = json.load(f)
+                papers.update(segment["papers"])
+                nodes.extend(json_to_doc(node) for node in segment["nodes"])
+                bm25_segments.append(BM25Segment.from_dict(segment["bm25"]))
+                self._next_segment = int(name.split(".")[0]) + 1
+
+            docstore = SimpleDocumentStore()
+            docstore.add_documents(nodes)
+            index_struct = IndexDict()
+            for node in nodes:
+                index_struct.add_node(node, text_id=node.node_id)
+            vector_store = MemmapVectorStore.from_persist_dir(self.index_dir)
+            # Vectors of a build that failed before writing its segment
+            orphans = [
+                node_id
+                for node_id in vector_store.node_ids
+                if node_id not in index_struct.nodes_dict
+            ]
+            if orphans:
+                vector_store.delete_nodes(orphans)
+            self._index = VectorStoreIndex(
+                index_struct=index_struct,
+                storage_context=StorageContext.from_defaults(
+                    docstore=docstore, vector_store=vector_store
+                ),
+            )
+            self._bm25 = BM25Index()
+            if bm25_segments:
+                self._bm25.segments = (BM25Segment.merge(bm25_segments),)
+            self._papers = papers
+
+    def _convert_whole_store(self):
+        """Convert a store persisted whole, before segments, to one segment."""
+        with open(self.papers_path, "r", encoding="utf-8") as f:
+            papers = json.load(f)
+        docstore = SimpleDocumentStore.from_persist_dir(self.index_dir)
+        nodes = list(docstore.docs.values())
+        if os.path.exists(self.bm25_path):
+            bm25_segments = BM25Index.load(self.bm25_path).segments
+        else:
+            bm25_segments = BM25Index.from_nodes(nodes).segments
+        self._write_segment(papers, nodes, BM25Segment.merge(bm25_segments))
+        for name in ["docstore.json", "index_store.json", "graph_store.json"]:
+            path = os.path.join(self.index_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        if os.path.exists(self.bm25_path):
+            os.remove(self.bm25_path)
+        os.remove(self.papers_path)
+
+    def _write_segment(self, papers, nodes, bm25_segment):
+        os.makedirs(self.segments_dir, exist_ok=True)
+        write_json(
+            os.path.join(self.segments_dir, f"{self._next_segment:08d}.json"),
+            {
+                "papers": papers,
+                "nodes": [doc_to_json(node) for node in nodes],
+                "bm25": bm25_segment.to_dict(),
+            },
+        )
+        self._next_segment += 1
+
+    def get_index(self):
+        self._load()
+        return self._index
+
+    def __contains__(self, pmcid):
+        self._load()
+        return pmcid in self._papers
+
+    def add_documents(self, documents, embed_model=None, progress=None):
+        """Index the papers that aren't stored yet.
+
+        `progress(stage, completed, total)` is called as chunks are embedded
+        and once they are persisted. Returns the PMCIDs of the papers that
+        were added and of those that were already present.
+        """
+        embed_model = embed_model or Settings.embed_model
+        self._load()
+        new_documents = {}
+        present = []
+        for document in documents:
+            pmcid = get_pmcid(document)
+            if pmcid in self._papers:
+                if pmcid not in present:
+                    present.append(pmcid)
+            elif pmcid not in new_documents:
+                new_documents[pmcid] = document
+        if not new_documents:
+            return [], present
+
+        for pmcid, document in new_documents.items():
+            document.metadata["PMCID"] = pmcid
+        nodes = run_transformations(
+            list(new_documents.values()), Settings.transformations
+        )
+        batch_size = embed_model.embed_batch_size
+        for start in range(0, len(nodes), batch_size):
+            batch = nodes[start : start + batch_size]
+            embeddings = embed_model.get_text_embedding_batch(
+                [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+            )
+            for node, embedding in zip(batch, embeddings):
+                node.embedding = embedding
+            if progress is not None:
+                progress("embedded", start + len(batch), len(nodes))
+
+        with self._lock:
+            # Another build may have added some of the papers meanwhile
+            for pmcid in list(new_documents):
+                if pmcid in self._papers:
+                    del new_documents[pmcid]
+                    present.append(pmcid)
+            if not new_documents:
+                return [], present
+            nodes = [node for node in nodes if node.metadata["PMCID"] in new_documents]
+            self._index.insert_nodes(nodes)
+            bm25_segment = self._bm25.add_many(
+                (node.node_id, node.get_content(metadata_mode=MetadataMode.NONE))
+                for node in nodes
+            )
+
+            papers = {
+                pmcid: {
+                    "title": document.metadata.get("Title of this paper", ""),
+                    "url": document.metadata.get("URL", ""),
+                    "node_ids": [],
+                }
+                for pmcid, document in new_documents.items()
+            }
+            for node in nodes:
+                papers[node.metadata["PMCID"]]["node_ids"].append(node.node_id)
+
+            self._index.vector_store.persist(
+                os.path.join(self.index_dir, VECTOR_STORE_FNAME)
+            )
+            # The docstore copies of the nodes are stored without their embedding
+            self._write_segment(
+                papers,
+                [self._index.docstore.get_node(node.node_id) for node in nodes],
+                bm25_segment,
+            )
+            self._papers.update(papers)
+        if progress is not None:
+            progress("persisted", len(new_documents), len(new_documents))
+        return list(new_documents), present
+
+    def get_node_ids(self, pmcids):
+        self._load()
+        return [
+            node_id
+            for pmcid in pmcids
+            for node_id in self._papers.get(pmcid, {}).get("node_ids", [])
+        ]
+
+    def get_bm25_index(self):
+        self._load()
+        return self._bm25
+
+    def get_retriever(
+        self, pmcids, similarity_top_k, retriever_mode="vector", embed_model=None
+    ):
+        """A retriever of the chunks of the given papers.
+
+        `retriever_mode` is "vector", "bm25" or "hybrid", which fuses the
+        rankings of the other two. Queries are embedded with the current global
+        embedding model rather than the one the index was loaded with.
+        """
+        index = self.get_index()
+        node_ids = self.get_node_ids(pmcids)
+        # Fusion reranks the candidates of both retrievers, so fetch more of them
+        candidates = similarity_top_k * 2 if retriever_mode == "hybrid" else similarity_top_k
+        vector_retriever = VectorIndexRetriever(
+            index,
+            similarity_top_k=candidates,
+            node_ids=node_ids,
+            embed_model=embed_model or Settings.embed_model,
+        )
+        bm25_retriever = BM25Retriever(
+            self.get_bm25_index(), index.docstore, candidates, node_ids
+        )
+        if retriever_mode == "vector":
+            return vector_retriever
+        if retriever_mode == "bm25":
+            return bm25_retriever
+        if retriever_mode == "hybrid":
+            return HybridRetriever(vector_retriever, bm25_retriever, similarity_top_k)
+        raise ValueError(f"Unknown retriever mode: {retriever_mode}")
+
+    def get_query_engine(
+        self,
+        pmcids,
+        similarity_top_k,
+        citation_chunk_size,
+        retriever_mode="vector",
+        embed_model=None,
+    ):
+        """A citation query engine that only retrieves from the given papers."""
+        retriever = self.get_retriever(
+            pmcids, similarity_top_k, retriever_mode, embed_model
+        )
+        return CitationQueryEngine.from_args(
+            self.get_index(),
+            retriever=retriever,
+            citation_chunk_size=citation_chunk_size,
+        )
+
+
+_paper_store = None
+
+
+def get_paper_store():
+    global _paper_store
+    if _paper_store is None:
+        _paper_store = PaperStore.from_env()
+    return _paper_store
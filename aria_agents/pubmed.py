@@ -0,0 +1,285 @@
+import os
+import re
+import time
+import weakref
+import asyncio
+import xml.etree.ElementTree as xml
+from collections import OrderedDict
+from typing import List
+import httpx
+from llama_index.core import Document
+from aria_agents.corpus_builds import corpus_builds
+from aria_agents.ncbi_scheduler import RateLimitedTransport, ncbi_scheduler
+
+EUTILS_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+BOOLEAN_OPERATOR = re.compile(r"\b(AND|OR|NOT)\b")
+# How many articles are fetched per efetch request, and how many at once
+FETCH_BATCH_SIZE = int(os.environ.get("ARIA_AGENTS_PUBMED_BATCH_SIZE", "20"))
+FETCH_CONCURRENCY = int(os.environ.get("ARIA_AGENTS_PUBMED_CONCURRENCY", "3"))
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_eutils_client():
+    """The HTTP client shared by all E-utilities requests of the event loop.
+
+    Its requests are scheduled by the process-wide `ncbi_scheduler`.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=500, transport=RateLimitedTransport(ncbi_scheduler)
+        )
+        _clients[loop] = client
+    return client
+
+
+def normalize_query(search_query):
+    """Collapse whitespace and lowercase all but the Boolean operators.
+
+    PubMed searches terms and field tags ignoring case, but only reads AND, OR
+    and NOT in upper case as operators, in lower case they are search terms.
+    """
+    parts = BOOLEAN_OPERATOR.split(" ".join(search_query.split()))
+    # The operators are the odd parts, split by the capturing group
+    return "".join(part if i % 2 else part.lower() for i, part in enumerate(parts))
+
+
+class HitCountCache:
+    """An LRU cache of the number of hits of PubMed Central queries.
+
+    Queries are keyed by their normalized text, and counts are kept for
+    `ttl` seconds, as new papers are added to PubMed Central.
+    """
+
+    def __init__(self, ttl=3600, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(ttl=float(os.environ.get("ARIA_AGENTS_HIT_COUNT_TTL", "3600")))
+
+    def get(self, search_query):
+        key = normalize_query(search_query)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, search_query, count):
+        key = normalize_query(search_query)
+        self._entries[key] = (count, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+hit_count_cache = HitCountCache.from_env()
+
+
+def get_article_pmcid(article):
+    for article_id in article.iter("article-id"):
+        if article_id.get("pub-id-type") in ("pmc", "pmcid") and article_id.text:
+            pmcid = article_id.text.strip()
+            return pmcid if pmcid.startswith("PMC") else f"PMC{pmcid}"
+    return None
+
+
+def parse_article(article):
+    """Convert a PMC article to a `Document`, as `PubmedReader` does."""
+    pmcid = get_article_pmcid(article)
+    if pmcid is None:
+        return None
+    title = article.find("./front/article-meta/title-group/article-title")
+    if title is None:
+        title = article.find(".//article-title")
+    title = "".join(title.itertext()) if title is not None else ""
+    journal = article.find(".//journal-title")
+    text = "".join(
+        element.text.strip() + " " for element in article.iter() if element.text
+    )
+    return Document(
+        text=text,
+        extra_info={
+            "Title of this paper": title,
+            "Journal it was published in:": journal.text if journal is not None else "",
+            "URL": f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmcid}/",
+        },
+    )
+
+
+class PubmedFetcher:
+    """Fetches the full text of PubMed Central papers with E-utilities.
+
+    A query is searched once, with its results kept on the NCBI history
+    server, and its papers are then fetched in batches of `batch_size`,
+    `concurrency` batches at a time. Each response is parsed as it streams
+    in, one article at a time.
+
+    With an `ArticleCache`, cached articles aren't fetched again, the others
+    are fetched by ID and added to the cache. The cache is read and written
+    on the corpus build workers.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        batch_size=FETCH_BATCH_SIZE,
+        concurrency=FETCH_CONCURRENCY,
+        base_url=EUTILS_URL,
+        cache=None,
+    ):
+        self._client = client
+        self._cache = cache
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.base_url = base_url
+
+    async def search(self, search_query, max_results):
+        """Return the IDs found, and the WebEnv and query key of the search."""
+        resp = await self._client.get(
+            f"{self.base_url}/esearch.fcgi",
+            params={
+                "tool": "tool",
+                "email": "email",
+                "db": "pmc",
+                "term": search_query,
+                "retmax": max_results,
+                "usehistory": "y",
+            },
+        )
+        resp.raise_for_status()
+        root = xml.fromstring(resp.content)
+        ids = [elem.text for elem in root.iter("Id")]
+        return ids, root.findtext("WebEnv"), root.findtext("QueryKey")
+
+    async def count(self, search_query):
+        """Return the number of hits of a query, without fetching their IDs."""
+        resp = await self._client.get(
+            f"{self.base_url}/esearch.fcgi",
+            params={
+                "tool": "tool",
+                "email": "email",
+                "db": "pmc",
+                "term": search_query,
+                "rettype": "count",
+            },
+        )
+        resp.raise_for_status()
+        return int(xml.fromstring(resp.content).findtext("Count", "0"))
+
+    async def fetch_batch(self, ids, webenv=None, query_key=None, retstart=0):
+        """Fetch and parse the articles of `ids`, returned by PMCID.
+
+        With a WebEnv and query key, the batch is read from the search results
+        on the history server, starting at `retstart`.
+        """
+        parameters = {"tool": "tool", "email": "email", "db": "pmc"}
+        if webenv and query_key:
+            parameters.update(
+                {
+                    "WebEnv": webenv,
+                    "query_key": query_key,
+                    "retstart": retstart,
+                    "retmax": len(ids),
+                }
+            )
+        else:
+            parameters["id"] = ",".join(ids)
+
+        documents = {}
+        articles = []
+        parser = xml.XMLPullParser(events=("start", "end"))
+        depth = 0
+
+        def read_events():
+            nonlocal depth
+            for event, element in parser.read_events():
+                if event == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1 and element.tag == "article":
+                    document = parse_article(element)
+                    if document is not None:
+                        pmcid = get_article_pmcid(element)
+                        documents[pmcid] = document
+                        if self._cache is not None:
+                            articles.append((pmcid, xml.tostring(element), document))
+                    # Parsed articles are dropped, so a batch is never held whole
+                    element.clear()
+
+        async with self._client.stream(
+            "GET", f"{self.base_url}/efetch.fcgi", params=parameters
+        ) as resp:
+            resp.raise_for_status()
+            async for chunk in resp.aiter_bytes():
+                parser.feed(chunk)
+                read_events()
+        parser.close()
+        read_events()
+        if articles:
+            # Compressing and committing them would stall the event loop
+            await corpus_builds.run(self._cache.put_many, articles)
+        return documents
+
+    async def load_data(
+        self, search_query: str, max_results: int = 10, progress=None
+    ) -> List[Document]:
+        """Search PubMed Central and fetch the full text of the papers found.
+
+        `progress("fetched", completed, total)` is called as batches arrive.
+        Batches that fail are skipped, as `PubmedReader` skips papers.
+        """
+        ids, webenv, query_key = await self.search(search_query, max_results)
+        if not ids:
+            return []
+
+        documents = {}
+        missing_ids = ids
+        if self._cache is not None:
+            documents = await corpus_builds.run(
+                self._cache.get_many, [f"PMC{_id}" for _id in ids]
+            )
+            missing_ids = [_id for _id in ids if f"PMC{_id}" not in documents]
+            if len(missing_ids) < len(ids):
+                # The missing articles are scattered through the search results
+                webenv = query_key = None
+                if progress is not None:
+                    progress("fetched", len(documents), len(ids))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        completed = len(ids) - len(missing_ids)
+
+        async def fetch(start):
+            nonlocal completed
+            batch_ids = missing_ids[start : start + self.batch_size]
+            async with semaphore:
+                try:
+                    batch = await self.fetch_batch(batch_ids, webenv, query_key, start)
+                except (httpx.HTTPError, xml.ParseError) as e:
+                    print(f"Unable to fetch PMC{batch_ids[0]}-PMC{batch_ids[-1]}:", e)
+                    batch = {}
+            completed += len(batch_ids)
+            if progress is not None:
+                progress("fetched", completed, len(ids))
+            return batch
+
+        batches = await asyncio.gather(
+            *[fetch(start) for start in range(0, len(missing_ids), self.batch_size)]
+        )
+        for batch in batches:
+            documents.update(batch)
+        return [documents[f"PMC{_id}"] for _id in ids if f"PMC{_id}" in documents]
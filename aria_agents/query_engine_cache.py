@@ -0,0 +1,95 @@
+import os
+from collections import OrderedDict
+
+
+def get_index_fingerprint(query_index_dir):
+    """The name, size and modification time of each persisted index file."""
+    with os.scandir(query_index_dir) as entries:
+        return tuple(
+            sorted(
+                (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                for entry in entries
+                if entry.is_file()
+            )
+        )
+
+
+class QueryEngineCache:
+    """An LRU cache of the query engines loaded from persisted query indices.
+
+    Entries are keyed by the index directory and the engine settings, and
+    remember the fingerprint of the files they were loaded from, so an index
+    rebuilt on disk is loaded again. The cache is bounded by its number of
+    engines and by their estimated size, taken as the size of their files.
+    """
+
+    def __init__(self, max_entries=16, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(
+                os.environ.get("ARIA_AGENTS_QUERY_ENGINE_CACHE_SIZE", "16")
+            ),
+            max_bytes=int(
+                os.environ.get(
+                    "ARIA_AGENTS_QUERY_ENGINE_CACHE_BYTES", str(512 * 1024 * 1024)
+                )
+            ),
+        )
+
+    def get(self, query_index_dir, settings, load):
+        """Return the cached engine for the index, or `load()` and cache it."""
+        query_index_dir = os.path.abspath(query_index_dir)
+        key = (query_index_dir, *settings)
+        fingerprint = get_index_fingerprint(query_index_dir)
+        entry = self._entries.get(key)
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry["engine"]
+
+        self.misses += 1
+        self._remove(key)
+        engine = load()
+        nbytes = sum(size for _, size, _ in fingerprint)
+        if nbytes <= self.max_bytes:
+            self._entries[key] = {
+                "engine": engine,
+                "fingerprint": fingerprint,
+                "nbytes": nbytes,
+            }
+            self.size += nbytes
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return engine
+
+    def invalidate(self, query_index_dir):
+        query_index_dir = os.path.abspath(query_index_dir)
+        for key in [key for key in self._entries if key[0] == query_index_dir]:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry["nbytes"]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.size,
+        }
+
+
+query_engine_cache = QueryEngineCache.from_env()
@@ -1,4 +1,7 @@
 import os
+import time
+import asyncio
+from collections import OrderedDict
 from hypha_rpc import connect_to_server, login
 
 
@@ -21,3 +24,183 @@ async def get_server(server_url, workspace_name=None, provided_token=None):
         }
     )
     return server
+
+
+class PooledConnection:
+    def __init__(self, server):
+        self.server = server
+        self.services = {}
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+        # The handles using the connection, which is only closed once unused
+        self.leases = 0
+        self.retired = False
+        self.closed = False
+
+    async def get_service(self, service_id):
+        if service_id not in self.services:
+            self.services[service_id] = await self.server.get_service(service_id)
+        return self.services[service_id]
+
+
+class HyphaConnectionPool:
+    """An LRU pool of hypha server connections keyed by server, token and workspace.
+
+    Handles that keep using a connection, such as the artifact handle of a
+    chat session, `lease` it and `release` it when they are done. Idle
+    connections, unleased for longer than `idle_ttl` seconds, are closed, and
+    the least recently used idle connections are closed while the pool
+    exceeds `max_size`. A reused connection that has been idle for
+    `health_check_interval` seconds is pinged first and reopened if it no
+    longer responds, the broken one being closed once it is released.
+    """
+
+    def __init__(
+        self,
+        max_size=32,
+        idle_ttl=600.0,
+        health_check_interval=30.0,
+        connect=None,
+    ):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.health_check_interval = health_check_interval
+        self._connect = connect or get_server
+        self._connections = OrderedDict()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_size=int(os.environ.get("ARIA_AGENTS_HYPHA_POOL_SIZE", "32")),
+            idle_ttl=float(os.environ.get("ARIA_AGENTS_HYPHA_POOL_TTL", "600")),
+        )
+
+    async def get_server(self, server_url, token=None, workspace_name=None):
+        connection = await self._acquire(server_url, token, workspace_name)
+        return connection.server
+
+    async def get_service(
+        self, server_url, service_id, token=None, workspace_name=None
+    ):
+        connection = await self._acquire(server_url, token, workspace_name)
+        return await connection.get_service(service_id)
+
+    async def lease(self, server_url, token=None, workspace_name=None):
+        """Return a connection that isn't closed until it is released."""
+        return await self._acquire(server_url, token, workspace_name, lease=True)
+
+    async def release(self, connection):
+        connection.leases -= 1
+        connection.last_used = time.monotonic()
+        if connection.retired and connection.leases == 0:
+            await self._disconnect(connection)
+
+    async def _acquire(self, server_url, token, workspace_name, lease=False):
+        key = (server_url, token, workspace_name)
+        await self._evict_expired()
+        lock = self._key_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            connection = self._connections.get(key)
+            if connection is not None and not await self._is_healthy(connection):
+                self.reconnects += 1
+                await self._close(key)
+                connection = None
+
+            if connection is None:
+                self.misses += 1
+                server = await self._connect(
+                    server_url, workspace_name=workspace_name, provided_token=token
+                )
+                connection = PooledConnection(server)
+                self._connections[key] = connection
+            else:
+                self.hits += 1
+
+            connection.last_used = time.monotonic()
+            if lease:
+                connection.leases += 1
+            self._connections.move_to_end(key)
+
+        await self._evict_overflow()
+        return connection
+
+    async def _is_healthy(self, connection):
+        now = time.monotonic()
+        if now - connection.last_checked < self.health_check_interval:
+            return True
+        try:
+            await asyncio.wait_for(connection.server.echo("ping"), timeout=10)
+        except Exception as e:
+            print(f"Pooled hypha connection failed its health check: {e}")
+            return False
+        connection.last_checked = now
+        return True
+
+    async def _evict(self, key):
+        self.evictions += 1
+        lock = self._key_locks.get(key)
+        # A locked key is being connected, its lock is kept for its waiters
+        if lock is not None and not lock.locked():
+            del self._key_locks[key]
+        await self._close(key)
+
+    async def _evict_expired(self):
+        now = time.monotonic()
+        expired = [
+            key
+            for key, connection in self._connections.items()
+            if connection.leases == 0 and now - connection.last_used > self.idle_ttl
+        ]
+        for key in expired:
+            await self._evict(key)
+
+    async def _evict_overflow(self):
+        idle = [
+            key for key, connection in self._connections.items() if connection.leases == 0
+        ]
+        for key in idle[: max(0, len(self._connections) - self.max_size)]:
+            await self._evict(key)
+
+    async def _close(self, key):
+        connection = self._connections.pop(key, None)
+        if connection is None:
+            return
+        connection.retired = True
+        if connection.leases == 0:
+            await self._disconnect(connection)
+
+    async def _disconnect(self, connection):
+        if connection.closed:
+            return
+        connection.closed = True
+        try:
+            await connection.server.disconnect()
+        except Exception as e:
+            print(f"Failed to close pooled hypha connection: {e}")
+
+    async def close(self):
+        """Close all connections, leased or not, when the service stops."""
+        for key in list(self._connections):
+            connection = self._connections.pop(key)
+            connection.retired = True
+            await self._disconnect(connection)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reconnects": self.reconnects,
+            "evictions": self.evictions,
+            "open_connections": len(self._connections),
+            "leased_connections": sum(
+                1 for connection in self._connections.values() if connection.leases
+            ),
+        }
+
+
+connection_pool = HyphaConnectionPool.from_env()
@@ -255,15 +255,74 @@ function App() {
 		setIsLoading(false);
 	};
 
+	const sha256 = async (file) => {
+		const digest = await crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+		return Array.from(new Uint8Array(digest))
+			.map((byte) => byte.toString(16).padStart(2, "0"))
+			.join("");
+	};
+
+	const uploadAttachment = async (file) => {
+		// Attachments are stored as files in the chat artifact, the manifest
+		// only keeps their metadata so reading a chat stays cheap
+		const chatId = `${artifactWorkspace}/aria-agents-chats:${sessionId}`;
+		const path = `attachments/${file.name}`;
+		// A new stage only keeps the top-level files of the previous version
+		// when they are copied into it
+		await artifactManager.edit({
+			artifact_id: chatId,
+			version: "stage",
+			copy_files: true,
+			_rkwargs: true
+		});
+		const putUrl = await artifactManager.put_file({
+			artifact_id: chatId,
+			file_path: path,
+			_rkwargs: true
+		});
+		const response = await fetch(putUrl, { method: "PUT", body: file });
+		if (!response.ok) {
+			throw new Error(`Upload of ${file.name} failed: ${response.statusText}`);
+		}
+		const committed = await artifactManager.commit({
+			artifact_id: chatId,
+			version: "new",
+			_rkwargs: true
+		});
+		// Nested files aren't copied into later versions, so the attachment is
+		// read at the version it was committed at
+		const versions = (committed && committed.versions) || [];
+		return {
+			name: file.name,
+			path,
+			version: versions.length ? versions[versions.length - 1].version : undefined,
+			size: file.size,
+			hash: await sha256(file),
+			content_type: file.type || "application/octet-stream",
+		};
+	};
+
 	const handleAttachment = async (event) => {
 		const files = event.target.files || event.dataTransfer.files;
 		const newAttachments = [];
 		const newAttachmentNames = [];
 
-		for (const file of files) {
-			const content = await file.text();
-			newAttachments.push({ name: file.name, content });
-			newAttachmentNames.push(file.name);
+		if (!artifactManager) {
+			setStatus("Please log in before attaching files.");
+			return;
+		}
+
+		try {
+			await saveChat();
+			for (const file of files) {
+				setStatus(`📎 Uploading ${file.name}...`);
+				newAttachments.push(await uploadAttachment(file));
+				newAttachmentNames.push(file.name);
+			}
+			setStatus(`📎 Attached ${newAttachmentNames.join(", ")}`);
+		} catch (e) {
+			console.error(e);
+			setStatus(`❌ Error: ${e.message || e}`);
 		}
 		setAttachments([...attachments, ...newAttachments]);
 		setAttachmentNames([...attachmentNames, ...newAttachmentNames]);
@@ -481,8 +540,9 @@ function App() {
 						userToken,
 						extensions,
 					);
-					await saveChat();
 				}
+				// Save the chat so the attachment metadata is in the manifest
+				await saveChat();
 				await svc.chat(
 					currentQuestion,
 					currentChatHistory,
@@ -1,19 +1,27 @@
 import os
 import uuid
 import json
-from typing import Any, Callable, Dict, Optional, _UnionGenericAlias
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, _UnionGenericAlias
 from inspect import signature
 from contextvars import ContextVar
 import dotenv
 from pydantic import BaseModel, Field
-from llama_index.core import load_index_from_storage
+from llama_index.core import Settings, load_index_from_storage
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import QueryBundle
 from llama_index.core.query_engine import CitationQueryEngine
 from llama_index.core.storage import StorageContext
 from schema_agents.utils.common import current_session
 from schema_agents import Role, schema_tool
 from schema_agents.role import create_session_context
 from aria_agents.jsonschema_pydantic import json_schema_to_pydantic_model
-from aria_agents.artifact_manager import AriaArtifacts
+from aria_agents.artifact_manager import AriaArtifacts, get_session_artifacts
+from aria_agents.paper_store import get_paper_store, load_corpus
+from aria_agents.query_engine_cache import query_engine_cache
+
+# How many answers query_corpus_many synthesizes at the same time
+QUERY_CONCURRENCY = int(os.environ.get("ARIA_AGENTS_QUERY_CONCURRENCY", "4"))
 
 
 async def call_agent(
@@ -76,21 +84,29 @@ def save_locally(filename: str, content: str, project_folder: str):
 
 
 async def save_to_artifact_manager(
-    filename: str,
-    content: str,
+    files: Dict[str, str],
     artifact_manager: AriaArtifacts,
     overwrite: bool = False,
 ):
-    file_id = await artifact_manager.put(
-        value=content,
-        name=filename,
-        overwrite=overwrite,
-    )
-    file_url = await artifact_manager.get_url(name=file_id)
-    return file_url
+    artifact_manager = get_session_artifacts(artifact_manager)
+    # The files are committed as one version, and are only readable after it
+    async with artifact_manager.transaction():
+        file_ids = {
+            filename: await artifact_manager.put(
+                value=content,
+                name=filename,
+                overwrite=overwrite,
+            )
+            for filename, content in files.items()
+        }
+    return {
+        filename: await artifact_manager.get_url(name=file_id)
+        for filename, file_id in file_ids.items()
+    }
 
 
 async def get_file(filename: str, artifact_manager: AriaArtifacts = None):
+    artifact_manager = get_session_artifacts(artifact_manager)
     if artifact_manager is None:
         session_id = get_session_id(current_session)
         project_folder = get_project_folder(session_id)
@@ -102,22 +118,28 @@ async def get_file(filename: str, artifact_manager: AriaArtifacts = None):
         return json.loads(file_content)
 
 
-async def save_file(
-    filename: str, content: str, artifact_manager: AriaArtifacts = None
-):
+async def save_files(files: Dict[str, str], artifact_manager: AriaArtifacts = None):
+    """Save files together and return their URLs, by file name."""
+    artifact_manager = get_session_artifacts(artifact_manager)
     if artifact_manager is None:
         session_id = get_session_id(current_session)
         project_folder = get_project_folder(session_id)
-        file_url = save_locally(filename, content, project_folder)
-    else:
-        file_url = await save_to_artifact_manager(
-            filename, content, artifact_manager, overwrite=True
-        )
+        return {
+            filename: save_locally(filename, content, project_folder)
+            for filename, content in files.items()
+        }
+    return await save_to_artifact_manager(files, artifact_manager, overwrite=True)
 
-    return file_url
+
+async def save_file(
+    filename: str, content: str, artifact_manager: AriaArtifacts = None
+):
+    file_urls = await save_files({filename: content}, artifact_manager)
+    return file_urls[filename]
 
 
 def get_query_index_dir(artifact_manager: AriaArtifacts = None):
+    artifact_manager = get_session_artifacts(artifact_manager)
     if artifact_manager is None:
         session_id = get_session_id(current_session)
         project_folder = get_project_folder(session_id)
@@ -135,33 +157,111 @@ def get_query_index_dir(artifact_manager: AriaArtifacts = None):
 
 def create_query_function(query_engine: CitationQueryEngine) -> Callable:
     @schema_tool
-    def query_corpus(
+    async def query_corpus(
         question: str = Field(
             ...,
             description="The query statement the LLM agent will answer based on the papers in the corpus. The question should not be overly specific or wordy. More general queries containing keywords will yield better results.",
         )
     ) -> str:
         """Given a corpus of papers created from a PubMedCentral search, queries the corpus and returns the response from the LLM agent"""
-        response = query_engine.query(question)
-        response_str = f"""The following query was run for the literature review:\n```{question}```\nA review of the literature yielded the following suggestions:\n```{response.response}```\n\nThe citations refer to the following papers:"""
-        for i_node, node in enumerate(response.source_nodes):
-            response_str += f"\n[{i_node + 1}] - {node.metadata['URL']}"
-        print(response_str)
-        return response_str
+        # The async path keeps the embedding, retrieval and LLM calls off the event loop thread
+        response = await query_engine.aquery(question)
+        return format_query_response(question, response)
 
     return query_corpus
 
 
-def get_query_function(query_index_dir, config):
+def format_query_response(question, response):
+    response_str = f"""The following query was run for the literature review:\n```{question}```\nA review of the literature yielded the following suggestions:\n```{response.response}```\n\nThe citations refer to the following papers:"""
+    for i_node, node in enumerate(response.source_nodes):
+        response_str += f"\n[{i_node + 1}] - {node.metadata['URL']}"
+    print(response_str)
+    return response_str
+
+
+def create_batch_query_function(
+    query_engine: CitationQueryEngine,
+    embed_model: BaseEmbedding,
+    concurrency: int = QUERY_CONCURRENCY,
+) -> Callable:
+    async def query_corpus_many(questions: List[str]) -> Dict[str, str]:
+        """Queries the corpus with many questions at once.
+
+        The questions are embedded in one request and retrieved together, then
+        their answers are synthesized concurrently, `concurrency` at a time.
+        """
+        embeddings = await embed_model.aget_text_embedding_batch(questions)
+        query_bundles = [
+            QueryBundle(query_str=question, embedding=embedding)
+            for question, embedding in zip(questions, embeddings)
+        ]
+        nodes = await asyncio.gather(
+            *[query_engine.aretrieve(query_bundle) for query_bundle in query_bundles]
+        )
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def synthesize(query_bundle, query_nodes):
+            async with semaphore:
+                return await query_engine.asynthesize(query_bundle, query_nodes)
+
+        responses = await asyncio.gather(
+            *[
+                synthesize(query_bundle, query_nodes)
+                for query_bundle, query_nodes in zip(query_bundles, nodes)
+            ]
+        )
+        return {
+            question: format_query_response(question, response)
+            for question, response in zip(questions, responses)
+        }
+
+    return query_corpus_many
+
+
+def load_query_engine(query_index_dir, config):
+    pmcids = load_corpus(query_index_dir)
+    if pmcids is not None:
+        return get_paper_store().get_query_engine(
+            pmcids,
+            similarity_top_k=config["aux"]["similarity_top_k"],
+            citation_chunk_size=config["aux"]["citation_chunk_size"],
+            retriever_mode=config["aux"].get("retriever_mode", "vector"),
+        )
+
+    # Sessions created before the paper store have a private index
     query_storage_context = StorageContext.from_defaults(persist_dir=query_index_dir)
 
     query_index = load_index_from_storage(query_storage_context)
-    query_engine = CitationQueryEngine.from_args(
+    return CitationQueryEngine.from_args(
         query_index,
         similarity_top_k=config["aux"]["similarity_top_k"],
         citation_chunk_size=config["aux"]["citation_chunk_size"],
     )
-    return create_query_function(query_engine)
+
+
+def get_query_engine(query_index_dir, config):
+    # Loading an index parses all of its JSON, reuse the engine while the files are unchanged
+    return query_engine_cache.get(
+        query_index_dir,
+        (
+            config["aux"]["similarity_top_k"],
+            config["aux"]["citation_chunk_size"],
+            config["aux"].get("retriever_mode", "vector"),
+        ),
+        lambda: load_query_engine(query_index_dir, config),
+    )
+
+
+def get_query_function(query_index_dir, config):
+    return create_query_function(get_query_engine(query_index_dir, config))
+
+
+def get_batch_query_function(query_index_dir, config):
+    # The index is loaded with, and so queried with, the global embedding model
+    return create_batch_query_function(
+        get_query_engine(query_index_dir, config), Settings.embed_model
+    )
 
 
 def load_config():
@@ -0,0 +1,328 @@
+import io
+import os
+import json
+import tempfile
+from typing import Any, List, Optional, Sequence
+import numpy as np
+from pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+
+VECTOR_STORE_FNAME = "default__vector_store.json"
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def get_store_paths(persist_path):
+    """The vectors and node ID table persisted in place of `persist_path`."""
+    base, extension = os.path.splitext(persist_path)
+    if extension != ".json":
+        base = persist_path
+    return f"{base}.npy", f"{base}.ids.jsonl"
+
+
+def read_ids(ids_path):
+    """Read the `[node_id, ref_doc_id]` lines of an ID table.
+
+    A line cut short by an interrupted append is ignored. Tables written as a
+    single JSON object, before they were appended to, are read as well.
+    """
+    legacy_path = ids_path[: -len(".jsonl")] + ".json"
+    if not os.path.exists(ids_path) and os.path.exists(legacy_path):
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        return ids["node_ids"], ids["ref_doc_ids"]
+    node_ids = []
+    ref_doc_ids = []
+    with open(ids_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                node_id, ref_doc_id = json.loads(line)
+            except ValueError:
+                break
+            node_ids.append(node_id)
+            ref_doc_ids.append(ref_doc_id)
+    return node_ids, ref_doc_ids
+
+
+class MemmapVectorStore(BasePydanticVectorStore):
+    """A vector store keeping its embeddings in a float32 `.npy` file.
+
+    The file is opened with `np.memmap`, so loading the store doesn't parse or
+    copy the embeddings, and the pages read by queries are shared through the
+    OS page cache. Node IDs and their document IDs are kept in a JSON side
+    table, in the order of the rows. Embeddings are normalised when added, so
+    a query scores all rows by cosine similarity in one matrix product.
+
+    Rows added to a persisted store are appended to its files, so persisting
+    costs as much as the rows added rather than the whole store.
+    """
+
+    stores_text: bool = False
+
+    _vectors: Any = PrivateAttr()
+    _node_ids: List[str] = PrivateAttr()
+    _ref_doc_ids: List[str] = PrivateAttr()
+    _rows: dict = PrivateAttr()
+    _dirty: bool = PrivateAttr()
+    _persisted_rows: Optional[int] = PrivateAttr()
+
+    def __init__(self, vectors=None, node_ids=None, ref_doc_ids=None, **kwargs):
+        super().__init__(**kwargs)
+        self._vectors = (
+            vectors if vectors is not None else np.empty((0, 0), dtype=np.float32)
+        )
+        self._node_ids = list(node_ids or [])
+        self._ref_doc_ids = list(ref_doc_ids or [])
+        self._rows = {node_id: row for row, node_id in enumerate(self._node_ids)}
+        self._dirty = False
+        # The rows already in the persisted file, None once they were changed
+        self._persisted_rows = len(self._node_ids) if vectors is not None else None
+
+    @classmethod
+    def class_name(cls):
+        return "MemmapVectorStore"
+
+    @property
+    def client(self):
+        return None
+
+    def __len__(self):
+        return len(self._node_ids)
+
+    def __bool__(self):
+        # StorageContext.from_defaults replaces falsy, i.e. empty, vector stores
+        return True
+
+    @property
+    def node_ids(self):
+        return list(self._node_ids)
+
+    def get(self, text_id):
+        return self._vectors[self._rows[text_id]].tolist()
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        vectors = normalize([node.get_embedding() for node in nodes])
+        for node in nodes:
+            if node.node_id in self._rows:
+                raise ValueError(f"Node {node.node_id} is already in the store")
+            self._rows[node.node_id] = len(self._node_ids)
+            self._node_ids.append(node.node_id)
+            self._ref_doc_ids.append(node.ref_doc_id or "None")
+        # The memory-mapped rows are copied once, until the store is persisted
+        self._vectors = (
+            np.concatenate([self._vectors, vectors]) if len(self._vectors) else vectors
+        )
+        self._dirty = True
+        return [node.node_id for node in nodes]
+
+    def _keep_rows(self, keep):
+        self._vectors = self._vectors[keep]
+        self._node_ids = [node_id for node_id, k in zip(self._node_ids, keep) if k]
+        self._ref_doc_ids = [doc_id for doc_id, k in zip(self._ref_doc_ids, keep) if k]
+        self._rows = {node_id: row for row, node_id in enumerate(self._node_ids)}
+        self._dirty = True
+        self._persisted_rows = None
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        keep = np.array([doc_id != ref_doc_id for doc_id in self._ref_doc_ids])
+        if not keep.all():
+            self._keep_rows(keep)
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        if filters is not None:
+            raise ValueError("MemmapVectorStore doesn't support metadata filters")
+        if node_ids is None:
+            self.clear()
+            return
+        node_ids = set(node_ids)
+        keep = np.array([node_id not in node_ids for node_id in self._node_ids])
+        if not keep.all():
+            self._keep_rows(keep)
+
+    def clear(self) -> None:
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._node_ids = []
+        self._ref_doc_ids = []
+        self._rows = {}
+        self._dirty = True
+        self._persisted_rows = None
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"Invalid query mode: {query.mode}")
+        if query.filters is not None:
+            raise ValueError("MemmapVectorStore doesn't support metadata filters")
+        if query.node_ids is not None:
+            # Sorted rows read the memory-mapped file sequentially
+            rows = sorted(
+                self._rows[node_id]
+                for node_id in set(query.node_ids)
+                if node_id in self._rows
+            )
+            rows = np.array(rows, dtype=np.int64)
+            vectors = self._vectors[rows] if len(rows) else None
+        else:
+            rows = None
+            vectors = self._vectors if len(self._vectors) else None
+        if vectors is None or not query.similarity_top_k:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+
+        scores = vectors @ normalize(query.query_embedding)
+        top_k = min(query.similarity_top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if rows is not None:
+            ids = [self._node_ids[row] for row in rows[top]]
+        else:
+            ids = [self._node_ids[row] for row in top]
+        return VectorStoreQueryResult(similarities=scores[top].tolist(), ids=ids)
+
+    def _append(self, vectors_path):
+        """Append the rows added since the store was persisted to its file.
+
+        Returns False if the file doesn't hold those rows or its header can't
+        be rewritten in place, so the whole file must be written.
+        """
+        if not self._persisted_rows or not os.path.exists(vectors_path):
+            return False
+        with open(vectors_path, "r+b") as f:
+            version = np.lib.format.read_magic(f)
+            if version != (1, 0):
+                return False
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            data_offset = f.tell()
+            if (
+                shape != (self._persisted_rows, self._vectors.shape[1])
+                or fortran_order
+                or dtype != np.float32
+            ):
+                return False
+            # numpy pads the header, so that the number of rows can grow in place
+            header = io.BytesIO()
+            np.lib.format.write_array_header_1_0(
+                header,
+                {
+                    "descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                    "fortran_order": False,
+                    "shape": self._vectors.shape,
+                },
+            )
+            if len(header.getvalue()) != data_offset:
+                return False
+            f.seek(data_offset + self._persisted_rows * self._vectors.shape[1] * 4)
+            f.truncate()
+            f.write(
+                np.ascontiguousarray(
+                    self._vectors[self._persisted_rows :], dtype=np.float32
+                ).tobytes()
+            )
+            f.seek(0)
+            f.write(header.getvalue())
+        return True
+
+    def persist(self, persist_path: str = VECTOR_STORE_FNAME, fs=None) -> None:
+        """Write the vectors and node IDs if they changed since they were loaded.
+
+        Rows added to a persisted store are appended to its files, otherwise
+        the files are replaced. Vectors are written before their IDs, rows
+        without an ID are dropped when the store is loaded.
+        """
+        vectors_path, ids_path = get_store_paths(persist_path)
+        if not self._dirty and os.path.exists(vectors_path):
+            return
+        dirpath = os.path.dirname(vectors_path) or "."
+        os.makedirs(dirpath, exist_ok=True)
+        persisted_rows = self._persisted_rows
+        if os.path.exists(ids_path) and self._append(vectors_path):
+            with open(ids_path, "a", encoding="utf-8") as f:
+                for node_id, ref_doc_id in zip(
+                    self._node_ids[persisted_rows:], self._ref_doc_ids[persisted_rows:]
+                ):
+                    f.write(json.dumps([node_id, ref_doc_id]) + "\n")
+        else:
+            # Replace the files atomically, so mapped readers keep a consistent view
+            with tempfile.NamedTemporaryFile(
+                dir=dirpath, delete=False, suffix=".npy"
+            ) as f:
+                np.save(f, np.ascontiguousarray(self._vectors, dtype=np.float32))
+            os.replace(f.name, vectors_path)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=dirpath, delete=False, encoding="utf-8"
+            ) as f:
+                for node_id, ref_doc_id in zip(self._node_ids, self._ref_doc_ids):
+                    f.write(json.dumps([node_id, ref_doc_id]) + "\n")
+            os.replace(f.name, ids_path)
+            legacy_path = ids_path[: -len(".jsonl")] + ".json"
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+        self._vectors = np.load(vectors_path, mmap_mode="r")
+        self._dirty = False
+        self._persisted_rows = len(self._node_ids)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, fs=None) -> "MemmapVectorStore":
+        vectors_path, ids_path = get_store_paths(persist_path)
+        if not os.path.exists(vectors_path):
+            raise ValueError(f"No vector store found at {vectors_path}")
+        node_ids, ref_doc_ids = read_ids(ids_path)
+        vectors = np.load(vectors_path, mmap_mode="r")
+        if len(vectors) == len(node_ids):
+            return cls(vectors=vectors, node_ids=node_ids, ref_doc_ids=ref_doc_ids)
+        # An append was interrupted, the files are rewritten when next persisted
+        n_rows = min(len(vectors), len(node_ids))
+        store = cls(
+            vectors=vectors[:n_rows],
+            node_ids=node_ids[:n_rows],
+            ref_doc_ids=ref_doc_ids[:n_rows],
+        )
+        store._dirty = True
+        store._persisted_rows = None
+        return store
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str) -> "MemmapVectorStore":
+        """Load the store persisted in `persist_dir`.
+
+        A `SimpleVectorStore` persisted there as JSON is converted once, and
+        its JSON file removed.
+        """
+        persist_path = os.path.join(persist_dir, VECTOR_STORE_FNAME)
+        if os.path.exists(get_store_paths(persist_path)[0]):
+            return cls.from_persist_path(persist_path)
+        if not os.path.exists(persist_path):
+            return cls()
+
+        simple_store = SimpleVectorStore.from_persist_path(persist_path)
+        embeddings = simple_store.data.embedding_dict
+        store = cls(
+            vectors=normalize(list(embeddings.values())) if embeddings else None,
+            node_ids=list(embeddings),
+            ref_doc_ids=[
+                simple_store.data.text_id_to_ref_doc_id.get(node_id, "None")
+                for node_id in embeddings
+            ],
+        )
+        store._dirty = True
+        store._persisted_rows = None
+        store.persist(persist_path)
+        os.remove(persist_path)
+        return store
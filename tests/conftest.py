@@ -3,13 +3,23 @@ import base64
 import json
 import tempfile
 import shutil
+import asyncio
 from unittest.mock import AsyncMock, MagicMock
+import httpx
 import pytest
 import dotenv
 
 dotenv.load_dotenv()
 from schema_agents.utils.common import EventBus
-from aria_agents.utils import load_config, create_query_function
+from hypha_rpc.rpc import RemoteException
+from llama_index.core import Document
+from aria_agents.utils import (
+    load_config,
+    create_query_function,
+    create_batch_query_function,
+)
+from aria_agents.artifact_manager import ArtifactResult
+from aria_agents.server import HyphaConnectionPool
 from aria_agents.chatbot_extensions.study_suggester import SuggestedStudy
 
 
@@ -39,7 +49,7 @@ def event_bus(output_handler):
     return return_event_bus
 
 
-def mock_get_query_function(query_index_dir=None, config=None):
+def mock_query_engine():
     mock_response = MagicMock()
     mock_response.response = "This is a mock response for the query."
 
@@ -55,9 +65,23 @@ def mock_get_query_function(query_index_dir=None, config=None):
         Node(1),
         Node(2),
     ]
-    mock_query_engine = MagicMock()
-    mock_query_engine.query = MagicMock(return_value=mock_response)
-    return create_query_function(mock_query_engine)
+    query_engine = MagicMock()
+    query_engine.aquery = AsyncMock(return_value=mock_response)
+    query_engine.aretrieve = AsyncMock(return_value=[])
+    query_engine.asynthesize = AsyncMock(return_value=mock_response)
+    return query_engine
+
+
+def mock_get_query_function(query_index_dir=None, config=None):
+    return create_query_function(mock_query_engine())
+
+
+def mock_get_batch_query_function(query_index_dir=None, config=None):
+    embed_model = MagicMock()
+    embed_model.aget_text_embedding_batch = AsyncMock(
+        side_effect=lambda texts: [[0.0] for _ in texts]
+    )
+    return create_batch_query_function(mock_query_engine(), embed_model)
 
 
 async def mock_http_get(url, *args, **kwargs):
@@ -101,10 +125,7 @@ def config():
 
 
 def attachment_format(filename, file_content):
-    mock_file = MagicMock()
-    mock_file.name = filename
-    mock_file.content = file_content
-    return mock_file
+    return {"name": filename, "content": file_content}
 
 
 def get_file_in_folder(folder, format_func=None):
@@ -136,7 +157,12 @@ def mock_artifact_manager(event_bus):
     mock = MagicMock()
     mock.default_url = "http://mock_url"
     mock.put = AsyncMock(
-        side_effect=lambda value, name, overwrite: put_file_in_temp_dir(name, value)
+        side_effect=lambda value, name, overwrite=False: put_file_in_temp_dir(name, value)
+    )
+    mock.put_stream = AsyncMock(
+        side_effect=lambda source, name, overwrite=False, size=None: put_file_in_temp_dir(
+            name, open(source, "rb").read()
+        )
     )
     mock.get_url = AsyncMock(return_value=mock.default_url)
     mock.get = AsyncMock(side_effect=get_file_in_folder("tests/assets/studies"))
@@ -146,6 +172,21 @@ def mock_artifact_manager(event_bus):
             "tests/assets/attachments", format_func=attachment_format
         )
     )
+    mock.get_attachments_many = AsyncMock(
+        side_effect=lambda names: {name: mock.get_attachment.side_effect(name) for name in names}
+    )
+    mock.get_attachment_file = AsyncMock(side_effect=lambda attachment: attachment["content"])
+    mock.get_attachment_files = AsyncMock(
+        side_effect=lambda attachments: {
+            attachment["name"]: ArtifactResult(attachment["name"], attachment["content"])
+            for attachment in attachments
+        }
+    )
+    mock.put_many = AsyncMock(
+        side_effect=lambda items, alias=False: {
+            name: ArtifactResult(name, name) for name in items
+        }
+    )
     mock.exists = AsyncMock(
         side_effect=lambda filename: os.path.exists(os.path.join(temp_dir, filename))
     )
@@ -170,3 +211,119 @@ def suggested_study():
         experiment_workflow="Expose yeast cells to osmotic stress and observe results",
         references=["https://www.ncbi.nlm.nih.gov/pubmed/12345678"],
     )
+
+
+@pytest.fixture
+def mock_server():
+    server = MagicMock()
+    server.config.public_base_url = "http://mockserver"
+    artifact_service = MagicMock()
+    created = set()
+
+    def create(type, alias, manifest, workspace=None, parent_id=None):
+        workspace = workspace or parent_id.split("/")[0]
+        created.add(f"{workspace}/{alias}")
+
+    def read(artifact_id, silent=False):
+        if artifact_id not in created:
+            raise RemoteException(f"Artifact does not exist: {artifact_id}")
+        return {"versions": list(versions), "manifest": {}}
+
+    artifact_service.create = AsyncMock(side_effect=create)
+    artifact_service.put_file = AsyncMock(return_value="http://mockserver/put_url")
+    artifact_service.edit = AsyncMock()
+    artifact_service.remove_file = AsyncMock()
+    versions = []
+
+    def commit(artifact_id, version):
+        versions.append({"version": f"v{len(versions)}"})
+        return {"versions": list(versions)}
+
+    artifact_service.commit = AsyncMock(side_effect=commit)
+    artifact_service.read = AsyncMock(side_effect=read)
+    artifact_service.get_file = AsyncMock(return_value="http://mockserver/get_url")
+    server.get_service = AsyncMock(return_value=artifact_service)
+    return server
+
+
+@pytest.fixture
+def mock_event_bus():
+    return MagicMock()
+
+
+@pytest.fixture
+def mock_pool(mock_server):
+    return HyphaConnectionPool(connect=AsyncMock(return_value=mock_server))
+
+
+def make_paper(pmcid, text):
+    return Document(
+        text=text,
+        metadata={
+            "Title of this paper": f"Paper {pmcid}",
+            "URL": f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmcid}/",
+        },
+    )
+
+
+ARTICLE_TEMPLATE = """<article article-type="research-article">
+<front><journal-meta><journal-title-group><journal-title>Bio-protocol</journal-title></journal-title-group></journal-meta>
+<article-meta><article-id pub-id-type="pmc">{id}</article-id>
+<title-group><article-title>Osmotic stress in <italic>yeast</italic> {id}</article-title></title-group>
+<abstract><p>Yeast cells of paper {id} were exposed to osmotic stress.</p></abstract></article-meta></front>
+<body><sec><title>Protocol</title><p>{body}</p></sec></body>
+<back><ref-list><ref><element-citation><article-title>A cited paper</article-title></element-citation></ref></ref-list></back>
+</article>"""
+
+
+class EutilsStandIn(httpx.AsyncBaseTransport):
+    """A stand-in for E-utilities, answering with recorded-style responses.
+
+    Each request takes `latency` seconds, plus `article_latency` per article.
+    """
+
+    def __init__(self, n_papers, latency=0.0, article_latency=0.0, fail_retstart=None):
+        self.ids = [str(1000000 + i) for i in range(n_papers)]
+        self.latency = latency
+        self.article_latency = article_latency
+        self.fail_retstart = fail_retstart
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def article(self, pmc_id):
+        return ARTICLE_TEMPLATE.format(id=pmc_id, body="The sample was centrifuged. " * 200)
+
+    async def handle_async_request(self, request):
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            params = request.url.params
+            if request.url.path.endswith("esearch.fcgi"):
+                await asyncio.sleep(self.latency)
+                if params.get("rettype") == "count":
+                    content = f"<eSearchResult><Count>{len(self.ids)}</Count></eSearchResult>"
+                    return httpx.Response(200, content=content.encode())
+                ids = self.ids[: int(params["retmax"])]
+                content = (
+                    "<eSearchResult><Count>{}</Count><IdList>{}</IdList>"
+                    "<QueryKey>1</QueryKey><WebEnv>MCID_1</WebEnv></eSearchResult>"
+                ).format(len(self.ids), "".join(f"<Id>{i}</Id>" for i in ids))
+                return httpx.Response(200, content=content.encode())
+
+            if "id" in params:
+                ids = params["id"].split(",")
+            else:
+                assert params["WebEnv"] == "MCID_1" and params["query_key"] == "1"
+                retstart = int(params["retstart"])
+                if retstart == self.fail_retstart:
+                    return httpx.Response(500)
+                ids = self.ids[retstart : retstart + int(params["retmax"])]
+            await asyncio.sleep(self.latency + self.article_latency * len(ids))
+            content = "<pmc-articleset>{}</pmc-articleset>".format(
+                "".join(self.article(i) for i in ids)
+            )
+            return httpx.Response(200, content=content.encode())
+        finally:
+            self.in_flight -= 1
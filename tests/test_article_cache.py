@@ -0,0 +1,75 @@
+import time
+import threading
+import httpx
+import pytest
+from llama_index.core import Document
+from tests.conftest import EutilsStandIn
+from aria_agents.article_cache import ArticleCache
+from aria_agents.pubmed import PubmedFetcher
+
+
+def make_article(pmcid):
+    return (
+        pmcid,
+        f"<article><article-id pub-id-type='pmc'>{pmcid}</article-id></article>".encode(),
+        Document(text=f"Text of {pmcid}", extra_info={"URL": f"https://example.org/{pmcid}/"}),
+    )
+
+
+def test_cache_stores_xml_and_documents(tmp_path):
+    cache = ArticleCache(str(tmp_path / "articles.sqlite"))
+    cache.put_many([make_article("PMC1"), make_article("PMC2")])
+    cache.close()
+
+    reopened = ArticleCache(str(tmp_path / "articles.sqlite"))
+    documents = reopened.get_many(["PMC2", "PMC3", "PMC1"])
+    assert list(documents) == ["PMC2", "PMC1"]
+    assert documents["PMC1"].text == "Text of PMC1"
+    assert documents["PMC1"].metadata == {"URL": "https://example.org/PMC1/"}
+    assert reopened.get_xml("PMC2") == make_article("PMC2")[1]
+    assert reopened.stats()["hits"] == 2
+    assert reopened.stats()["misses"] == 1
+
+
+def test_cache_expires_and_evicts_articles(tmp_path):
+    cache = ArticleCache(str(tmp_path / "articles.sqlite"), ttl=0.05)
+    cache.put_many([make_article("PMC1")])
+    time.sleep(0.1)
+    assert cache.get_many(["PMC1"]) == {}
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["bytes"] == 0
+
+    sizing_cache = ArticleCache(str(tmp_path / "sized.sqlite"))
+    sizing_cache.put_many([make_article("PMC1")])
+    max_bytes = sizing_cache.stats()["bytes"] * 2
+    cache = ArticleCache(str(tmp_path / "evicting.sqlite"), max_bytes=max_bytes)
+    cache.put_many([make_article("PMC1"), make_article("PMC2")])
+    cache.get_many(["PMC1"])
+    cache.put_many([make_article("PMC3")])
+    assert list(cache.get_many(["PMC1", "PMC2", "PMC3"])) == ["PMC1", "PMC3"]
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fetcher_only_fetches_uncached_articles(tmp_path):
+    cache = ArticleCache(str(tmp_path / "articles.sqlite"))
+    threads = []
+    for name in ["get_many", "put_many"]:
+        method = getattr(cache, name)
+        setattr(cache, name, lambda *args, method=method: threads.append(threading.current_thread()) or method(*args))
+    transport = EutilsStandIn(30)
+    async with httpx.AsyncClient(transport=transport) as client:
+        fetcher = PubmedFetcher(client, batch_size=10, cache=cache)
+        first = await fetcher.load_data("yeast", 15)
+        transport.requests.clear()
+        second = await fetcher.load_data("yeast", 30)
+
+    # One search, and the 15 uncached articles fetched by ID
+    assert len(transport.requests) == 1 + 2
+    assert transport.requests[1].url.params["id"].split(",") == transport.ids[15:25]
+    assert [document.text for document in second[:15]] == [document.text for document in first]
+    assert len(second) == 30
+    assert b"<article-title>" in cache.get_xml("PMC1000000")
+    # Compression and SQLite commits run on the workers, not the event loop
+    assert len(threads) == 2 * (1 + 2)
+    assert threading.current_thread() not in threads
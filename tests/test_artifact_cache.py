@@ -0,0 +1,55 @@
+from aria_agents.artifact_cache import ArtifactContentCache, ContentHashIndex
+
+
+def test_cache_is_keyed_by_version():
+    cache = ArtifactContentCache()
+    cache.put("chat", "study.json", 1, "v1 content")
+
+    assert cache.get("chat", "study.json", 1) == b"v1 content"
+    assert cache.get("chat", "study.json", 2) is None
+    assert cache.get("other-chat", "study.json", 1) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_cache_evicts_least_recently_used_by_size():
+    cache = ArtifactContentCache(max_bytes=10)
+    cache.put("chat", "a", 1, b"aaaa")
+    cache.put("chat", "b", 1, b"bbbb")
+    cache.get("chat", "a", 1)
+    cache.put("chat", "c", 1, b"cccc")
+    cache.put("chat", "too_large", 1, b"x" * 11)
+
+    assert cache.get("chat", "a", 1) == b"aaaa"
+    assert cache.get("chat", "b", 1) is None
+    assert cache.get("chat", "c", 1) == b"cccc"
+    assert cache.get("chat", "too_large", 1) is None
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_advance_carries_unchanged_files():
+    cache = ArtifactContentCache()
+    cache.put("chat", "study.json", 1, b"study")
+    cache.put("chat", "study.html", 1, b"old html")
+    cache.put("chat", "attachments/data.csv", 1, b"a,b")
+    cache.advance("chat", 1, 2, {"study.html"})
+
+    assert cache.get("chat", "study.json", 2) == b"study"
+    assert cache.get("chat", "study.html", 2) is None
+    # Staging with copy_files only copies the top-level files
+    assert cache.get("chat", "attachments/data.csv", 2) is None
+    assert cache.get("chat", "study.json", 1) is None
+    assert cache.stats()["bytes"] == len(b"study")
+
+
+def test_hash_index_advance_drops_files_not_copied():
+    hashes = ContentHashIndex()
+    hashes.advance("chat", None, 1, set(), {"study.json": "a", "attachments/data.csv": "b"})
+    hashes.advance("chat", 1, 2, {"plot.png"}, {"plot.png": "c"})
+
+    assert hashes.find("chat", 2, "a", "study.json") == "study.json"
+    assert hashes.find("chat", 2, "c") == "plot.png"
+    # Staging with copy_files doesn't copy nested files, so they can't be skipped
+    assert hashes.find("chat", 2, "b") is None
+    assert hashes.find("chat", 1, "a") is None
@@ -1,33 +1,46 @@
 import os
 import uuid
-from unittest.mock import AsyncMock, MagicMock, patch, ANY
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch, ANY, call
 import pytest
 import httpx
 from schema_agents.utils.common import EventBus
 from hypha_rpc import connect_to_server
 from tests.conftest import get_user_id, mock_http_get
-from aria_agents.artifact_manager import AriaArtifacts
+from aria_agents.artifact_cache import ArtifactContentCache
+from aria_agents.utils import save_files
+from aria_agents.artifact_manager import (
+    AriaArtifacts,
+    KnownArtifacts,
+    TransferClient,
+    current_artifacts,
+    get_session_artifacts,
+)
 
-@pytest.fixture
-def mock_server():
-    server = MagicMock()
-    server.config.public_base_url = "http://mockserver"
-    artifact_service = MagicMock()
-    artifact_service.create = AsyncMock()
-    artifact_service.put_file = AsyncMock(return_value="http://mockserver/put_url")
-    artifact_service.edit = AsyncMock()
-    artifact_service.commit = AsyncMock()
-    artifact_service.get_file = AsyncMock(return_value="http://mockserver/get_url")
-    server.get_service = AsyncMock(return_value=artifact_service)
-    return server
+class MockTransferClient:
+    """Serves presigned URLs from an in-memory store instead of S3."""
+
+    def __init__(self):
+        self.objects = {}
+        self.requests = []
+
+    def handle(self, request):
+        self.requests.append(request)
+        if request.method == "PUT":
+            self.objects[request.url.path] = request.read()
+            return httpx.Response(200)
+        return httpx.Response(200, content=self.objects.get(request.url.path, b""))
+
+    def get(self):
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
 
 @pytest.fixture
-def mock_event_bus():
-    return MagicMock()
+def mock_transfer_client():
+    return MockTransferClient()
 
 @pytest.fixture
-def artifact_manager(mock_server, mock_event_bus):
-    return AriaArtifacts(server=mock_server, event_bus=mock_event_bus)
+def artifact_manager(mock_server, mock_event_bus, mock_pool):
+    return AriaArtifacts(server=mock_server, event_bus=mock_event_bus, pool=mock_pool, cache=ArtifactContentCache(), known=KnownArtifacts())
 
 @pytest.fixture(scope="function")
 async def hypha_artifact_manager(event_bus):
@@ -54,9 +67,7 @@ async def hypha_artifact_manager(event_bus):
     return art_man
 
 @pytest.mark.asyncio
-@patch("aria_agents.artifact_manager.get_server", new_callable=AsyncMock)
-async def test_setup(mock_get_server, artifact_manager, mock_server):
-    mock_get_server.return_value = mock_server
+async def test_setup(artifact_manager, mock_server):
     await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
     assert artifact_manager.user_id == "test_user"
     assert artifact_manager.session_id == "test_session"
@@ -67,12 +78,66 @@ async def test_setup(mock_get_server, artifact_manager, mock_server):
     mock_service = await mock_server.get_service()
     mock_service.create.assert_any_call(type='collection', workspace='ws-user-test_user', alias='aria-agents-chats', manifest=ANY)
     mock_service.create.assert_any_call(type='chat', parent_id='ws-user-test_user/aria-agents-chats', alias='aria-agents-chats:test_session', manifest=ANY)
+    assert artifact_manager._known.stats() == {"hits": 0, "checks": 2, "creations": 2, "known": 2}
+    # The handle leases its connection until it is closed
+    assert artifact_manager._pool.stats()["leased_connections"] == 1
+    await artifact_manager.close()
+    assert artifact_manager._pool.stats()["leased_connections"] == 0
+
+@pytest.mark.asyncio
+async def test_setup_skips_known_artifacts(artifact_manager, mock_server):
+    mock_service = await mock_server.get_service()
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="session_a")
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="session_a")
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="session_b")
+
+    assert mock_service.create.call_count == 3
+    assert mock_service.read.call_count == 3
+    assert artifact_manager._known.stats() == {"hits": 3, "checks": 3, "creations": 3, "known": 3}
+
+    # Artifacts created elsewhere, e.g. by the frontend, are only read once
+    other_session = AriaArtifacts(mock_server, MagicMock(), artifact_manager._pool, cache=ArtifactContentCache(), known=KnownArtifacts())
+    await other_session.setup(token="mock_token", user_id="test_user", session_id="session_a")
+    assert mock_service.create.call_count == 3
+    assert other_session._known.stats() == {"hits": 0, "checks": 2, "creations": 0, "known": 2}
+    assert other_session._manifest is not None
+
+@pytest.mark.asyncio
+async def test_for_session(artifact_manager, mock_server):
+    session_a = await artifact_manager.for_session(token="mock_token", user_id="user_a", session_id="session_a")
+    session_b = await artifact_manager.for_session(token="mock_token", user_id="user_b", session_id="session_b")
+
+    assert session_a is not artifact_manager
+    assert session_a._artifact_id == "ws-user-user_a/aria-agents-chats:session_a"
+    assert session_b._artifact_id == "ws-user-user_b/aria-agents-chats:session_b"
+    assert artifact_manager._artifact_id is None
+    assert session_a.get_event_bus() is artifact_manager.get_event_bus()
+
+def test_get_session_artifacts(artifact_manager):
+    assert get_session_artifacts(artifact_manager) is artifact_manager
+    assert get_session_artifacts() is None
+
+    session_artifacts = AriaArtifacts()
+    token = current_artifacts.set(session_artifacts)
+    try:
+        assert get_session_artifacts(artifact_manager) is session_artifacts
+    finally:
+        current_artifacts.reset(token)
+    assert get_session_artifacts(artifact_manager) is artifact_manager
+
+@pytest.mark.asyncio
+async def test_transfer_client_is_shared():
+    transfer_client = TransferClient()
+    client = transfer_client.get()
+    assert transfer_client.get() is client
+    await transfer_client.aclose()
+    assert client.is_closed
+    assert transfer_client.get() is not client
+    await transfer_client.aclose()
 
 @pytest.mark.asyncio
-@patch("aria_agents.artifact_manager.get_server", new_callable=AsyncMock)
 @patch("httpx.AsyncClient.put", new_callable=AsyncMock)
-async def test_put_file(mock_http_put, mock_get_server, artifact_manager, mock_server):
-    mock_get_server.return_value = mock_server
+async def test_put_file(mock_http_put, artifact_manager, mock_server):
     mock_http_put.return_value = MagicMock(status_code=200)
     mock_event_bus = artifact_manager.get_event_bus()
     mock_event_bus.emit = MagicMock()
@@ -81,15 +146,304 @@ async def test_put_file(mock_http_put, mock_get_server, artifact_manager, mock_s
     await artifact_manager.put(value=b"test content", name="test_file.txt")
 
     mock_service = await mock_server.get_service()
-    mock_service.edit.assert_called_once_with(artifact_id=artifact_manager._artifact_id, version="stage")
+    mock_service.edit.assert_called_once_with(artifact_id=artifact_manager._artifact_id, version="stage", copy_files=True)
     mock_service.commit.assert_called_once_with(artifact_manager._artifact_id, version='new')
     mock_event_bus.emit.assert_called_once_with("store_put", "test_file.txt")
 
 @pytest.mark.asyncio
-@patch("aria_agents.artifact_manager.get_server", new_callable=AsyncMock)
+@patch("httpx.AsyncClient.put", new_callable=AsyncMock)
+async def test_transaction(mock_http_put, artifact_manager, mock_server):
+    mock_http_put.return_value = MagicMock(status_code=200)
+    mock_event_bus = artifact_manager.get_event_bus()
+    mock_event_bus.emit = MagicMock()
+    mock_service = await mock_server.get_service()
+    mock_service.remove_file = AsyncMock()
+
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+    async with artifact_manager.transaction():
+        await artifact_manager.put(value=b"html", name="study.html", overwrite=True)
+        await artifact_manager.put(value=b"json", name="study.json")
+        await artifact_manager.remove("old.json")
+        mock_event_bus.emit.assert_not_called()
+        mock_service.commit.assert_not_called()
+
+    mock_service.edit.assert_called_once_with(artifact_id=artifact_manager._artifact_id, version="stage", copy_files=True)
+    mock_service.commit.assert_called_once_with(artifact_manager._artifact_id, version="new")
+    assert mock_service.put_file.call_count == 2
+    assert mock_service.remove_file.call_count == 2
+    assert mock_event_bus.emit.call_args_list == [
+        call("store_put", "study.html"),
+        call("store_put", "study.json"),
+    ]
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient.put", new_callable=AsyncMock)
+async def test_save_files_commits_one_version(mock_http_put, artifact_manager, mock_server):
+    mock_http_put.return_value = MagicMock(status_code=200)
+    mock_service = await mock_server.get_service()
+    calls = []
+    mock_service.commit.side_effect = lambda *args, **kwargs: calls.append("commit") or {"versions": []}
+    mock_service.get_file.side_effect = lambda artifact_id, file_path: calls.append(file_path) or f"http://mockserver/{file_path}"
+
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+    urls = await save_files({"study.html": "<html></html>", "study.json": "{}"}, artifact_manager)
+
+    assert urls == {"study.html": "http://mockserver/study.html", "study.json": "http://mockserver/study.json"}
+    # The URLs are requested once both files are committed
+    assert calls == ["commit", "study.html", "study.json"]
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient.put", new_callable=AsyncMock)
+async def test_transaction_failure_removes_staged_files(mock_http_put, artifact_manager, mock_server):
+    mock_http_put.return_value = MagicMock(status_code=200)
+    mock_event_bus = artifact_manager.get_event_bus()
+    mock_event_bus.emit = MagicMock()
+
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+    with pytest.raises(ValueError):
+        async with artifact_manager.transaction():
+            await artifact_manager.put(value=b"plot", name="plot.png")
+            raise ValueError("Plot generation failed")
+
+    mock_service = await mock_server.get_service()
+    mock_service.commit.assert_not_called()
+    mock_event_bus.emit.assert_not_called()
+    # The staged upload is removed, so a later commit doesn't pick it up
+    mock_service.remove_file.assert_called_once_with(
+        artifact_id=artifact_manager._artifact_id, file_path="plot.png"
+    )
+
+@pytest.mark.asyncio
+async def test_put_and_get_stream(tmp_path, mock_server, mock_event_bus, mock_pool, mock_transfer_client):
+    artifact_manager = AriaArtifacts(mock_server, mock_event_bus, mock_pool, mock_transfer_client, ArtifactContentCache(), KnownArtifacts())
+    mock_service = await mock_server.get_service()
+    mock_service.put_file = AsyncMock(side_effect=lambda artifact_id, file_path: f"http://s3/{file_path}")
+    mock_service.get_file = AsyncMock(side_effect=lambda artifact_id, file_path: f"http://s3/{file_path}")
+    data_path = tmp_path / "data.tsv"
+    data_path.write_bytes(b"a\tb\n" * 1000)
+
+    async def chunks():
+        for _ in range(3):
+            yield b"chunk"
+
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+    await artifact_manager.put_stream(str(data_path), "data.tsv")
+    await artifact_manager.put_stream(chunks(), "chunks.bin")
+
+    assert mock_transfer_client.objects["/data.tsv"] == data_path.read_bytes()
+    assert mock_transfer_client.objects["/chunks.bin"] == b"chunk" * 3
+    assert mock_transfer_client.requests[0].headers["Content-Length"] == str(len(data_path.read_bytes()))
+    assert mock_transfer_client.requests[1].headers["Content-Length"] == "15"
+
+    streamed = b"".join([chunk async for chunk in artifact_manager.get_stream("data.tsv", chunk_size=64)])
+    assert streamed == data_path.read_bytes()
+    with await artifact_manager.get_spooled("chunks.bin") as spooled:
+        assert spooled.read() == b"chunk" * 3
+
+@pytest.mark.asyncio
+async def test_get_reads_through_cache(mock_server, mock_event_bus, mock_pool, mock_transfer_client):
+    cache = ArtifactContentCache()
+    artifact_manager = AriaArtifacts(mock_server, mock_event_bus, mock_pool, mock_transfer_client, cache, KnownArtifacts())
+    mock_service = await mock_server.get_service()
+    mock_service.put_file = AsyncMock(side_effect=lambda artifact_id, file_path: f"http://s3/{file_path}")
+    mock_service.get_file = AsyncMock(side_effect=lambda artifact_id, file_path: f"http://s3/{file_path}")
+
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+    await artifact_manager.put(value='{"study": 1}', name="suggested_study.json")
+    await artifact_manager.put(value="<html></html>", name="suggested_study.html")
+    assert await artifact_manager.get("suggested_study.html") == "<html></html>"
+    assert await artifact_manager.get("suggested_study.json") == '{"study": 1}'
+    mock_service.get_file.assert_not_called()
+    assert [r.method for r in mock_transfer_client.requests] == ["PUT", "PUT"]
+
+    # A new handle for the same session reads the version once and then hits the cache
+    next_turn = await artifact_manager.for_session(token="mock_token", user_id="test_user", session_id="test_session")
+    assert await next_turn.get("suggested_study.json") == '{"study": 1}'
+    mock_service.get_file.assert_not_called()
+
+    # Files written by someone else at a newer version are downloaded again
+    mock_transfer_client.objects["/suggested_study.json"] = b'{"study": 2}'
+    await mock_service.commit(artifact_manager._artifact_id, version="new")
+    later_turn = await artifact_manager.for_session(token="mock_token", user_id="test_user", session_id="test_session")
+    assert await later_turn.get("suggested_study.json") == '{"study": 2}'
+    mock_service.get_file.assert_called_once()
+    assert cache.stats()["hits"] == 3
+
+@pytest.mark.asyncio
+async def test_get_attachments_many(artifact_manager, mock_server):
+    mock_service = await mock_server.get_service()
+    manifest = {
+        "attachments": [
+            {"name": "a.csv", "content": "old"},
+            {"name": "b.tsv", "content": "b"},
+            {"name": "a.csv", "content": "new"},
+        ]
+    }
+    mock_service.read = AsyncMock(return_value={"versions": [], "manifest": manifest})
+
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+    attachments = await artifact_manager.get_attachments_many(["a.csv", "b.tsv"])
+    assert attachments["a.csv"]["content"] == "new"
+    assert attachments["b.tsv"]["content"] == "b"
+    assert (await artifact_manager.get_attachment("b.tsv"))["content"] == "b"
+    assert len(await artifact_manager.get_attachments()) == 3
+    # Setup reads the collection and the chat, which also loads the snapshot
+    assert mock_service.read.call_count == 2
+
+    # Unknown names refresh the snapshot once, as the frontend edits the manifest in place
+    manifest["attachments"].append({"name": "c.csv", "content": "c"})
+    assert (await artifact_manager.get_attachment("c.csv"))["content"] == "c"
+    assert await artifact_manager.get_attachment("missing.csv") is None
+    assert mock_service.read.call_count == 4
+
+@pytest.mark.asyncio
+async def test_get_attachment_file(mock_server, mock_event_bus, mock_pool, mock_transfer_client):
+    artifact_manager = AriaArtifacts(mock_server, mock_event_bus, mock_pool, mock_transfer_client, ArtifactContentCache(), KnownArtifacts())
+    mock_service = await mock_server.get_service()
+    mock_service.get_file = AsyncMock(side_effect=lambda artifact_id, file_path: f"http://s3/{file_path}")
+    mock_transfer_client.objects["/attachments/data.csv"] = b"a,b\n1,2\n"
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+
+    legacy = await artifact_manager.get_attachment_file({"name": "old.csv", "content": "x,y\n"})
+    assert legacy == "x,y\n"
+    mock_service.get_file.assert_not_called()
+
+    attachment = {"name": "data.csv", "path": "attachments/data.csv", "size": 8, "hash": "abc", "content_type": "text/csv"}
+    with await artifact_manager.get_attachment_file(attachment) as data_file:
+        assert data_file.read() == b"a,b\n1,2\n"
+    mock_service.get_file.assert_called_once_with(artifact_id=artifact_manager._artifact_id, file_path="attachments/data.csv")
+
+    # Attachments are read at the version they were committed at
+    mock_service.get_file.reset_mock()
+    mock_service.get_file.side_effect = lambda artifact_id, file_path, version: f"http://s3/{file_path}"
+    with await artifact_manager.get_attachment_file({**attachment, "version": "v0"}) as data_file:
+        assert data_file.read() == b"a,b\n1,2\n"
+    mock_service.get_file.assert_called_once_with(artifact_id=artifact_manager._artifact_id, file_path="attachments/data.csv", version="v0")
+
+class SlowTransferClient(MockTransferClient):
+    """Takes a fixed latency per request and records how many overlap."""
+
+    def __init__(self, latency=0.05):
+        super().__init__()
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.client = None
+
+    async def handle_async(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        await request.aread()
+        if request.url.path == "/missing.txt":
+            return httpx.Response(404)
+        return self.handle(request)
+
+    def get(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle_async))
+        return self.client
+
+@pytest.mark.asyncio
+async def test_put_many_and_get_many(mock_server, mock_event_bus, mock_pool):
+    transfer_client = SlowTransferClient()
+    artifact_manager = AriaArtifacts(mock_server, mock_event_bus, mock_pool, transfer_client, ArtifactContentCache(), KnownArtifacts())
+    mock_service = await mock_server.get_service()
+    mock_service.put_file = AsyncMock(side_effect=lambda artifact_id, file_path: f"http://s3/{file_path}")
+    mock_service.get_file = AsyncMock(side_effect=lambda artifact_id, file_path: f"http://s3/{file_path}")
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+
+    items = {f"file_{i}.txt": f"content {i}" for i in range(8)}
+    results = await artifact_manager.put_many(items, concurrency=4)
+
+    assert all(result.ok for result in results.values())
+    # The uploads overlap, up to the concurrency cap, in a single version
+    assert transfer_client.max_in_flight == 4
+    assert mock_service.put_file.call_count == len(items)
+    assert [request.method for request in transfer_client.requests] == ["PUT"] * len(items)
+    mock_service.edit.assert_called_once()
+    mock_service.commit.assert_called_once()
+
+    artifact_manager._cache.invalidate(artifact_manager._artifact_id)
+    results = await artifact_manager.get_many([*items, "missing.txt"], concurrency=16)
+    assert [results[name].result() for name in items] == list(items.values())
+    assert isinstance(results["missing.txt"].error, httpx.HTTPStatusError)
+    with pytest.raises(httpx.HTTPStatusError):
+        results["missing.txt"].result()
+    assert transfer_client.max_in_flight == 9
+
+@pytest.mark.asyncio
+async def test_put_many_commits_without_failed_uploads(mock_server, mock_event_bus, mock_pool):
+    transfer_client = SlowTransferClient(latency=0)
+    artifact_manager = AriaArtifacts(mock_server, mock_event_bus, mock_pool, transfer_client, ArtifactContentCache(), KnownArtifacts())
+    mock_service = await mock_server.get_service()
+    staged = set()
+
+    def put_file(artifact_id, file_path):
+        staged.add(file_path)
+        return f"http://s3/{file_path}"
+
+    def commit(artifact_id, version):
+        # Like Hypha, which checks that every staged file was uploaded
+        missing = staged - {path.lstrip("/") for path in transfer_client.objects}
+        if missing:
+            raise FileNotFoundError(f"Files not uploaded: {missing}")
+        return {"versions": [{"version": "v0"}]}
+
+    mock_service.put_file = AsyncMock(side_effect=put_file)
+    mock_service.remove_file = AsyncMock(side_effect=lambda artifact_id, file_path: staged.discard(file_path))
+    mock_service.commit = AsyncMock(side_effect=commit)
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+
+    results = await artifact_manager.put_many({"a.txt": "a", "missing.txt": "b", "c.txt": "c"})
+
+    assert results["a.txt"].ok and results["c.txt"].ok
+    assert isinstance(results["missing.txt"].error, httpx.HTTPStatusError)
+    mock_service.remove_file.assert_called_once_with(artifact_id=artifact_manager._artifact_id, file_path="missing.txt")
+    mock_service.commit.assert_called_once()
+    assert staged == {"a.txt", "c.txt"}
+
+@pytest.mark.asyncio
+async def test_put_skips_unchanged_content(mock_server, mock_event_bus, mock_pool, mock_transfer_client, tmp_path):
+    cache = ArtifactContentCache()
+    artifact_manager = AriaArtifacts(mock_server, mock_event_bus, mock_pool, mock_transfer_client, cache, KnownArtifacts())
+    mock_service = await mock_server.get_service()
+    await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
+
+    await artifact_manager.put(value="<html></html>", name="suggested_study.html")
+    assert await artifact_manager.put(value="<html></html>", name="suggested_study.html", overwrite=True) == "suggested_study.html"
+    mock_service.put_file.assert_called_once()
+    mock_service.commit.assert_called_once()
+    mock_event_bus.emit.assert_called_once_with("store_put", "suggested_study.html")
+
+    # A plot identical to an uploaded one is aliased to it
+    plot_path = tmp_path / "plot.png"
+    plot_path.write_bytes(b"png")
+    results = await artifact_manager.put_many({"plot_a.png": plot_path}, alias=True)
+    results = await artifact_manager.put_many({"plot_b.png": plot_path}, alias=True)
+    assert results["plot_b.png"].result() == "plot_a.png"
+    assert mock_service.commit.call_count == 2
+
+    # Changed content and removed files are uploaded again
+    await artifact_manager.put(value="<html>v2</html>", name="suggested_study.html")
+    async with artifact_manager.transaction():
+        await artifact_manager.remove("plot_a.png")
+        await artifact_manager.put_stream(plot_path, "plot_a.png")
+    assert mock_service.put_file.call_count == 4
+    assert cache.stats()["skipped_puts"] == 2
+    assert cache.stats()["bytes_saved"] == len("<html></html>") + 3
+    assert cache.stats()["rpcs_saved"] == 3 + 2 + 2 + 2
+
+    # Another handle of the session only trusts the hashes at its version
+    await mock_service.commit(artifact_manager._artifact_id, version="new")
+    next_turn = await artifact_manager.for_session(token="mock_token", user_id="test_user", session_id="test_session")
+    await next_turn.put(value="<html>v2</html>", name="suggested_study.html")
+    assert mock_service.put_file.call_count == 5
+
+@pytest.mark.asyncio
 @patch("httpx.AsyncClient.get", new_callable=lambda: AsyncMock(side_effect=mock_http_get))
-async def test_get_file(httpx_get, mock_get_server, artifact_manager, mock_server):
-    mock_get_server.return_value = mock_server
+async def test_get_file(httpx_get, artifact_manager, mock_server):
 
     await artifact_manager.setup(token="mock_token", user_id="test_user", session_id="test_session")
     content = await artifact_manager.get(name="test_file.txt")
@@ -97,11 +451,9 @@ async def test_get_file(httpx_get, mock_get_server, artifact_manager, mock_serve
     assert content == "file content"
 
 @pytest.mark.asyncio
-@patch("aria_agents.artifact_manager.get_server", new_callable=AsyncMock)
 @patch("httpx.AsyncClient.put", new_callable=AsyncMock)
 @patch("httpx.AsyncClient.get", new_callable=AsyncMock)
-async def test_event_bus_store_put(mock_http_get, mock_http_put, mock_get_server, artifact_manager, mock_server):
-    mock_get_server.return_value = mock_server
+async def test_event_bus_store_put(mock_http_get, mock_http_put, artifact_manager, mock_server):
     mock_http_put.return_value = MagicMock(status_code=200)
     mock_http_get.return_value = MagicMock(status_code=200, text="file content")
     mock_event_bus = artifact_manager.get_event_bus()
@@ -112,10 +464,12 @@ async def test_event_bus_store_put(mock_http_get, mock_http_put, mock_get_server
 
     mock_event_bus.emit.assert_called_once_with("store_put", "test_file.txt")
 
+    # The file just put is served from the write-through cache
     summary_website = await artifact_manager.get("test_file.txt")
     url = await artifact_manager.get_url("test_file.txt")
 
-    assert summary_website == "file content"
+    assert summary_website == "test content"
+    mock_http_get.assert_not_called()
     assert url == "http://mockserver/get_url"
 
 
@@ -1,7 +1,14 @@
+import httpx
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
-from tests.conftest import mock_http_get
-from aria_agents.chatbot_extensions.aux import check_pmc_query_hits, create_corpus_function, PMCQuery
+from tests.conftest import EutilsStandIn, make_paper, mock_http_get
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from aria_agents.chatbot_extensions.aux import check_pmc_query_hits, check_pmc_queries_hits, create_corpus_function, save_query_index, PMCQuery
+from aria_agents.article_cache import ArticleCache
+from aria_agents.embedding_cache import EmbeddingCache
+from aria_agents.paper_store import PaperStore, load_corpus
+from aria_agents.pubmed import HitCountCache
 
 @pytest.fixture(scope="module")
 def pmc_query():
@@ -9,7 +16,7 @@ def pmc_query():
 
 @pytest.mark.asyncio
 @patch("httpx.AsyncClient.get", new_callable=lambda: AsyncMock(side_effect=mock_http_get))
-async def test_check_pmc_query_hits(pmc_query):
+async def test_check_pmc_query_hits(mock_get, pmc_query):
     result = await check_pmc_query_hits(pmc_query=pmc_query)
     assert isinstance(result, str)
     n_hits = int(result.split()[-2])
@@ -17,12 +24,56 @@ async def test_check_pmc_query_hits(pmc_query):
     assert n_hits >= 0
 
 @pytest.mark.asyncio
-@patch("aria_agents.chatbot_extensions.aux.get_query_index_dir", return_value=None)
-@patch("aria_agents.chatbot_extensions.aux.save_query_index", return_value=None)
-async def test_create_corpus_function(get_query_index_dir, save_query_index, mock_artifact_manager, config, pmc_query):
-    corpus_function = create_corpus_function(mock_artifact_manager, config)
-    result = await corpus_function(pmc_query=pmc_query)
+async def test_check_pmc_queries_hits_counts_each_query_once(monkeypatch):
+    transport = EutilsStandIn(1234)
+    monkeypatch.setattr("aria_agents.chatbot_extensions.aux.hit_count_cache", HitCountCache())
+    async with httpx.AsyncClient(transport=transport) as client:
+        with patch("aria_agents.chatbot_extensions.aux.get_eutils_client", return_value=client):
+            result = await check_pmc_queries_hits(pmc_queries=[
+                PMCQuery(query='"yeast"[Title/Abstract]'),
+                PMCQuery(query='"mouse"[Title/Abstract]'),
+            ])
+            assert result == (
+                'The query `"yeast"[Title/Abstract]` returned 1234 hits.\n'
+                'The query `"mouse"[Title/Abstract]` returned 1234 hits.'
+            )
+            await check_pmc_query_hits(pmc_query=PMCQuery(query=' "Yeast"[title/abstract]'))
+
+    assert len(transport.requests) == 2
+    assert all(request.url.params["rettype"] == "count" for request in transport.requests)
+
+@pytest.mark.asyncio
+@patch("aria_agents.chatbot_extensions.aux.get_query_index_dir", return_value="query_index")
+@patch("aria_agents.chatbot_extensions.aux.save_query_index", return_value=(["PMC1", "PMC2"], ["PMC3"]))
+async def test_create_corpus_function(get_query_index_dir, save_query_index, mock_artifact_manager, config, pmc_query, tmp_path):
+    # Fetch from a stand-in into a scratch cache, not NCBI and the projects folder
+    article_cache = ArticleCache(str(tmp_path / "article_cache.sqlite"))
+    transport = EutilsStandIn(3)
+    async with httpx.AsyncClient(transport=transport) as client:
+        with patch("aria_agents.chatbot_extensions.aux.get_article_cache", return_value=article_cache), \
+                patch("aria_agents.chatbot_extensions.aux.get_eutils_client", return_value=client):
+            corpus_function = create_corpus_function(mock_artifact_manager, config)
+            result = await corpus_function(pmc_query=pmc_query)
+    article_cache.close()
     assert isinstance(result, str)
-    n_docs = int(result.split()[3])
-    assert result == f"Pubmed corpus with {n_docs} papers has been created."
-    assert n_docs > 0
+    assert result == "Pubmed corpus has been updated: 2 papers were added and 1 papers were already in the corpus."
+    assert transport.requests[0].url.params["term"] == pmc_query.query
+
+@pytest.mark.asyncio
+async def test_save_query_index_adds_to_the_corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, "embed_model", MockEmbedding(embed_dim=4))
+    paper_store = PaperStore(tmp_path / "paper_store")
+    embedding_cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    query_index_dir = str(tmp_path / "query_index")
+    with patch("aria_agents.chatbot_extensions.aux.get_paper_store", return_value=paper_store), \
+            patch("aria_agents.chatbot_extensions.aux.get_embedding_cache", return_value=embedding_cache):
+        result = await save_query_index(query_index_dir, [make_paper("PMC1", "Yeast."), make_paper("PMC2", "Mouse.")])
+        assert result == (["PMC1", "PMC2"], [])
+        result = await save_query_index(query_index_dir, [make_paper("PMC2", "Mouse."), make_paper("PMC3", "Rat.")])
+        assert result == (["PMC3"], ["PMC2"])
+        assert load_corpus(query_index_dir) == ["PMC1", "PMC2", "PMC3"]
+
+        result = await save_query_index(query_index_dir, [make_paper("PMC3", "Rat.")], replace=True)
+        assert result == (["PMC3"], [])
+        assert load_corpus(query_index_dir) == ["PMC3"]
+    embedding_cache.close()
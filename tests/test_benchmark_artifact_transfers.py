@@ -0,0 +1,109 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock
+import httpx
+import pytest
+from aria_agents.artifact_manager import AriaArtifacts, TransferClient
+
+N_UPLOADS = 50
+PAYLOAD = b"x" * 64 * 1024
+
+# The shared transfer client is tested in test_artifact_manager, this only
+# counts the connections it saves
+pytestmark = pytest.mark.slow
+
+
+class StandInS3Handler(BaseHTTPRequestHandler):
+    """Accepts presigned-URL PUTs and GETs like S3, recording each connection."""
+
+    protocol_version = "HTTP/1.1"
+    objects = {}
+    connections = set()
+
+    def setup(self):
+        super().setup()
+        self.connections.add(self.client_address)
+
+    def do_PUT(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.objects[self.path] = self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        body = self.objects.get(self.path, b"")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def s3_url():
+    StandInS3Handler.objects = {}
+    StandInS3Handler.connections = set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInS3Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+async def local_artifact_manager(s3_url, mock_server, mock_event_bus, mock_pool):
+    mock_service = await mock_server.get_service()
+    mock_service.put_file = AsyncMock(
+        side_effect=lambda artifact_id, file_path: f"{s3_url}/{file_path}"
+    )
+    return AriaArtifacts(
+        server=mock_server,
+        event_bus=mock_event_bus,
+        pool=mock_pool,
+        http_client=TransferClient(),
+    )
+
+
+async def upload_with_new_clients(s3_url):
+    for i in range(N_UPLOADS):
+        async with httpx.AsyncClient() as client:
+            response = await client.put(f"{s3_url}/old_{i}.png", content=PAYLOAD)
+        response.raise_for_status()
+
+
+async def upload_with_artifact_manager(artifact_manager):
+    for i in range(N_UPLOADS):
+        await artifact_manager.put(value=PAYLOAD, name=f"new_{i}.png")
+
+
+@pytest.mark.asyncio
+async def test_benchmark_sequential_uploads(s3_url, local_artifact_manager):
+    await local_artifact_manager.setup(
+        token="mock_token", user_id="test_user", session_id="test_session"
+    )
+
+    start = time.perf_counter()
+    await upload_with_new_clients(s3_url)
+    old_seconds = time.perf_counter() - start
+    old_connections = len(StandInS3Handler.connections)
+
+    StandInS3Handler.connections = set()
+    start = time.perf_counter()
+    await upload_with_artifact_manager(local_artifact_manager)
+    new_seconds = time.perf_counter() - start
+    new_connections = len(StandInS3Handler.connections)
+    await local_artifact_manager._http.aclose()
+
+    print(
+        f"\n{N_UPLOADS} sequential uploads of {len(PAYLOAD)} bytes:"
+        f"\n  client per request: {old_seconds:.3f}s, {old_connections} connections"
+        f"\n  shared client:      {new_seconds:.3f}s, {new_connections} connections"
+    )
+    assert len(StandInS3Handler.objects) == 2 * N_UPLOADS
+    assert old_connections == N_UPLOADS
+    assert new_connections == 1
@@ -0,0 +1,55 @@
+import time
+import xml.etree.ElementTree as xml
+import httpx
+import pytest
+from tests.conftest import EutilsStandIn
+from aria_agents.pubmed import PubmedFetcher, parse_article
+
+# Round trip of an E-utilities request, and server time per article
+LATENCY = 0.01
+ARTICLE_LATENCY = 0.0005
+
+# The fetcher's behaviour is tested in test_pubmed, this only times it
+pytestmark = pytest.mark.slow
+
+
+async def fetch_sequentially(client, search_query, max_results):
+    """The requests `PubmedReader.load_data` makes, without its 1 s sleeps."""
+    resp = await client.get(
+        "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi",
+        params={"db": "pmc", "term": search_query, "retmax": max_results},
+    )
+    documents = []
+    for elem in xml.fromstring(resp.content).iter("Id"):
+        resp = await client.get(
+            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi",
+            params={"id": elem.text, "db": "pmc"},
+        )
+        for article in xml.fromstring(resp.content).iter("article"):
+            documents.append(parse_article(article))
+    return documents
+
+
+@pytest.mark.asyncio
+async def test_benchmark_pubmed_fetcher():
+    print(f"\nFetching papers, {LATENCY * 1000:.0f} ms per request:")
+    for paper_limit in [20, 100, 500]:
+        transport = EutilsStandIn(paper_limit, LATENCY, ARTICLE_LATENCY)
+        async with httpx.AsyncClient(transport=transport) as client:
+            start = time.perf_counter()
+            expected = await fetch_sequentially(client, "yeast", paper_limit)
+            sequential_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            documents = await PubmedFetcher(client).load_data("yeast", paper_limit)
+            batched_seconds = time.perf_counter() - start
+
+        print(
+            f"  paper_limit {paper_limit:>3}: sequential {sequential_seconds:.2f} s,"
+            f" batched {batched_seconds:.2f} s"
+            f" ({sequential_seconds / batched_seconds:.1f}x)"
+        )
+        assert [document.text for document in documents] == [
+            document.text for document in expected
+        ]
+        assert batched_seconds < sequential_seconds
@@ -0,0 +1,93 @@
+import time
+import random
+import zlib
+import pytest
+from llama_index.core import Document
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import QueryBundle
+from aria_agents.bm25 import tokenize
+from aria_agents.paper_store import PaperStore
+
+N_PAPERS = 200
+N_QUERIES = 50
+TOP_K = 5
+
+# Literal matches are tested in test_paper_store, this measures recall
+pytestmark = pytest.mark.slow
+
+
+class HashingEmbedding(BaseEmbedding):
+    """An offline stand-in for a dense embedding model: hashed bag of words."""
+
+    dim: int = 64
+
+    def _embed(self, text):
+        vector = [0.0] * self.dim
+        for token in tokenize(text):
+            vector[zlib.crc32(token.encode()) % self.dim] += 1.0
+        norm = sum(x * x for x in vector) ** 0.5 or 1.0
+        return [x / norm for x in vector]
+
+    def _get_query_embedding(self, query):
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._embed(query)
+
+    def _get_text_embedding(self, text):
+        return self._embed(text)
+
+
+def protocol_sentence(rng):
+    return (
+        f"The {rng.choice(['sample', 'lysate', 'culture', 'suspension'])} was"
+        f" {rng.choice(['centrifuged', 'spun', 'pelleted'])} at {rng.randrange(100, 20000, 100)}g"
+        f" for {rng.randint(1, 60)} minutes at {rng.choice([4, 20, 25, 37])} degrees"
+        f" and {rng.choice(['washed', 'resuspended', 'diluted'])} in"
+        f" {rng.choice(['0.5', '1', '2', '5', '10'])} ml {rng.choice(['PBS', 'TBS', 'HBSS', 'medium'])}."
+    )
+
+
+def make_corpus(seed=0):
+    rng = random.Random(seed)
+    papers = {}
+    for i in range(N_PAPERS):
+        papers[f"PMC{i}"] = [protocol_sentence(rng) for _ in range(5)]
+    queries = [
+        (pmcid, rng.choice(papers[pmcid]))
+        for pmcid in rng.sample(sorted(papers), N_QUERIES)
+    ]
+    documents = [
+        Document(
+            text=" ".join(sentences),
+            metadata={"URL": f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmcid}/"},
+        )
+        for pmcid, sentences in papers.items()
+    ]
+    return documents, queries
+
+
+def test_benchmark_hybrid_retrieval(tmp_path):
+    embed_model = HashingEmbedding()
+    documents, queries = make_corpus()
+    store = PaperStore(tmp_path / "paper_store")
+    store.add_documents(documents, embed_model)
+    pmcids = [f"PMC{i}" for i in range(N_PAPERS)]
+
+    results = {}
+    for mode in ["vector", "bm25", "hybrid"]:
+        retriever = store.get_retriever(pmcids, TOP_K, mode, embed_model)
+        hits = 0
+        start = time.perf_counter()
+        for pmcid, query in queries:
+            nodes = retriever.retrieve(QueryBundle(query))
+            hits += pmcid in [node.node.metadata["PMCID"] for node in nodes]
+        seconds = (time.perf_counter() - start) / len(queries)
+        results[mode] = (hits / len(queries), seconds)
+
+    print(f"\n{N_QUERIES} literal protocol queries over {N_PAPERS} papers:")
+    for mode, (recall, seconds) in results.items():
+        print(f"  {mode:<6}: recall@{TOP_K} {recall:.2f}, {seconds * 1000:.2f} ms/query")
+    assert results["bm25"][0] >= results["vector"][0]
+    assert results["hybrid"][0] >= results["vector"][0]
+    assert results["hybrid"][0] >= 0.9
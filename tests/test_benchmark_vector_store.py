@@ -0,0 +1,69 @@
+import os
+import time
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from aria_agents.vector_store import VECTOR_STORE_FNAME, MemmapVectorStore
+
+N_CHUNKS = 500
+EMBED_DIM = 1536
+
+# Query results are tested in test_vector_store, this only times loading
+pytestmark = pytest.mark.slow
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def test_benchmark_vector_store_load_and_query(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(N_CHUNKS, EMBED_DIM)).astype(np.float32)
+    nodes = [
+        TextNode(id_=f"node-{i}", text="", embedding=vector.tolist())
+        for i, vector in enumerate(vectors)
+    ]
+    json_dir = tmp_path / "json"
+    memmap_dir = tmp_path / "memmap"
+    simple_store = SimpleVectorStore()
+    simple_store.add(nodes)
+    simple_store.persist(str(json_dir / VECTOR_STORE_FNAME))
+    store = MemmapVectorStore()
+    store.add(nodes)
+    store.persist(str(memmap_dir / VECTOR_STORE_FNAME))
+    del simple_store, store, nodes
+
+    simple_store, json_seconds = timed(
+        lambda: SimpleVectorStore.from_persist_path(str(json_dir / VECTOR_STORE_FNAME))
+    )
+    store, memmap_seconds = timed(
+        lambda: MemmapVectorStore.from_persist_dir(str(memmap_dir))
+    )
+    query = VectorStoreQuery(
+        query_embedding=rng.normal(size=EMBED_DIM).tolist(),
+        similarity_top_k=5,
+        node_ids=[f"node-{i}" for i in range(0, N_CHUNKS, 2)],
+    )
+    expected, json_query_seconds = timed(lambda: simple_store.query(query))
+    result, memmap_query_seconds = timed(lambda: store.query(query))
+
+    def size(directory):
+        return sum(entry.stat().st_size for entry in os.scandir(directory))
+
+    print(f"\n{N_CHUNKS} chunks of {EMBED_DIM} dimensions:")
+    print(
+        f"  json  : {size(json_dir) / 1e6:.1f} MB, load {json_seconds * 1000:.1f} ms,"
+        f" query {json_query_seconds * 1000:.1f} ms"
+    )
+    print(
+        f"  memmap: {size(memmap_dir) / 1e6:.1f} MB, load {memmap_seconds * 1000:.1f} ms,"
+        f" query {memmap_query_seconds * 1000:.1f} ms"
+    )
+    assert result.ids == expected.ids
+    assert memmap_seconds < json_seconds
+    # The embeddings stay on disk until queries read them
+    assert isinstance(store._vectors, np.memmap)
@@ -0,0 +1,55 @@
+import pytest
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from aria_agents.bm25 import BM25Index, HybridRetriever, tokenize
+
+
+def make_index():
+    index = BM25Index()
+    index.add("a", "The sample was centrifuged at 1000g for 5 minutes.")
+    index.add("b", "The cells were incubated at 37 degrees for 5 minutes.")
+    index.add("c", "The pellet was resuspended in 0.5 ml PBS.")
+    return index
+
+
+def test_bm25_ranks_literal_matches_first(tmp_path):
+    index = make_index()
+    assert tokenize("Resuspended in 0.5 ml PBS") == ["resuspended", "in", "0.5", "ml", "pbs"]
+    assert [node_id for node_id, _ in index.search("centrifuged at 1000g", 3)] == ["a", "b"]
+    assert [node_id for node_id, _ in index.search("5 minutes", 3, node_ids=["b", "c"])] == ["b"]
+
+    index.save(str(tmp_path / "bm25.json"))
+    loaded = BM25Index.load(str(tmp_path / "bm25.json"))
+    assert loaded.search("0.5 ml PBS", 1) == index.search("0.5 ml PBS", 1)
+
+
+class StaticRetriever:
+    def __init__(self, node_ids):
+        self.nodes = [NodeWithScore(node=TextNode(id_=node_id, text=node_id), score=1.0) for node_id in node_ids]
+
+    def retrieve(self, query_bundle):
+        return self.nodes
+
+
+def test_hybrid_retriever_fuses_rankings():
+    retriever = HybridRetriever(
+        StaticRetriever(["a", "b", "c"]), StaticRetriever(["c", "d", "a"]), similarity_top_k=3
+    )
+    nodes = retriever.retrieve(QueryBundle("query"))
+    assert [node.node.node_id for node in nodes] == ["a", "c", "b"]
+
+
+def test_bm25_search_among_few_nodes_matches_full_search():
+    index = BM25Index()
+    index.add_many((f"n{i}", f"The sample {i} was spun for {i % 7} minutes.") for i in range(100))
+    index.add_many((f"m{i}", f"The pellet {i} was washed in PBS.") for i in range(100))
+    node_ids = ["n3", "n10", "m5", "missing"]
+
+    # Few nodes are scored by looking up their terms rather than the postings
+    results = index.search("the sample was spun for 3 minutes", 3, node_ids=node_ids)
+    expected = [
+        (node_id, score)
+        for node_id, score in index.search("the sample was spun for 3 minutes", 200)
+        if node_id in node_ids
+    ][:3]
+    assert [node_id for node_id, _ in results] == ["n3", "n10", "m5"]
+    assert [score for _, score in results] == pytest.approx([score for _, score in expected])
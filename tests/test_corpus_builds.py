@@ -0,0 +1,59 @@
+import time
+import asyncio
+import pytest
+from schema_agents.schema import Session
+from schema_agents.utils.common import EventBus, current_session
+from aria_agents.corpus_builds import CorpusBuilds, ProgressReporter
+
+
+@pytest.mark.asyncio
+async def test_builds_run_off_the_event_loop(tmp_path):
+    builds = CorpusBuilds(max_workers=2)
+    event_bus = EventBus(name="TestEventBus")
+    events = []
+
+    async def on_progress(event):
+        # Events are shaped like the streamed tool calls the frontend shows
+        events.append(
+            (current_session.get().id, event.session.id, event.status, event.arguments)
+        )
+
+    event_bus.on("corpus_progress", on_progress)
+    current_session.set(Session(id="session-1"))
+    progress = ProgressReporter(event_bus, str(tmp_path))
+    order = []
+
+    def fetch(name):
+        time.sleep(0.2)
+        progress("fetched", 1, 1)
+        return name
+
+    async def build(name):
+        order.append(f"start {name}")
+        result = await builds.run(fetch, name)
+        order.append(f"end {name}")
+        return result
+
+    first = builds.start(str(tmp_path), build("first"))
+    second = builds.start(str(tmp_path), build("second"))
+    ticks = 0
+    while not second.done():
+        ticks += 1
+        await asyncio.sleep(0.01)
+    await builds.wait(str(tmp_path))
+    progress.finish("Done")
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert await first == "first"
+    assert await second == "second"
+    assert order == ["start first", "end first", "start second", "end second"]
+    # The loop kept running while the workers were blocked
+    assert ticks > 10
+    assert events == [
+        ("session-1", "session-1", "start", ""),
+        ("session-1", "session-1", "in_progress", "Fetched 1/1<br>"),
+        ("session-1", "session-1", "in_progress", "Fetched 1/1<br>"),
+        ("session-1", "session-1", "finished", None),
+    ]
+    assert builds.pending() == 0
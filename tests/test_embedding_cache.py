@@ -0,0 +1,69 @@
+from typing import List
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from aria_agents.embedding_cache import CachedEmbedding, EmbeddingCache
+
+
+class CountingEmbedding(BaseEmbedding):
+    """Embeds a text as its length and counts the texts it was asked to embed."""
+
+    embedded: List[str] = []
+
+    def _get_query_embedding(self, query):
+        return [float(len(query)), 0.0]
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text):
+        self.embedded.append(text)
+        return [float(len(text)), 1.0]
+
+
+def test_cache_is_keyed_by_namespace(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("model:1024:200", ["a", "bb"], [[1.0, 2.0], [3.0, 4.0]])
+
+    assert cache.get_many("model:1024:200", ["bb", "c", "a"]) == [[3.0, 4.0], None, [1.0, 2.0]]
+    assert cache.get_many("model:512:20", ["a"]) == [None]
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+    cache.close()
+
+    reopened = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    assert reopened.get_many("model:1024:200", ["a"]) == [[1.0, 2.0]]
+    assert reopened.stats()["bytes"] == 16
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_bytes=16)
+    cache.put_many("ns", ["a", "b"], [[1.0], [2.0]])
+    cache.get_many("ns", ["a"])
+    cache.put_many("ns", ["c", "d", "e"], [[3.0], [4.0], [5.0]])
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 16
+    assert cache.get_many("ns", ["a", "b", "c", "d", "e"]) == [[1.0], None, [3.0], [4.0], [5.0]]
+
+
+def test_cached_embedding_only_embeds_new_texts(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    embed_model = CountingEmbedding(model_name="counting", embedded=[])
+    cached = CachedEmbedding(embed_model, cache, namespace="counting:1024:200")
+
+    assert cached.get_text_embedding_batch(["one", "three"]) == [[3.0, 1.0], [5.0, 1.0]]
+    assert cached.get_text_embedding_batch(["three", "seven", "one"]) == [[5.0, 1.0], [5.0, 1.0], [3.0, 1.0]]
+    assert embed_model.embedded == ["one", "three", "seven"]
+    assert cached.get_query_embedding("query") == [5.0, 0.0]
+
+
+def test_repeated_texts_are_cached_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("ns", ["a", "a"], [[1.0], [1.0]])
+    assert cache.stats()["bytes"] == 4
+
+    embed_model = CountingEmbedding(model_name="counting", embedded=[])
+    cached = CachedEmbedding(embed_model, cache, namespace="counting:1024:200")
+    batch = ["same chunk", "same chunk", "other"]
+    assert cached.get_text_embedding_batch(batch) == [[10.0, 1.0], [10.0, 1.0], [5.0, 1.0]]
+    assert embed_model.embedded == ["same chunk", "other"]
+    assert cache.stats()["bytes"] == 4 + 2 * 8
@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from tests.conftest import mock_get_query_function
+from tests.conftest import mock_get_batch_query_function
 from aria_agents.chatbot_extensions.experiment_compiler import (
     create_experiment_compiler_function,
 )
@@ -13,11 +13,11 @@ from aria_agents.chatbot_extensions.experiment_compiler import (
     return_value="/mock/query_index_dir",
 )
 @patch(
-    "aria_agents.chatbot_extensions.experiment_compiler.get_query_function",
-    new_callable=lambda: MagicMock(return_value=mock_get_query_function()),
+    "aria_agents.chatbot_extensions.experiment_compiler.get_batch_query_function",
+    new_callable=lambda: MagicMock(return_value=mock_get_batch_query_function()),
 )
 async def test_run_experiment_compiler(
-    mock_get_query_index_dir, mock_get_query_function, mock_artifact_manager, config
+    mock_get_query_index_dir, mock_get_batch_query_function, mock_artifact_manager, config
 ):
 
     experiment_compiler = create_experiment_compiler_function(
@@ -0,0 +1,92 @@
+import os
+from unittest.mock import MagicMock
+import pytest
+from hypha_rpc.rpc import RemoteException
+from aria_agents.artifact_cache import ArtifactContentCache
+from aria_agents.artifact_manager import KnownArtifacts
+from aria_agents.local_artifacts import LocalArtifacts
+
+
+@pytest.fixture
+def local_artifacts(tmp_path):
+    return LocalArtifacts(
+        tmp_path, MagicMock(), cache=ArtifactContentCache(), known=KnownArtifacts()
+    )
+
+
+@pytest.mark.asyncio
+async def test_put_get_and_versions(local_artifacts, tmp_path):
+    session = await local_artifacts.for_session("token", "test_user", "test_session")
+    await session.put(value="v1", name="study.json")
+    await session.put(value=b"png", name="plot.png")
+    session._cache.invalidate(session._artifact_id)
+
+    assert await session.get("study.json") == "v1"
+    assert await session.get_url("study.json") == (
+        "http://local-artifacts/ws-user-test_user/aria-agents-chats/test_session/v2/study.json"
+    )
+
+    await session.put(value="v2", name="study.json", overwrite=True)
+    await session.remove("plot.png")
+    assert await session.get("study.json") == "v2"
+    assert session._version == 4
+
+    # Earlier versions are kept unchanged
+    artifact_dir = tmp_path / "ws-user-test_user" / "aria-agents-chats" / "test_session"
+    assert (artifact_dir / "v2" / "study.json").read_text() == "v1"
+    assert (artifact_dir / "v2" / "plot.png").exists()
+    assert not (artifact_dir / "v4" / "plot.png").exists()
+
+    emitted = [c.args for c in session.get_event_bus().emit.call_args_list]
+    assert emitted == [
+        ("store_put", "study.json"),
+        ("store_put", "plot.png"),
+        ("store_put", "study.json"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_and_attachments(local_artifacts, tmp_path):
+    session = await local_artifacts.for_session("token", "test_user", "test_session")
+    csv_path = tmp_path / "data.csv"
+    csv_path.write_text("a,b\n1,2\n")
+
+    async with session.transaction():
+        await session.put_stream(str(csv_path), "attachments/data.csv")
+        await session._svc.edit(
+            artifact_id=session._artifact_id,
+            manifest={"attachments": [{"name": "data.csv", "path": "attachments/data.csv"}]},
+        )
+
+    attachment = await session.get_attachment("data.csv")
+    with await session.get_attachment_file(attachment) as f:
+        assert f.read() == b"a,b\n1,2\n"
+
+    # Nested files aren't copied into later versions, but can be read at theirs
+    await session.put(value="v1", name="study.json")
+    with pytest.raises(RemoteException):
+        await session.get_url("attachments/data.csv")
+    with await session.get_attachment_file({**attachment, "version": "v0"}) as f:
+        assert f.read() == b"a,b\n1,2\n"
+
+    await session.clear()
+    next_turn = await local_artifacts.for_session("token", "test_user", "test_session")
+    assert await next_turn.get_attachments() == []
+
+
+@pytest.mark.asyncio
+async def test_staging_copies_top_level_files(local_artifacts, tmp_path):
+    session = await local_artifacts.for_session("token", "test_user", "test_session")
+    async with session.transaction():
+        await session.put(value="v1", name="study.json")
+        await session.put(value="a,b", name="attachments/data.csv")
+    await session.put(value="png", name="plot.png")
+
+    # As on Hypha, only the top-level files are copied into a new version
+    artifact_dir = tmp_path / "ws-user-test_user" / "aria-agents-chats" / "test_session"
+    assert sorted(os.listdir(artifact_dir / "v2")) == ["plot.png", "study.json"]
+    assert await session.get("study.json") == "v1"
+
+    await session._svc.edit(artifact_id=session._artifact_id, version="stage")
+    await session._svc.commit(artifact_id=session._artifact_id, version="new")
+    assert os.listdir(artifact_dir / "v3") == []
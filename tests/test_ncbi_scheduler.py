@@ -0,0 +1,61 @@
+import time
+import asyncio
+import httpx
+import pytest
+from aria_agents.ncbi_scheduler import NCBIScheduler, RateLimitedTransport
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_the_rate_and_serves_sessions_fairly():
+    scheduler = NCBIScheduler(rate=50.0)
+    order = []
+
+    async def request(session, i):
+        await scheduler.acquire(session)
+        order.append(f"{session}{i}")
+
+    start = time.monotonic()
+    first = [asyncio.create_task(request("a", i)) for i in range(6)]
+    await asyncio.sleep(0)
+    second = [asyncio.create_task(request("b", i)) for i in range(2)]
+    await asyncio.gather(*first, *second)
+
+    # The first request uses the initial token, the others wait 1/50 s each
+    assert time.monotonic() - start >= 7 / 50 * 0.9
+    # Session b's requests are interleaved with the queued requests of a
+    assert order.index("b0") <= 2
+    assert order.index("b1") == order.index("b0") + 2
+    assert sorted(order) == ["a0", "a1", "a2", "a3", "a4", "a5", "b0", "b1"]
+    stats = scheduler.stats()
+    assert stats["requests"] == 8
+    assert stats["queue_depth"] == 0
+    assert stats["max_queue_depth"] >= 6
+    assert stats["max_wait"] >= stats["mean_wait"] > 0
+
+
+@pytest.mark.asyncio
+async def test_transport_retries_throttled_requests():
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0.05"}),
+        httpx.Response(429),
+        httpx.Response(200, content=b"<eSearchResult><Count>7</Count></eSearchResult>"),
+    ]
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return responses[len(requests) - 1]
+
+    scheduler = NCBIScheduler(rate=100.0, api_key="secret")
+    transport = RateLimitedTransport(
+        scheduler, httpx.MockTransport(handler), backoff=0.01
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        resp = await client.get("https://eutils.example/esearch.fcgi", params={"db": "pmc"})
+
+    assert resp.status_code == 200
+    assert len(requests) == 3
+    assert requests[0].url.params["api_key"] == "secret"
+    assert requests[0].url.params["db"] == "pmc"
+    assert scheduler.stats()["throttled"] == 2
+    assert scheduler.stats()["requests"] == 3
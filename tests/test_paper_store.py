@@ -0,0 +1,158 @@
+import os
+import json
+import threading
+from llama_index.core import StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import QueryBundle, TextNode
+from tests.conftest import make_paper
+from aria_agents.paper_store import PaperStore, get_pmcid, load_corpus, save_corpus
+from aria_agents.vector_store import MemmapVectorStore
+
+
+class CountingEmbedding(MockEmbedding):
+    n_embedded: int = 0
+
+    def _get_text_embeddings(self, texts):
+        self.n_embedded += len(texts)
+        return super()._get_text_embeddings(texts)
+
+
+def test_papers_are_indexed_once(tmp_path):
+    embed_model = CountingEmbedding(embed_dim=4)
+    store = PaperStore(tmp_path / "paper_store")
+
+    progress = []
+    added, present = store.add_documents(
+        [make_paper("PMC1", "Yeast osmotic stress."), make_paper("PMC2", "Mouse lung cancer.")],
+        embed_model,
+        progress=lambda *args: progress.append(args),
+    )
+    assert (added, present) == (["PMC1", "PMC2"], [])
+    assert progress == [("embedded", 2, 2), ("persisted", 2, 2)]
+    assert embed_model.n_embedded == 2
+
+    added, present = store.add_documents(
+        [make_paper("PMC2", "Mouse lung cancer."), make_paper("PMC3", "Rat heart.")],
+        embed_model,
+    )
+    assert (added, present) == (["PMC3"], ["PMC2"])
+    assert embed_model.n_embedded == 3
+
+    reloaded = PaperStore(tmp_path / "paper_store")
+    assert "PMC3" in reloaded
+    assert len(reloaded.get_node_ids(["PMC1", "PMC2", "PMC3"])) == 3
+    assert len(reloaded.get_bm25_index()) == 3
+
+
+def test_builds_only_persist_new_papers(tmp_path):
+    embed_model = MockEmbedding(embed_dim=4)
+    store = PaperStore(tmp_path / "paper_store")
+    store.add_documents([make_paper("PMC1", "Yeast osmotic stress.")], embed_model)
+    segments_dir = tmp_path / "paper_store" / "segments"
+    vectors_path = tmp_path / "paper_store" / "index" / "default__vector_store.npy"
+    first_segment = segments_dir / "00000000.json"
+    written = (first_segment.stat().st_mtime_ns, os.stat(vectors_path).st_ino)
+
+    store.add_documents([make_paper("PMC2", "Mouse lung cancer.")], embed_model)
+    # Earlier segments are left as they are, new vectors are appended
+    assert sorted(os.listdir(segments_dir)) == ["00000000.json", "00000001.json"]
+    assert (first_segment.stat().st_mtime_ns, os.stat(vectors_path).st_ino) == written
+    with open(segments_dir / "00000001.json", encoding="utf-8") as f:
+        assert list(json.load(f)["papers"]) == ["PMC2"]
+
+    reloaded = PaperStore(tmp_path / "paper_store")
+    query_engine = reloaded.get_query_engine(
+        ["PMC2"], 5, 1024, retriever_mode="hybrid", embed_model=embed_model
+    )
+    nodes = query_engine.retrieve(QueryBundle("lung cancer"))
+    assert [node.metadata["PMCID"] for node in nodes] == ["PMC2"]
+
+
+def test_bm25_retrievers_rank_literal_matches_first(tmp_path):
+    # Mock embeddings are all the same, so only BM25 can tell the papers apart
+    embed_model = MockEmbedding(embed_dim=4)
+    store = PaperStore(tmp_path / "paper_store")
+    store.add_documents(
+        [
+            make_paper("PMC1", "The lysate was spun at 500g for 10 minutes."),
+            make_paper("PMC2", "The pellet was resuspended in 0.5 ml PBS."),
+            make_paper("PMC3", "The culture was diluted in 2 ml medium."),
+        ],
+        embed_model,
+    )
+    for mode in ["bm25", "hybrid"]:
+        retriever = store.get_retriever(["PMC1", "PMC2", "PMC3"], 2, mode, embed_model)
+        nodes = retriever.retrieve(QueryBundle("resuspended in 0.5 ml PBS"))
+        assert nodes[0].node.metadata["PMCID"] == "PMC2"
+
+
+def test_stores_persisted_whole_are_converted(tmp_path):
+    root = tmp_path / "paper_store"
+    node = TextNode(
+        id_="node-1", text="Yeast osmotic stress.", metadata={"PMCID": "PMC1"}, embedding=[1.0, 0.0]
+    )
+    index = VectorStoreIndex(
+        [node],
+        storage_context=StorageContext.from_defaults(vector_store=MemmapVectorStore()),
+        embed_model=MockEmbedding(embed_dim=2),
+    )
+    index.storage_context.persist(str(root / "index"))
+    with open(root / "papers.json", "w", encoding="utf-8") as f:
+        json.dump({"PMC1": {"title": "", "url": "", "node_ids": ["node-1"]}}, f)
+
+    store = PaperStore(root)
+    assert "PMC1" in store
+    assert not os.path.exists(root / "papers.json")
+    assert not os.path.exists(root / "index" / "docstore.json")
+    assert store.get_bm25_index().search("yeast", 1)[0][0] == "node-1"
+    assert store.get_index().docstore.get_node("node-1").text == "Yeast osmotic stress."
+
+
+def test_query_engine_only_retrieves_the_session_corpus(tmp_path):
+    embed_model = MockEmbedding(embed_dim=4)
+    store = PaperStore(tmp_path / "paper_store")
+    papers = [make_paper(f"PMC{i}", f"Paper number {i}.") for i in range(5)]
+    store.add_documents(papers, embed_model)
+
+    query_index_dir = str(tmp_path / "session" / "query_index")
+    assert load_corpus(query_index_dir) is None
+    save_corpus(query_index_dir, ["PMC1", "PMC3"])
+    pmcids = load_corpus(query_index_dir)
+
+    query_engine = store.get_query_engine(pmcids, 5, 1024, embed_model=embed_model)
+    nodes = query_engine.retrieve(QueryBundle("paper"))
+    assert sorted(node.metadata["PMCID"] for node in nodes) == ["PMC1", "PMC3"]
+    assert get_pmcid(papers[0]) == "PMC0"
+
+
+def test_queries_dont_wait_for_builds(tmp_path):
+    store = PaperStore(tmp_path / "paper_store")
+    store.add_documents([make_paper("PMC1", "Yeast osmotic stress.")], MockEmbedding(embed_dim=4))
+    embedding = threading.Event()
+    release = threading.Event()
+    order = []
+
+    class BlockingEmbedding(MockEmbedding):
+        def _get_text_embeddings(self, texts):
+            embedding.set()
+            order.append("embedded" if release.wait(5) else "timed out")
+            return super()._get_text_embeddings(texts)
+
+    build = threading.Thread(
+        target=store.add_documents,
+        args=([make_paper("PMC2", "Mouse lung cancer.")], BlockingEmbedding(embed_dim=4)),
+    )
+    build.start()
+    assert embedding.wait(5)
+    # Another session queries the store while the build is embedding
+    query_engine = store.get_query_engine(
+        ["PMC1"], 5, 1024, retriever_mode="hybrid", embed_model=MockEmbedding(embed_dim=4)
+    )
+    nodes = query_engine.retrieve(QueryBundle("yeast stress"))
+    order.append("queried")
+    release.set()
+    build.join()
+
+    assert order == ["queried", "embedded"]
+    assert [node.metadata["PMCID"] for node in nodes] == ["PMC1"]
+    assert "PMC2" in store
@@ -0,0 +1,41 @@
+import httpx
+import pytest
+from tests.conftest import EutilsStandIn
+from aria_agents.pubmed import PubmedFetcher, normalize_query
+
+@pytest.mark.asyncio
+async def test_fetcher_batches_requests_through_the_history_server():
+    transport = EutilsStandIn(45, latency=0.01)
+    progress = []
+    async with httpx.AsyncClient(transport=transport) as client:
+        fetcher = PubmedFetcher(client, batch_size=10, concurrency=2)
+        documents = await fetcher.load_data(
+            "yeast", max_results=42, progress=lambda *args: progress.append(args)
+        )
+
+    assert len(transport.requests) == 1 + 5
+    assert transport.requests[0].url.params["usehistory"] == "y"
+    assert transport.max_in_flight == 2
+    assert [document.metadata["URL"] for document in documents] == [
+        f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{i}/" for i in transport.ids[:42]
+    ]
+    assert documents[0].metadata["Title of this paper"] == "Osmotic stress in yeast 1000000"
+    assert documents[0].metadata["Journal it was published in:"] == "Bio-protocol"
+    assert "exposed to osmotic stress." in documents[0].text
+    assert progress[-1] == ("fetched", 42, 42)
+
+
+@pytest.mark.asyncio
+async def test_fetcher_skips_failed_batches():
+    transport = EutilsStandIn(30, fail_retstart=10)
+    async with httpx.AsyncClient(transport=transport) as client:
+        documents = await PubmedFetcher(client, batch_size=10).load_data("yeast", 30)
+    assert len(documents) == 20
+
+
+def test_normalize_query_keeps_boolean_operators():
+    assert normalize_query(' "Yeast"[title/abstract]  AND\tmouse ') == '"yeast"[title/abstract] AND mouse'
+    # Lower case operators are search terms, so the queries differ
+    assert normalize_query("yeast OR mouse") == "yeast OR mouse"
+    assert normalize_query("Yeast or Mouse") == "yeast or mouse"
+    assert normalize_query("NOTCH NOT Orchid") == "notch NOT orchid"
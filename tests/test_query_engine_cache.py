@@ -0,0 +1,50 @@
+import os
+from unittest.mock import MagicMock
+from aria_agents.query_engine_cache import QueryEngineCache
+
+
+def write_index(query_index_dir, content):
+    os.makedirs(query_index_dir, exist_ok=True)
+    with open(os.path.join(query_index_dir, "docstore.json"), "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def test_cache_reuses_engines_until_the_index_changes(tmp_path):
+    cache = QueryEngineCache()
+    index_dir = str(tmp_path / "query_index")
+    write_index(index_dir, "{}")
+    load = MagicMock(side_effect=lambda: object())
+
+    engine = cache.get(index_dir, (5, 512), load)
+    assert cache.get(index_dir, (5, 512), load) is engine
+    assert cache.get(index_dir, (10, 512), load) is not engine
+    assert load.call_count == 2
+
+    write_index(index_dir, '{"docs": []}')
+    assert cache.get(index_dir, (5, 512), load) is not engine
+    assert load.call_count == 3
+
+    cache.invalidate(index_dir)
+    cache.get(index_dir, (5, 512), load)
+    assert load.call_count == 4
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 4
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = QueryEngineCache(max_entries=2, max_bytes=10)
+    for name, content in [("a", "aaaa"), ("b", "bbbb"), ("c", "cccc"), ("big", "x" * 11)]:
+        write_index(str(tmp_path / name), content)
+    load = MagicMock(side_effect=lambda: object())
+
+    cache.get(str(tmp_path / "a"), (), load)
+    cache.get(str(tmp_path / "b"), (), load)
+    cache.get(str(tmp_path / "a"), (), load)
+    cache.get(str(tmp_path / "c"), (), load)
+    cache.get(str(tmp_path / "big"), (), load)
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+    cache.get(str(tmp_path / "a"), (), load)
+    assert cache.stats()["hits"] == 2
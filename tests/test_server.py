@@ -0,0 +1,146 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from aria_agents.server import HyphaConnectionPool, PooledConnection
+
+
+def make_mock_server():
+    server = MagicMock()
+    server.get_service = AsyncMock(return_value=MagicMock())
+    server.echo = AsyncMock(return_value="ping")
+    server.disconnect = AsyncMock()
+    return server
+
+
+@pytest.fixture
+def connect():
+    return AsyncMock(side_effect=lambda *args, **kwargs: make_mock_server())
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connections(connect):
+    pool = HyphaConnectionPool(connect=connect)
+    server_a = await pool.get_server("http://mockserver", "token_a")
+    server_b = await pool.get_server("http://mockserver", "token_a")
+    service_a = await pool.get_service("http://mockserver", "public/artifact-manager", "token_a")
+    service_b = await pool.get_service("http://mockserver", "public/artifact-manager", "token_a")
+
+    assert server_a is server_b
+    assert service_a is service_b
+    assert connect.call_count == 1
+    server_a.get_service.assert_called_once_with("public/artifact-manager")
+    assert pool.stats() == {
+        "hits": 3,
+        "misses": 1,
+        "reconnects": 0,
+        "evictions": 0,
+        "open_connections": 1,
+        "leased_connections": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_pool_keys_by_token_and_workspace(connect):
+    pool = HyphaConnectionPool(connect=connect)
+    server_a = await pool.get_server("http://mockserver", "token_a")
+    server_b = await pool.get_server("http://mockserver", "token_b")
+    server_c = await pool.get_server("http://mockserver", "token_a", "workspace")
+
+    assert len({id(server_a), id(server_b), id(server_c)}) == 3
+    connect.assert_any_call("http://mockserver", workspace_name="workspace", provided_token="token_a")
+
+
+@pytest.mark.asyncio
+async def test_pool_evicts_least_recently_used(connect):
+    pool = HyphaConnectionPool(max_size=2, connect=connect)
+    server_a = await pool.get_server("http://mockserver", "token_a")
+    await pool.get_server("http://mockserver", "token_b")
+    await pool.get_server("http://mockserver", "token_a")
+    server_b = pool._connections[("http://mockserver", "token_b", None)].server
+    await pool.get_server("http://mockserver", "token_c")
+
+    server_b.disconnect.assert_called_once()
+    server_a.disconnect.assert_not_called()
+    assert pool.stats()["evictions"] == 1
+    assert pool.stats()["open_connections"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_closes_idle_connections(connect):
+    pool = HyphaConnectionPool(idle_ttl=0, connect=connect)
+    server_a = await pool.get_server("http://mockserver", "token_a")
+    server_b = await pool.get_server("http://mockserver", "token_a")
+
+    assert server_a is not server_b
+    server_a.disconnect.assert_called_once()
+    assert pool.stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_reconnects_unhealthy_connections(connect):
+    pool = HyphaConnectionPool(health_check_interval=0, connect=connect)
+    server_a = await pool.get_server("http://mockserver", "token_a")
+    server_a.echo.side_effect = ConnectionError("Connection lost")
+    server_b = await pool.get_server("http://mockserver", "token_a")
+
+    assert server_a is not server_b
+    server_a.disconnect.assert_called_once()
+    assert pool.stats()["reconnects"] == 1
+
+    await pool.close()
+    server_b.disconnect.assert_called_once()
+    assert pool.stats()["open_connections"] == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_keeps_leased_connections_open(connect):
+    pool = HyphaConnectionPool(max_size=1, idle_ttl=0, connect=connect)
+    connection = await pool.lease("http://mockserver", "token_a")
+    # Neither the size bound nor the idle TTL closes a leased connection
+    await pool.get_server("http://mockserver", "token_b")
+    await pool.get_server("http://mockserver", "token_c")
+    connection.server.disconnect.assert_not_called()
+    assert pool.stats()["leased_connections"] == 1
+
+    await pool.release(connection)
+    await pool.get_server("http://mockserver", "token_d")
+    connection.server.disconnect.assert_called_once()
+    assert pool.stats()["leased_connections"] == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_closes_replaced_connections_once_released(connect):
+    pool = HyphaConnectionPool(health_check_interval=0, connect=connect)
+    connection = await pool.lease("http://mockserver", "token_a")
+    connection.server.echo.side_effect = ConnectionError("Connection lost")
+    server_b = await pool.get_server("http://mockserver", "token_a")
+
+    assert server_b is not connection.server
+    connection.server.disconnect.assert_not_called()
+    await pool.release(connection)
+    connection.server.disconnect.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_pool_connects_a_key_once_while_evicting(connect):
+    pool = HyphaConnectionPool(max_size=1, connect=connect)
+    connected = asyncio.Event()
+
+    async def slow_connect(*args, **kwargs):
+        await connected.wait()
+        return make_mock_server()
+
+    connect.side_effect = slow_connect
+    first = asyncio.create_task(pool.get_server("http://mockserver", "token_a"))
+    await asyncio.sleep(0)
+    # Evicting token_a while it is connecting keeps its lock for later callers
+    pool._connections[("http://mockserver", "token_a", None)] = PooledConnection(
+        make_mock_server()
+    )
+    await pool._evict(("http://mockserver", "token_a", None))
+    second = asyncio.create_task(pool.get_server("http://mockserver", "token_a"))
+    await asyncio.sleep(0)
+    connected.set()
+
+    assert await first is await second
+    assert connect.call_count == 1
@@ -1,5 +1,20 @@
+import time
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
 import pytest
-from aria_agents.utils import call_agent, ask_agent
+from pydantic import Field
+from llama_index.core import Document, VectorStoreIndex
+from llama_index.core.base.llms.types import CompletionResponse
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.query_engine import CitationQueryEngine
+from aria_agents.utils import (
+    call_agent,
+    ask_agent,
+    create_query_function,
+    create_batch_query_function,
+)
 from aria_agents.chatbot_extensions.aux import write_website
 
 @pytest.mark.slow
@@ -34,3 +49,111 @@ async def test_summary_website(mock_artifact_manager, suggested_study, config):
     website_type = "suggested_study"
     await write_website(suggested_study, mock_artifact_manager, website_type, llm_model=config["llm_model"])
     assert await mock_artifact_manager.exists(f"{website_type}.html")
+
+class SlowEmbedding(MockEmbedding):
+    """Embeds queries in `latency` seconds, blocking only on the sync path."""
+
+    latency: float = 0.2
+
+    def _get_query_embedding(self, query):
+        time.sleep(self.latency)
+        return super()._get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query):
+        await asyncio.sleep(self.latency)
+        return await super()._aget_query_embedding(query)
+
+
+class SlowLLM(MockLLM):
+    """Answers in `latency` seconds, blocking only on the sync path."""
+
+    latency: float = 0.2
+    calls: list = Field(default_factory=list)
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        self.calls.append((start, time.perf_counter()))
+        return CompletionResponse(text="The answer [1].")
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt, formatted=False, **kwargs):
+        start = time.perf_counter()
+        await asyncio.sleep(self.latency)
+        self.calls.append((start, time.perf_counter()))
+        return CompletionResponse(text="The answer [1].")
+
+
+@pytest.mark.asyncio
+async def test_query_corpus_does_not_block_other_sessions():
+    index = VectorStoreIndex.from_documents(
+        [
+            Document(
+                text="Yeast cells were exposed to osmotic stress.",
+                metadata={"URL": "https://www.ncbi.nlm.nih.gov/pmc/articles/PMC1/"},
+            )
+        ],
+        embed_model=SlowEmbedding(embed_dim=4),
+    )
+    llm = SlowLLM()
+    query_engine = CitationQueryEngine.from_args(index, llm=llm, similarity_top_k=1)
+    query_corpus = create_query_function(query_engine)
+
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(tick())
+    try:
+        responses = await asyncio.gather(
+            query_corpus("session A question"), query_corpus("session B question")
+        )
+    finally:
+        ticker.cancel()
+
+    for response in responses:
+        assert "The answer [1]." in response
+        assert "[1] - https://www.ncbi.nlm.nih.gov/pmc/articles/PMC1/" in response
+    # The event loop kept serving other sessions while both queries ran
+    (start_a, end_a), (start_b, end_b) = sorted(llm.calls)
+    assert start_b < end_a
+    assert ticks > 10
+
+@pytest.mark.asyncio
+async def test_query_corpus_many_batches_embeddings():
+    synthesizing = []
+    max_synthesizing = []
+
+    async def asynthesize(query_bundle, nodes):
+        synthesizing.append(query_bundle.query_str)
+        max_synthesizing.append(len(synthesizing))
+        await asyncio.sleep(0.1)
+        synthesizing.remove(query_bundle.query_str)
+        response = MagicMock(response=f"Answer to {query_bundle.query_str}")
+        response.source_nodes = nodes
+        return response
+
+    embed_model = MagicMock()
+    embed_model.aget_text_embedding_batch = AsyncMock(
+        side_effect=lambda texts: [[float(i)] for i in range(len(texts))]
+    )
+    query_engine = MagicMock()
+    query_engine.aretrieve = AsyncMock(return_value=[])
+    query_engine.asynthesize = asynthesize
+    query_corpus_many = create_batch_query_function(query_engine, embed_model, concurrency=3)
+
+    questions = [f"question {i}" for i in range(6)]
+    responses = await query_corpus_many(questions)
+
+    assert list(responses) == questions
+    assert "Answer to question 5" in responses["question 5"]
+    embed_model.aget_text_embedding_batch.assert_called_once_with(questions)
+    retrieved = [c.args[0] for c in query_engine.aretrieve.call_args_list]
+    assert [bundle.embedding for bundle in retrieved] == [[float(i)] for i in range(6)]
+    # The questions are answered at once, up to the concurrency cap
+    assert max(max_synthesizing) == 3
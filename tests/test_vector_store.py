@@ -0,0 +1,68 @@
+import os
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from aria_agents.vector_store import VECTOR_STORE_FNAME, MemmapVectorStore
+
+
+def make_nodes(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        TextNode(id_=f"node-{i}", text=f"chunk {i}", embedding=rng.normal(size=dim).tolist())
+        for i in range(n)
+    ]
+
+
+def test_memmap_store_matches_simple_vector_store(tmp_path):
+    nodes = make_nodes(50)
+    simple_store = SimpleVectorStore()
+    simple_store.add(nodes)
+    store = MemmapVectorStore()
+    store.add(nodes)
+    persist_path = str(tmp_path / VECTOR_STORE_FNAME)
+    store.persist(persist_path)
+    loaded = MemmapVectorStore.from_persist_path(persist_path)
+    assert isinstance(loaded._vectors, np.memmap)
+
+    query_embedding = np.random.default_rng(1).normal(size=8).tolist()
+    for node_ids in [None, [f"node-{i}" for i in range(0, 50, 3)] + ["missing"]]:
+        query = VectorStoreQuery(
+            query_embedding=query_embedding, similarity_top_k=5, node_ids=node_ids
+        )
+        expected = simple_store.query(query)
+        result = loaded.query(query)
+        assert result.ids == expected.ids
+        assert np.allclose(result.similarities, expected.similarities, atol=1e-5)
+
+
+def test_memmap_store_appends_and_converts_json_stores(tmp_path):
+    nodes = make_nodes(10)
+    simple_store = SimpleVectorStore()
+    simple_store.add(nodes[:6])
+    simple_store.persist(str(tmp_path / VECTOR_STORE_FNAME))
+
+    store = MemmapVectorStore.from_persist_dir(str(tmp_path))
+    assert not os.path.exists(tmp_path / VECTOR_STORE_FNAME)
+    assert len(store) == 6
+    vectors_path = tmp_path / "default__vector_store.npy"
+    inode = os.stat(vectors_path).st_ino
+
+    # New rows are appended to the file in place
+    store = MemmapVectorStore.from_persist_dir(str(tmp_path))
+    store.add(nodes[6:])
+    store.persist(str(tmp_path / VECTOR_STORE_FNAME))
+    assert os.stat(vectors_path).st_ino == inode
+    assert np.load(vectors_path).shape == (10, 8)
+
+    store.delete_nodes(["node-0"])
+    store.persist(str(tmp_path / VECTOR_STORE_FNAME))
+    assert os.stat(vectors_path).st_ino != inode
+
+    loaded = MemmapVectorStore.from_persist_dir(str(tmp_path))
+    assert len(loaded) == 9
+    result = loaded.query(
+        VectorStoreQuery(query_embedding=nodes[8].embedding, similarity_top_k=1)
+    )
+    assert result.ids == ["node-8"]
+    assert np.isclose(result.similarities[0], 1.0)